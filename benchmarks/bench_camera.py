@@ -0,0 +1,96 @@
+""" Benchmarks of projecting points through cameras """
+
+import numpy as np
+
+from .fixtures import BATCH_SIZES, make_cameras, lonlat_points, throughput
+
+class ProjectToCamera:
+    """ Latency of projecting single points """
+
+    def setup(self):
+        self.cam = make_cameras(1)[0]
+        lon, lat, elev = lonlat_points(1)
+        self.point = (lon[0], lat[0], elev[0])
+        self.base = [2000.0, 1500.0]
+        self.peak = [2000.0, 1450.0]
+
+    def time_project_to_camera(self):
+        self.cam.project_to_camera(*self.point)
+
+    def time_project_from_camera(self):
+        self.cam.project_from_camera(2000.0, 1500.0)
+
+    def time_height_between_points(self):
+        self.cam.height_between_points(self.base, self.peak)
+
+class ProjectPointsToCamera:
+    """ Latency, throughput and memory of projecting batches of world points into a camera """
+    params = BATCH_SIZES
+    param_names = ["batch"]
+
+    def setup(self, batch):
+        self.cam = make_cameras(1)[0]
+        self.points = lonlat_points(batch)
+
+    def project(self):
+        self.cam.project_points_to_camera(*self.points)
+
+    def time_project_points_to_camera(self, batch):
+        self.project()
+
+    def peakmem_project_points_to_camera(self, batch):
+        self.project()
+
+    def track_throughput(self, batch):
+        return throughput(self.project, batch)
+    track_throughput.unit = "points/s"
+
+class ProjectPointsFromCamera:
+    """ Latency, throughput and memory of casting batches of image points from a camera """
+    params = BATCH_SIZES
+    param_names = ["batch"]
+
+    def setup(self, batch):
+        self.cam = make_cameras(1)[0]
+        rs = np.random.RandomState(0)
+        self.col = rs.uniform(0, 4000, batch)
+        self.row = rs.uniform(0, 3000, batch)
+
+    def project(self):
+        self.cam.project_points_from_camera(self.col, self.row)
+
+    def time_project_points_from_camera(self, batch):
+        self.project()
+
+    def peakmem_project_points_from_camera(self, batch):
+        self.project()
+
+    def track_throughput(self, batch):
+        return throughput(self.project, batch)
+    track_throughput.unit = "points/s"
+
+class HeightsBetweenPoints:
+    """ Latency, throughput and memory of measuring batches of heights """
+    params = BATCH_SIZES
+    param_names = ["batch"]
+
+    def setup(self, batch):
+        self.cam = make_cameras(1)[0]
+        rs = np.random.RandomState(0)
+        col = rs.uniform(0, 4000, batch)
+        row = rs.uniform(0, 3000, batch)
+        self.base = np.column_stack([col, row])
+        self.peak = np.column_stack([col, row - rs.uniform(1, 50, batch)])
+
+    def measure(self):
+        self.cam.heights_between_points(self.base, self.peak)
+
+    def time_heights_between_points(self, batch):
+        self.measure()
+
+    def peakmem_heights_between_points(self, batch):
+        self.measure()
+
+    def track_throughput(self, batch):
+        return throughput(self.measure, batch)
+    track_throughput.unit = "heights/s"
@@ -0,0 +1,40 @@
+""" Benchmarks of loading datasets of cameras """
+
+import os
+
+from evtech import generate_dataset, load_dataset
+
+from .fixtures import throughput
+
+DATASET_SIZES = [10, 100, 1000]
+
+class LoadDataset:
+    """ Latency and throughput of loading datasets, serially, with threads, lazily and from the index """
+    params = (DATASET_SIZES, ["serial", "workers", "lazy", "index"])
+    param_names = ["cameras", "mode"]
+
+    def setup_cache(self):
+        # The datasets are written once in the benchmark directory and shared by all runs
+        for count in DATASET_SIZES:
+            generate_dataset("dataset_{}".format(count), stations=count // 5)
+
+    def setup(self, count, mode):
+        self.dir_path = os.path.abspath("dataset_{}".format(count))
+        self.options = {"serial": {}, "workers": {"workers": 4},
+                        "lazy": {"lazy": True}, "index": {"index": True}}[mode]
+        if mode == "index":
+            # Compile the index up front, only opening it is measured
+            load_dataset(self.dir_path, **self.options)
+
+    def load(self):
+        load_dataset(self.dir_path, **self.options)
+
+    def time_load_dataset(self, count, mode):
+        self.load()
+
+    def peakmem_load_dataset(self, count, mode):
+        self.load()
+
+    def track_throughput(self, count, mode):
+        return throughput(self.load, count)
+    track_throughput.unit = "cameras/s"
@@ -0,0 +1,21 @@
+""" Benchmarks of the time to import the package, each in a fresh interpreter """
+
+import subprocess
+import sys
+
+def import_time(statement, repeat = 5):
+    """ Measure the best time of an import statement in fresh interpreters, in seconds
+    """
+    code = "import time; start = time.perf_counter(); {}; print(time.perf_counter() - start)".format(statement)
+    return min(float(subprocess.check_output([sys.executable, "-c", code])) for _ in range(repeat))
+
+class ImportTime:
+    """ Time to import the package and its main features """
+    params = ["import evtech", "from evtech import Camera", "from evtech import load_dataset",
+              "from evtech import triangulate_points", "from evtech import *"]
+    param_names = ["statement"]
+    timeout = 120
+
+    def track_import_time(self, statement):
+        return import_time(statement)
+    track_import_time.unit = "seconds"
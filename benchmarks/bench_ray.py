@@ -0,0 +1,36 @@
+""" Benchmarks of intersecting rays with the ground """
+
+import numpy as np
+
+from .fixtures import BATCH_SIZES, SITE, make_cameras, throughput
+
+class IntersectAtElevation:
+    """ Latency of intersecting a single ray """
+    params = [False, True]
+    param_names = ["latlng"]
+
+    def setup(self, latlng):
+        self.ray = make_cameras(1)[0].project_from_camera(2000.0, 1500.0)
+
+    def time_intersect_at_elevation(self, latlng):
+        self.ray.intersect_at_elevation(SITE[2], latlng=latlng)
+
+class BundleIntersectAtElevation:
+    """ Latency, throughput and memory of intersecting batches of rays """
+    params = (BATCH_SIZES, [False, True])
+    param_names = ["batch", "latlng"]
+
+    def setup(self, batch, latlng):
+        rs = np.random.RandomState(0)
+        cam = make_cameras(1)[0]
+        self.rays = cam.project_points_from_camera(rs.uniform(0, 4000, batch), rs.uniform(0, 3000, batch))
+
+    def time_intersect_at_elevation(self, batch, latlng):
+        self.rays.intersect_at_elevation(SITE[2], latlng=latlng)
+
+    def peakmem_intersect_at_elevation(self, batch, latlng):
+        self.rays.intersect_at_elevation(SITE[2], latlng=latlng)
+
+    def track_throughput(self, batch, latlng):
+        return throughput(lambda: self.rays.intersect_at_elevation(SITE[2], latlng=latlng), batch)
+    track_throughput.unit = "rays/s"
@@ -0,0 +1,69 @@
+""" Benchmarks of triangulating points from several cameras """
+
+import numpy as np
+
+from evtech import triangulate_point_from_cameras, triangulate_points
+from evtech import generate_dataset, load_dataset, load_ground_truth, ground_truth_tracks
+
+from .fixtures import BATCH_SIZES, make_cameras, lonlat_points, throughput
+
+class TriangulatePointFromCameras:
+    """ Latency of triangulating a single point """
+
+    def setup(self):
+        self.cams = make_cameras(3)
+        lon, lat, elev = lonlat_points(1)
+        self.points = [cam.project_to_camera(lon[0], lat[0], elev[0]) for cam in self.cams]
+
+    def time_triangulate_point_from_cameras(self):
+        triangulate_point_from_cameras(self.cams, self.points)
+
+class TriangulatePoints:
+    """ Latency, throughput and memory of triangulating batches of tracks """
+    params = BATCH_SIZES
+    param_names = ["batch"]
+    timeout = 600
+
+    def setup(self, batch):
+        self.cams = make_cameras(3)
+        lon, lat, elev = lonlat_points(batch)
+        rs = np.random.RandomState(1)
+        self.tracks = np.stack([cam.project_points_to_camera(lon, lat, elev)[0] for cam in self.cams], axis=1)
+        self.tracks += rs.normal(0, 0.5, self.tracks.shape)
+
+    def triangulate(self):
+        triangulate_points(self.cams, self.tracks)
+
+    def time_triangulate_points(self, batch):
+        self.triangulate()
+
+    def peakmem_triangulate_points(self, batch):
+        self.triangulate()
+
+    def track_throughput(self, batch):
+        return throughput(self.triangulate, batch, repeat=1)
+    track_throughput.unit = "tracks/s"
+
+class TriangulateGroundTruth:
+    """ Speed and accuracy of triangulating the noisy observations of a synthetic flight """
+    timeout = 600
+
+    def setup_cache(self):
+        generate_dataset("ground_truth", stations=9, points=10000, pixel_noise=0.5)
+
+    def setup(self):
+        nadirs, obliques = load_dataset("ground_truth")
+        self.cams = nadirs + obliques
+        self.truth = load_ground_truth("ground_truth")
+        self.tracks = ground_truth_tracks(self.truth, self.cams)
+        seen = np.count_nonzero(~np.isnan(self.tracks[:, :, 0]), axis=1) >= 2
+        self.tracks = self.tracks[seen]
+        self.points = self.truth["points"][seen]
+
+    def time_triangulate_points(self):
+        triangulate_points(self.cams, self.tracks)
+
+    def track_mean_error(self):
+        points, _, _ = triangulate_points(self.cams, self.tracks)
+        return float(np.mean(np.linalg.norm(points - self.points, axis=1)))
+    track_mean_error.unit = "m"
@@ -0,0 +1,87 @@
+""" Generated fixtures for the benchmarks, so they run offline without a dataset """
+
+import time
+import numpy as np
+
+from pyproj import CRS
+
+from evtech import Camera
+from evtech.geodesy import get_transformer
+
+# The batch sizes the batched benchmarks are run at
+BATCH_SIZES = [1, 100, 10000, 1000000]
+
+# The site the generated cameras look at, in UTM zone 16N
+CRS_EPSG = 32616
+SITE = (410000.0, 4693000.0, 250.0)
+
+def camera_data(i, count):
+    """ Generate the serialized data of a camera looking at the site, in the layout of the dataset JSON files
+
+    Cameras are spread on a circle around the site and tilted 45 degrees towards it, except the
+    first camera which looks straight down.
+    """
+    focal = 10000.0
+    width, height = 4000, 3000
+    k = np.array([[focal, 0, width / 2], [0, focal, height / 2], [0, 0, 1]])
+
+    if i == 0:
+        center = np.array([SITE[0], SITE[1], SITE[2] + 1000.0])
+    else:
+        angle = 2 * np.pi * i / count
+        center = np.array([SITE[0] + 1000.0 * np.cos(angle), SITE[1] + 1000.0 * np.sin(angle), SITE[2] + 1000.0])
+
+    # Rows of R are the camera x, y and viewing axes in the world
+    forward = np.array(SITE) - center
+    forward /= np.linalg.norm(forward)
+    right = np.cross(forward, [0.0, 1.0, 0.0] if i == 0 else [0.0, 0.0, 1.0])
+    right /= np.linalg.norm(right)
+    down = np.cross(forward, right)
+    r = np.vstack([right, down, forward])
+    proj = k @ np.hstack([r, (-r @ center)[:, np.newaxis]])
+
+    lon, lat = get_transformer(CRS_EPSG, 4326).transform([SITE[0] - 200, SITE[0] + 200],
+                                                         [SITE[1] - 200, SITE[1] + 200])
+    return {
+        "projection": proj.tolist(),
+        "bounds": [0, 0, width - 1, height - 1],
+        "camera_center": center.tolist(),
+        "geo_bounds": [lon[0], lat[0], lon[1], lat[1]],
+        "elevation": SITE[2],
+    }
+
+def make_cameras(count):
+    """ Generate cameras looking at the site
+    """
+    cams = []
+    for i in range(count):
+        data = camera_data(i, count)
+        cams.append(Camera(np.array(data["projection"]), data["bounds"], data["camera_center"],
+                           data["geo_bounds"], data["elevation"], CRS.from_user_input(CRS_EPSG), ""))
+    return cams
+
+def world_points(count, seed = 0):
+    """ Generate UTM points scattered over the site
+    """
+    rs = np.random.RandomState(seed)
+    x = SITE[0] + rs.uniform(-100, 100, count)
+    y = SITE[1] + rs.uniform(-100, 100, count)
+    z = SITE[2] + rs.uniform(0, 30, count)
+    return np.column_stack([x, y, z])
+
+def lonlat_points(count, seed = 0):
+    """ Generate lon/lat/elevation points scattered over the site
+    """
+    pts = world_points(count, seed)
+    lon, lat = get_transformer(CRS_EPSG, 4326).transform(pts[:, 0], pts[:, 1])
+    return np.asarray(lon), np.asarray(lat), pts[:, 2]
+
+def throughput(func, count, repeat = 3):
+    """ Measure the best rate of a function processing count items, in items per second
+    """
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return count / best
@@ -1,10 +1,55 @@
-"""Top-level package for EVTech."""
+"""Top-level package for EVTech.
 
-from .camera import *
-from .geodesy import *
-from .dataset import *
-from .ray import *
+The modules of the package, and the dependencies they need, are imported on first use of a
+name from them, so importing the package itself is fast.
+"""
+
+import importlib
 
 __author__ = """David Nilosek"""
 __email__ = 'david.nilosek@eagleview.com'
 __version__ = '1.1.0'
+
+# The public names of each module
+_MODULE_NAMES = {
+    "camera": ("BaseCamera", "Camera", "camera_from_json", "triangulate_point_from_cameras"),
+    "geodesy": ("utm_crs_from_latlon", "utm_epsg_from_latlon", "utm_crs_from_zone", "get_crs",
+                "get_transformer", "same_crs", "crs_cache_stats", "clear_crs_cache"),
+    "instrumentation": ("enable_instrumentation", "disable_instrumentation", "reset_instrumentation",
+                        "add_instrumentation_callback", "remove_instrumentation_callback",
+                        "instrumentation_stats", "instrumentation_prometheus", "record"),
+    "image_cache": ("enable_image_cache", "disable_image_cache", "clear_image_cache", "image_cache_stats",
+                    "cached_imread"),
+    "rawstore": ("RAW_DIR", "raw_image_path", "convert_image", "build_raw_store", "open_raw_image"),
+    "index": ("DEFAULT_INDEX_NAME", "compile_dataset_index", "DatasetIndex", "open_dataset_index"),
+    "dataset": ("LazyCamera", "load_dataset", "iter_images"),
+    "ray": ("Ray", "RayBundle"),
+    "dsm": ("ElevationModel",),
+    "ortho": ("ortho_grid", "orthorectify", "open_orthophoto", "render_tile"),
+    "mosaic": ("MOSAIC_MANIFEST", "build_mosaic", "read_mosaic"),
+    "synthetic": ("GROUND_TRUTH_NAME", "generate_dataset", "load_ground_truth", "ground_truth_tracks"),
+    "triangulation": ("triangulate_points", "triangulate_points_robust", "stack_cameras"),
+    "epipolar": ("fundamental_matrix", "fundamental_cache_stats", "clear_fundamental_cache",
+                 "epipolar_lines", "epipolar_segments"),
+    "collection": ("CameraCollection",),
+    "cameraset": ("CameraSet", "CameraView"),
+}
+_NAME_MODULES = {name: module for module, names in _MODULE_NAMES.items() for name in names}
+_SUBMODULES = set(_MODULE_NAMES) | {"cache"}
+
+__all__ = list(_NAME_MODULES)
+
+def __getattr__(name):
+    """ Get a public name from the module defining it, or a submodule, importing it on first access
+
+    Names are not cached in the package, so functions replaced in their modules, such as by
+    `enable_instrumentation`, are always found.
+    """
+    if name in _NAME_MODULES:
+        return getattr(importlib.import_module("." + _NAME_MODULES[name], __name__), name)
+    if name in _SUBMODULES:
+        return importlib.import_module("." + name, __name__)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__) | _SUBMODULES)
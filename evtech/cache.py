@@ -0,0 +1,128 @@
+""" Thread-safe bounded caches used across evtech """
+
+import threading
+
+from collections import OrderedDict
+
+
+class LRUCache():
+    """ A thread-safe least recently used cache with hit/miss statistics
+
+    :param maxsize: The maximum number of entries held by the cache, or the maximum total size when getsizeof is given
+    :type maxsize: int
+    :param getsizeof: function(value) giving the size of an entry, defaults to None which counts entries
+    :type getsizeof: function, optional
+    """
+
+    def __init__(self, maxsize=128, getsizeof=None):
+        """ Constructor method
+        """
+        self.maxsize = maxsize
+        self.getsizeof = getsizeof
+        self.currsize = 0
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """ Get a value from the cache, marking it as recently used
+
+        :param key: The key of the entry
+        :type key: hashable
+        :param default: The value returned when the key is not cached, defaults to None
+        :type default: object, optional
+        :return: The cached value or the default
+        :rtype: object
+        """
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """ Add a value to the cache, evicting the least recently used entries if full
+
+        :param key: The key of the entry
+        :type key: hashable
+        :param value: The value to cache
+        :type value: object
+        """
+        size = self.getsizeof(value) if self.getsizeof is not None else 1
+        if size > self.maxsize:
+            # Never cache entries that can not fit
+            return
+
+        with self._lock:
+            if key in self._data:
+                self.currsize -= self._sizes[key]
+            self._data[key] = value
+            self._sizes[key] = size
+            self.currsize += size
+            self._data.move_to_end(key)
+            while self.currsize > self.maxsize:
+                old_key, _ = self._data.popitem(last=False)
+                self.currsize -= self._sizes.pop(old_key)
+                self.evictions += 1
+
+    def get_or_create(self, key, factory):
+        """ Get a value from the cache, creating and caching it on a miss
+
+        :param key: The key of the entry
+        :type key: hashable
+        :param factory: A function with no arguments that creates the value
+        :type factory: function
+        :return: The cached value
+        :rtype: object
+        """
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+
+        # Create outside of the lock so slow factories do not block other keys
+        value = factory()
+        with self._lock:
+            if key in self._data:
+                return self._data[key]
+        self.put(key, value)
+        return value
+
+    def clear(self):
+        """ Remove all entries and reset the statistics
+        """
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self.currsize = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        """ Get the cache statistics
+
+        :return: The hits, misses, evictions, number of entries, current size and maximum size of the cache
+        :rtype: dict
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._data),
+                "currsize": self.currsize,
+                "maxsize": self.maxsize,
+            }
@@ -1,46 +1,68 @@
 """Camera class for evtech."""
 
 import numpy as np
-import utm
-import cv2
 import math
-import scipy.optimize as optimize
 
-from pyproj import CRS, Transformer
-from shapely.geometry import Polygon, box
+from .dsm import ElevationModel
+from .geodesy import get_transformer, utm_crs_from_latlon
+from .image_cache import cached_imread
+from .instrumentation import record
+from .rawstore import open_raw_image
+from .ray import Ray, RayBundle
+
+# Names of the OpenCV decoding flags for each supported reduction factor
+_REDUCED_FLAGS = {
+    1: "IMREAD_COLOR",
+    2: "IMREAD_REDUCED_COLOR_2",
+    4: "IMREAD_REDUCED_COLOR_4",
+    8: "IMREAD_REDUCED_COLOR_8",
+}
+
+class BaseCamera():
+    """The operations shared by all cameras, for subclasses which hold the data of the camera
+
+    Subclasses provide the `projection_matrix`, `image_bounds`, `image_center`, `geo_bounds`, `elevation`,
+    `crs` and `image_path` of the camera, along with the cached calibration returned by `_get_calibration` and
+    the orientation returned by `_get_orientation`.
+    `Camera` stores the data itself while `evtech.CameraView` reads it from the arrays of a `evtech.CameraSet`.
+    """
+    __slots__ = ()
 
-from .geodesy import utm_crs_from_latlon
-from .ray import Ray
+    @property
+    def camera_matrix(self):
+        """ The 3x3 intrinsic camera matrix K decomposed from the projection matrix
+        """
+        return self._get_calibration()["K"]
 
-class Camera():
-    """This class represents camera information for a given image and allows for world<->camera interactions
-    
-    :param proj: The 3x4 projection matrix for the camera
-    :type proj: class: `numpy.array`
-    :param bounds: The bounds of the image chip within the larger image [x_min, y_min, x_max, y_max]
-    :type bounds: list
-    :param cen: The center of the camera [x, y, z]
-    :type cen: list
-    :param geo_bounds: The geographic bounds of the image in lat/lon [x_min, y_min, x_max, y_max]
-    :type geo_bounds: list
-    :param elev: The average elevation of the image
-    :type elev: float
-    :param crs: The coordinate system for the projection matrix (Must be linear such as UTM)
-    :type crs: class: `pyproj.CRS`
-    :param image_path: The filepath to the image data
-    :type path: str
-    """
+    @property
+    def rotation_matrix(self):
+        """ The 3x3 rotation matrix R decomposed from the projection matrix
+        """
+        return self._get_calibration()["R"]
 
-    def __init__(self, proj, bounds, cen, geo_bounds, elev, crs, image_path):
-        """ Constructor method
+    @property
+    def translation(self):
+        """ The translation vector t decomposed from the projection matrix
         """
-        self.projection_matrix = proj
-        self.image_bounds = bounds
-        self.image_center = cen
-        self.geo_bounds = geo_bounds
-        self.elevation = elev
-        self.crs = crs
-        self.image_path = image_path
+        return self._get_calibration()["t"]
+
+    @property
+    def focal_length(self):
+        """ The focal length in pixels, averaged over the x and y axes
+        """
+        return self._get_calibration()["focal"]
+
+    @property
+    def inverse_projection(self):
+        """ The inverse of the 3x3 left submatrix M of the projection matrix
+        """
+        return self._get_calibration()["M_inv"]
+
+    @property
+    def camera_position(self):
+        """ The center of the camera computed from the projection matrix
+        """
+        return self._get_calibration()["center"]
 
     def set_path(self, image_path):
         """ Mutator to set path data member
@@ -64,6 +86,8 @@ class Camera():
         :return: The bounds of the image on the ground
         :rtype: class: `shapely.Polygon`
         """
+        from shapely.geometry import Polygon, box
+
         bounds = box(minx = self.geo_bounds[0], miny=self.geo_bounds[1], 
                     maxx = self.geo_bounds[2], maxy=self.geo_bounds[3])
         return(Polygon(bounds))
@@ -80,20 +104,40 @@ class Camera():
         :rtype: class: `evtech.Ray`
         """
 
-        # subset the projection matrix
-        m = self.projection_matrix[0:3,0:3]
-
         # Offset for crop
         col, row = self.to_full_image(col,row)
 
         # Get point and project to to normalized plane
         pt = np.transpose(np.array([[col,row,1.0]]))
-        norm_pt = np.linalg.inv(m) @ pt
+        norm_pt = self.inverse_projection @ pt
 
         # Create ray
         [vec_norm_pt] = np.transpose(norm_pt).tolist()
         return Ray(self.image_center[0:3], vec_norm_pt, self.crs)
 
+    def project_points_from_camera(self, col, row):
+        """ Project rays from the camera for many pixels in a single pass
+
+        :param col: The column indices of the pixels to project
+        :type col: class: `np.Array`
+        :param row: The row indices of the pixels to project
+        :type row: class: `np.Array`
+
+        :return: The rays from the camera
+        :rtype: class: `evtech.RayBundle`
+        """
+        col, row = np.broadcast_arrays(np.asarray(col, dtype=float).ravel(),
+                                       np.asarray(row, dtype=float).ravel())
+
+        # Offset for crop
+        col, row = self.to_full_image(col, row)
+
+        # Project all points to the normalized plane with one matmul
+        pts = np.vstack([col, row, np.ones_like(col)])
+        norm_pts = self.inverse_projection @ pts
+
+        return RayBundle(self.image_center[0:3], norm_pts.T, self.crs)
+
     def project_to_camera(self, lon, lat, elevation):
         """ Project a lat/lon/elevation point into the image
         
@@ -108,7 +152,7 @@ class Camera():
         """
 
         # Convert lat/lon/elev to camera CRS
-        transformer = Transformer.from_crs(CRS.from_user_input(4326),self.crs, always_xy=True)
+        transformer = get_transformer(4326, self.crs)
         x,y,z = transformer.transform(lon, lat, elevation)
         pt = np.transpose(np.array([[x,y,z,1.0]]))
 
@@ -122,6 +166,52 @@ class Camera():
         img_pt = np.transpose(img_pt)
         return img_pt[0][0:2]
 
+    def project_points_to_camera(self, lon, lat, elevation):
+        """ Project arrays of lat/lon/elevation points into the image in a single pass
+
+        :param lon: The longitiudes
+        :type lon: class: `np.Array`
+        :param lat: The latitiudes
+        :type lat: class: `np.Array`
+        :param elevation: The elevations, a scalar is applied to all points
+        :type elevation: class: `np.Array`
+        :return: The (N,2) col, row values of the pixels and a mask of points in front of the camera
+        :rtype: tuple: class: `np.Array`, class: `np.Array`
+        """
+        lon, lat, elevation = np.broadcast_arrays(np.asarray(lon, dtype=float),
+                                                  np.asarray(lat, dtype=float),
+                                                  np.asarray(elevation, dtype=float))
+
+        # Convert all points to camera CRS with one transform
+        transformer = get_transformer(4326, self.crs)
+        x,y,z = transformer.transform(lon.ravel(), lat.ravel(), elevation.ravel())
+        return self.project_world_points(np.column_stack([x,y,z]))
+
+    def project_world_points(self, world_pts):
+        """ Project (N,3) points already in the camera CRS into the image, without the conversion
+        from lat/lon of `project_points_to_camera`
+
+        :param world_pts: The points to project
+        :type world_pts: class: `np.Array`
+        :return: The (N,2) col, row values of the pixels and a mask of points in front of the camera
+        :rtype: tuple: class: `np.Array`, class: `np.Array`
+        """
+        world_pts = np.asarray(world_pts, dtype=float).reshape(-1, 3)
+        proj = self.projection_matrix
+
+        # Do projection, the homogeneous coordinate is applied as the translation column
+        img_pt_h = world_pts @ proj[:,0:3].T + proj[:,3]
+        w = img_pt_h[:,2]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            img_pt = img_pt_h[:,0:2] / w[:,np.newaxis]
+
+        # Offset pixel by bounds
+        img_pt -= np.array(self.image_bounds[0:2], dtype=float)
+
+        # Points are in front when depth has the same sign as the orientation of M
+        in_front = w * self._get_orientation() > 0
+        return img_pt, in_front
+
     def height_between_points(self, base_point, peak_point, elev=None):
         """ Compute the height between two image points, given the elevation of the base point. 
         If no elevation is passed the stored elevation will be used.
@@ -153,17 +243,48 @@ class Camera():
         # Get depth at midpoint between points
         depth_mid = depth*c
 
-        # Extract focal length from proj matrix
-        camera_matrix,_,_,_,_,_,_ = cv2.decomposeProjectionMatrix(self.projection_matrix)
-        focal_x = camera_matrix[0][0]
-        focal_y = camera_matrix[1][1]
-        focal = (focal_x + focal_y) / 2
+        # Focal length from the cached decomposition of the proj matrix
+        focal = self.focal_length
 
         # Compute height using simlar triangles
         dist = np.linalg.norm(np.array(base_point) - np.array(peak_point))
         height = dist / focal * depth_mid
         return height[0]
 
+    def heights_between_points(self, base_points, peak_points, elev=None):
+        """ Compute the heights between many pairs of image points in a single pass, using the same
+        model as `height_between_points`. If no elevation is passed the stored elevation will be used.
+
+        :param base_points: The (N,2) image points at the base elevations
+        :type base_points: class: `np.Array`
+        :param peak_points: The (N,2) image points to compute the heights at
+        :type peak_points: class: `np.Array`
+        :param elev: The elevation of each base point, a scalar for all points, or an elevation model the base points are intersected with, defaults to None
+        :type elev: class: `np.Array` or class: `evtech.ElevationModel`, optional
+        :return: The height for each pair of points
+        :rtype: class: `np.Array`
+        """
+        base_points = np.asarray(base_points, dtype=float).reshape(-1, 2)
+        peak_points = np.asarray(peak_points, dtype=float).reshape(-1, 2)
+
+        # Compute rays from all points
+        base_rays = self.project_points_from_camera(base_points[:,0], base_points[:,1])
+        peak_rays = self.project_points_from_camera(peak_points[:,0], peak_points[:,1])
+
+        # Cosine of the angle between each pair of rays, the directions are normalized
+        c = np.einsum('ij,ij->i', base_rays.directions, peak_rays.directions)
+
+        # Compute depth at the given elevations
+        if elev is None:
+            elev = self.elevation
+        elif isinstance(elev, ElevationModel):
+            elev = elev.intersect(base_rays, latlng=False)[:,2]
+        depth = base_rays.depth_at_elevation(elev)
+
+        # Compute heights using simlar triangles at the depth of the midpoints
+        dist = np.linalg.norm(base_points - peak_points, axis=1)
+        return dist / self.focal_length * depth * c
+
     def to_full_image(self, col, row):
         """ Convert an image point from the subset image to the full image
         
@@ -178,15 +299,190 @@ class Camera():
         r_row = row + self.image_bounds[1]
         return r_col, r_row
         
-    def load_image(self, loader=cv2.imread):
+    def load_image(self, loader=None):
         """ Load the image for this camera
+
+        When the image cache is enabled with `enable_image_cache` decoded images are shared
+        between calls and returned read-only.
         
         :param loader: A function to load the image, defaults to cv2.imread
         :type loader: function, optional
         :return: image data
         :rtype: numpy.array
         """
-        return loader(str(self.image_path))
+        if loader is None:
+            import cv2
+            loader = cv2.imread
+        return cached_imread(self.image_path, loader)
+
+    def load_chip(self, window=None, scale=1, loader=None):
+        """ Load a window of the image for this camera, optionally at a reduced resolution
+
+        Reduced resolutions are decoded directly at the lower resolution using the
+        `cv2.IMREAD_REDUCED_COLOR_*` flags, so a thumbnail never holds the full resolution
+        image in memory. The window is aligned to the scale and clipped to the image, chip
+        pixel (c, r) covers the image pixels starting at (x_min + c * scale, y_min + r * scale)
+        of the returned window, which can be passed to `to_full_image`.
+
+        :param window: The window [x_min, y_min, x_max, y_max] in image pixels, the max being the last pixel like the image bounds, defaults to the whole image
+        :type window: list, optional
+        :param scale: The reduction factor, one of 1, 2, 4 or 8, defaults to 1
+        :type scale: int, optional
+        :param loader: function(str) that loads the full resolution image, which is then reduced, defaults to decoding with OpenCV
+        :type loader: function, optional
+        :return: The chip and the window of image pixels it covers
+        :rtype: tuple: numpy.array, list
+        """
+        import cv2
+
+        if scale not in _REDUCED_FLAGS:
+            raise ValueError("Unsupported scale: {}".format(scale))
+
+        if loader is None:
+            img = cached_imread(self.image_path, cv2.imread, getattr(cv2, _REDUCED_FLAGS[scale]))
+            if img is None:
+                raise IOError("Unable to read image: {}".format(self.image_path))
+
+            # The reduced image only gives the full size to within the scale, the image matches the bounds
+            width, height = img.shape[1] * scale, img.shape[0] * scale
+            if self.image_bounds is not None:
+                width = min(width, int(self.image_bounds[2] - self.image_bounds[0]) + 1)
+                height = min(height, int(self.image_bounds[3] - self.image_bounds[1]) + 1)
+        else:
+            img = cached_imread(self.image_path, loader)
+            height, width = img.shape[0:2]
+            if scale > 1:
+                size = (-(-img.shape[1] // scale), -(-img.shape[0] // scale))
+                img = cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+
+        # Copy so the chip does not keep the decoded image alive
+        c0, r0, c1, r1 = _clip_window(window, img.shape, scale)
+        chip = img[r0:r1 + 1, c0:c1 + 1].copy()
+        return chip, [c0 * scale, r0 * scale, min((c1 + 1) * scale, width) - 1, min((r1 + 1) * scale, height) - 1]
+
+    def load_raw_chip(self, window=None):
+        """ Get a window of the image for this camera from the raw store of its dataset
+
+        The chip is a read-only view of the memory mapped raw image, so no data is copied
+        or decoded, see `evtech.build_raw_store`.
+
+        :param window: The window [x_min, y_min, x_max, y_max] in image pixels, the max being the last pixel like the image bounds, defaults to the whole image
+        :type window: list, optional
+        :return: The chip and the window of image pixels it covers
+        :rtype: tuple: numpy.memmap, list
+        """
+        img = open_raw_image(self.image_path)
+        c0, r0, c1, r1 = _clip_window(window, img.shape, 1)
+        return img[r0:r1 + 1, c0:c1 + 1], [c0, r0, c1, r1]
+
+class Camera(BaseCamera):
+    """This class represents camera information for a given image and allows for world<->camera interactions
+    
+    :param proj: The 3x4 projection matrix for the camera
+    :type proj: class: `numpy.array`
+    :param bounds: The bounds of the image chip within the larger image [x_min, y_min, x_max, y_max]
+    :type bounds: list
+    :param cen: The center of the camera [x, y, z]
+    :type cen: list
+    :param geo_bounds: The geographic bounds of the image in lat/lon [x_min, y_min, x_max, y_max]
+    :type geo_bounds: list
+    :param elev: The average elevation of the image
+    :type elev: float
+    :param crs: The coordinate system for the projection matrix (Must be linear such as UTM)
+    :type crs: class: `pyproj.CRS`
+    :param image_path: The filepath to the image data
+    :type path: str
+    """
+
+    def __init__(self, proj, bounds, cen, geo_bounds, elev, crs, image_path):
+        """ Constructor method
+        """
+        self.projection_matrix = proj
+        self.image_bounds = bounds
+        self.image_center = cen
+        self.geo_bounds = geo_bounds
+        self.elevation = elev
+        self.crs = crs
+        self.image_path = image_path
+
+    @property
+    def projection_matrix(self):
+        """ The 3x4 projection matrix for the camera, setting it clears the cached calibration
+        """
+        return self._projection_matrix
+
+    @projection_matrix.setter
+    def projection_matrix(self, proj):
+        self._projection_matrix = proj
+        self._calibration = None
+        self._orientation = None
+
+    @property
+    def image_bounds(self):
+        """ The bounds of the image chip within the larger image, setting them clears the cached calibration
+        """
+        return self._image_bounds
+
+    @image_bounds.setter
+    def image_bounds(self, bounds):
+        self._image_bounds = bounds
+        self._calibration = None
+
+    def _get_calibration(self):
+        """ Get the calibration derived from the projection matrix, computing it on first use
+
+        :return: The cached calibration values
+        :rtype: dict
+        """
+        if self._calibration is None:
+            self._calibration = _calibrate(np.asarray(self.projection_matrix, dtype=float))
+        return self._calibration
+
+    def _get_orientation(self):
+        """ Get the sign of the determinant of M, computed on first use without decomposing the projection matrix
+
+        :return: 1 when points in front of the camera have a positive depth, otherwise -1
+        :rtype: float
+        """
+        if self._orientation is None:
+            self._orientation = _orientation(np.asarray(self.projection_matrix, dtype=float))
+        return self._orientation
+
+def _calibrate(proj):
+    """ Decompose a projection matrix into the calibration values cached by a camera
+    """
+    import cv2
+
+    m = proj[0:3,0:3]
+    camera_matrix, rotation, center_h, _, _, _, _ = cv2.decomposeProjectionMatrix(proj)
+    center = (center_h[0:3] / center_h[3]).ravel()
+    return {
+        "K": camera_matrix,
+        "R": rotation,
+        "t": -rotation @ center,
+        "focal": (camera_matrix[0][0] + camera_matrix[1][1]) / 2,
+        "M_inv": np.linalg.inv(m),
+        "center": center,
+    }
+
+def _orientation(proj):
+    """ Get the sign of the determinant of the left 3x3 submatrix M of projection matrices
+    """
+    return np.sign(np.linalg.det(proj[..., 0:3]))
+
+def _clip_window(window, shape, scale):
+    """ Convert a window in image pixels to the inclusive bounds of pixels of an image reduced by scale
+    """
+    height, width = shape[0:2]
+    if window is None:
+        return 0, 0, width - 1, height - 1
+    c0 = max(int(math.floor(window[0] / scale)), 0)
+    r0 = max(int(math.floor(window[1] / scale)), 0)
+    c1 = min(int(math.floor(window[2] / scale)), width - 1)
+    r1 = min(int(math.floor(window[3] / scale)), height - 1)
+    if c1 < c0 or r1 < r0:
+        raise ValueError("Window does not overlap the image: {}".format(window))
+    return c0, r0, c1, r1
 
 def camera_from_json(json_data, image_path = ""):
     """ Generate a camera from the seralized JSON data
@@ -249,13 +545,17 @@ def triangulate_point_from_cameras(cameras, points, to_latlng = False):
             res_sum += res
         return res_sum
 
+    import scipy.optimize as optimize
+
     X0 = np.transpose([X[0], X[1], X[2]])
     result = optimize.minimize(f, X0, method='nelder-mead')
     X = result.x
+    record("triangulate_point_from_cameras.iterations", result.nit)
+    record("triangulate_point_from_cameras.evaluations", result.nfev)
 
     # Convert if needed
     if to_latlng:
-        transformer = Transformer.from_crs(cameras[0].crs, CRS.from_user_input(4326), always_xy=True)
+        transformer = get_transformer(cameras[0].crs, 4326)
         X[0],X[1],X[2] = transformer.transform(X[0], X[1], X[2])
 
     return X
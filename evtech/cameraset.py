@@ -0,0 +1,307 @@
+""" Array backed sets of cameras """
+
+import numpy as np
+
+from .camera import BaseCamera, Camera, _calibrate
+from .collection import CameraCollection, _BoxTree
+from .geodesy import get_crs
+
+class CameraSet(CameraCollection):
+    """ A collection of cameras stored as contiguous arrays, with one entry per camera
+
+    The projection matrices are stored as one (C,3,4) array and the bounds, centers, geo bounds and
+    elevations as (C,...) arrays, so operations across cameras are vectorized and no per camera
+    objects are kept. Each distinct CRS is stored once, usually one per UTM zone. Indexing or
+    iterating yields `CameraView` cameras which read from the arrays of the set.
+
+    :param projection_matrices: The (C,3,4) projection matrices
+    :type projection_matrices: class: `numpy.array`
+    :param image_bounds: The (C,4) image bounds [x_min, y_min, x_max, y_max]
+    :type image_bounds: class: `numpy.array`
+    :param camera_centers: The (C,3) camera centers
+    :type camera_centers: class: `numpy.array`
+    :param geo_bounds: The (C,4) geographic bounds in lat/lon [x_min, y_min, x_max, y_max]
+    :type geo_bounds: class: `numpy.array`
+    :param elevations: The (C,) average elevations of the images
+    :type elevations: class: `numpy.array`
+    :param crs: The CRS of each camera, as any input of `evtech.get_crs` such as EPSG codes
+    :type crs: list
+    :param image_paths: The paths to the image data of each camera, defaults to empty paths
+    :type image_paths: list, optional
+    :param node_size: The number of children of each node of the spatial index, defaults to 16
+    :type node_size: int, optional
+    """
+
+    def __init__(self, projection_matrices, image_bounds, camera_centers, geo_bounds, elevations, crs,
+                 image_paths = None, node_size = 16):
+        """ Constructor method
+        """
+        # Memory mapped arrays of the right layout are used in place
+        self._projection_matrices = _as_array(projection_matrices, (-1, 3, 4))
+        count = len(self._projection_matrices)
+        self._image_bounds = _as_array(image_bounds, (count, 4))
+        self._camera_centers = _as_array(camera_centers, (count, 3))
+        self.geo_bounds = _as_array(geo_bounds, (count, 4))
+        self.elevations = _as_array(elevations, (count,))
+        self.image_paths = list(image_paths) if image_paths is not None else [""] * count
+        if len(self.image_paths) != count:
+            raise ValueError("Expected {} image paths, got {}".format(count, len(self.image_paths)))
+
+        # Keep one CRS object per distinct CRS, cameras hold the index of theirs
+        crs = list(crs)
+        if len(crs) != count:
+            raise ValueError("Expected {} CRS, got {}".format(count, len(crs)))
+        labels = {}
+        inputs = {}
+        self.crs_list = []
+        self.crs_index = np.empty(count, dtype=np.int32)
+        for i, value in enumerate(crs):
+            key = value if isinstance(value, (int, np.integer, str)) else id(value)
+            label = inputs.get(key)
+            if label is None:
+                value = get_crs(value)
+                label = labels.setdefault(value.srs, len(self.crs_list))
+                if label == len(self.crs_list):
+                    self.crs_list.append(value)
+                inputs[key] = label
+            self.crs_index[i] = label
+
+        self._tree = _BoxTree(self.geo_bounds, node_size)
+        self._node_size = node_size
+        self._crs_groups = (self.crs_index.astype(np.intp), self.crs_list)
+        self._calibrations = {}
+        self._orientations = None
+
+    @classmethod
+    def from_cameras(cls, cameras, node_size = 16):
+        """ Create a set from cameras
+
+        :param cameras: The cameras
+        :type cameras: list
+        :param node_size: The number of children of each node of the spatial index, defaults to 16
+        :type node_size: int, optional
+        :return: The set of the cameras
+        :rtype: class: `evtech.CameraSet`
+        """
+        cameras = list(cameras)
+        return cls(np.array([np.asarray(cam.projection_matrix, dtype=float) for cam in cameras]).reshape(-1, 3, 4),
+                   [cam.image_bounds[0:4] for cam in cameras],
+                   [cam.image_center[0:3] for cam in cameras],
+                   [cam.geo_bounds[0:4] for cam in cameras],
+                   [cam.elevation for cam in cameras],
+                   [cam.crs for cam in cameras],
+                   [cam.image_path for cam in cameras], node_size)
+
+    @classmethod
+    def from_index(cls, index, node_size = 16):
+        """ Create the sets of the nadir and oblique cameras of a dataset index, the arrays of the
+        sets are read-only views of the memory mapped index
+
+        :param index: The dataset index
+        :type index: class: `evtech.DatasetIndex`
+        :param node_size: The number of children of each node of the spatial index, defaults to 16
+        :type node_size: int, optional
+        :return: A tuple with the set of nadir cams and the set of oblique cams
+        :rtype: tuple: class: `evtech.CameraSet`, class: `evtech.CameraSet`
+        """
+        arrays = index.arrays
+        codes, inverse = np.unique(np.asarray(arrays["epsg"]), return_inverse=True)
+        crs_list = [get_crs(int(code)) for code in codes]
+        crs = [crs_list[i] for i in inverse]
+        image_paths = [index.image_path(i) for i in range(len(index))]
+
+        sets = []
+        for part in (slice(0, index.nadir_count), slice(index.nadir_count, len(index))):
+            sets.append(cls(arrays["projection"][part], arrays["bounds"][part], arrays["camera_center"][part],
+                            arrays["geo_bounds"][part], arrays["elevation"][part], crs[part],
+                            image_paths[part], node_size))
+        return tuple(sets)
+
+    @property
+    def cameras(self):
+        """ The cameras of the set as a sequence of `CameraView`
+        """
+        return _CameraViews(self)
+
+    def __len__(self):
+        return len(self.elevations)
+
+    def __iter__(self):
+        return (CameraView(self, i) for i in range(len(self)))
+
+    def __getitem__(self, idx):
+        """ Get the camera at an index, or a new set of the cameras at a slice or array of indices
+        """
+        if isinstance(idx, (int, np.integer)):
+            if idx < 0:
+                idx += len(self)
+            if idx < 0 or idx >= len(self):
+                raise IndexError("Camera index out of range: {}".format(idx))
+            return CameraView(self, int(idx))
+        return self.subset(idx)
+
+    def subset(self, idx):
+        """ Create a set of some of the cameras of this set
+
+        :param idx: The indices, a slice or a boolean mask of the cameras
+        :type idx: numpy.Array or slice
+        :return: The set of the cameras
+        :rtype: class: `evtech.CameraSet`
+        """
+        if not isinstance(idx, slice):
+            idx = np.arange(len(self))[idx]
+            paths = [self.image_paths[i] for i in idx]
+        else:
+            paths = self.image_paths[idx]
+        crs = [self.crs_list[i] for i in self.crs_index[idx]]
+        return CameraSet(self._projection_matrices[idx], self._image_bounds[idx], self._camera_centers[idx],
+                         self.geo_bounds[idx], self.elevations[idx], crs, paths, self._node_size)
+
+    def _calibration(self, i):
+        """ Get the calibration of a camera, computing it on first use
+        """
+        calibration = self._calibrations.get(i)
+        if calibration is None:
+            calibration = self._calibrations[i] = _calibrate(self._projection_matrices[i].astype(float))
+        return calibration
+
+    def _orientation(self, i):
+        """ Get the sign of the determinant of M of a camera, computed for all cameras at once on first use
+        """
+        if self._orientations is None:
+            self._orientations = np.sign(np.linalg.det(self._projection_matrices[:, :, 0:3]))
+        return self._orientations[i]
+
+class CameraView(BaseCamera):
+    """ A camera of a `CameraSet`, reading its data from the arrays of the set
+
+    Views have all the operations of `evtech.BaseCamera`, but only hold the set and their index in
+    slots so they are cheap to create. Setting the data of a view writes into the arrays of the set,
+    sets created from a dataset index are read-only and raise a ValueError instead.
+
+    :param camera_set: The set of the camera
+    :type camera_set: class: `evtech.CameraSet`
+    :param index: The index of the camera in the set
+    :type index: int
+    """
+    __slots__ = ("camera_set", "index")
+
+    def __init__(self, camera_set, index):
+        """ Constructor method
+        """
+        self.camera_set = camera_set
+        self.index = index
+
+    @property
+    def projection_matrix(self):
+        """ The 3x4 projection matrix for the camera, a view of the arrays of the set
+        """
+        return self.camera_set._projection_matrices[self.index]
+
+    @projection_matrix.setter
+    def projection_matrix(self, proj):
+        self.camera_set._projection_matrices[self.index] = proj
+        self.camera_set._calibrations.pop(self.index, None)
+        self.camera_set._orientations = None
+
+    @property
+    def image_bounds(self):
+        """ The bounds of the image chip within the larger image
+        """
+        return self.camera_set._image_bounds[self.index]
+
+    @image_bounds.setter
+    def image_bounds(self, bounds):
+        self.camera_set._image_bounds[self.index] = bounds
+
+    @property
+    def image_center(self):
+        """ The center of the camera [x, y, z]
+        """
+        return self.camera_set._camera_centers[self.index]
+
+    @image_center.setter
+    def image_center(self, center):
+        self.camera_set._camera_centers[self.index] = center
+
+    @property
+    def geo_bounds(self):
+        """ The geographic bounds of the image in lat/lon
+        """
+        return self.camera_set.geo_bounds[self.index]
+
+    @property
+    def elevation(self):
+        """ The average elevation of the image
+        """
+        return float(self.camera_set.elevations[self.index])
+
+    @elevation.setter
+    def elevation(self, elev):
+        self.camera_set.elevations[self.index] = elev
+
+    @property
+    def crs(self):
+        """ The coordinate system of the projection matrix, shared by the cameras in its UTM zone
+        """
+        return self.camera_set.crs_list[self.camera_set.crs_index[self.index]]
+
+    @property
+    def image_path(self):
+        """ The filepath to the image data
+        """
+        return self.camera_set.image_paths[self.index]
+
+    @image_path.setter
+    def image_path(self, image_path):
+        self.camera_set.image_paths[self.index] = image_path
+
+    def _get_calibration(self):
+        """ Get the calibration derived from the projection matrix, cached by the set
+        """
+        return self.camera_set._calibration(self.index)
+
+    def _get_orientation(self):
+        """ Get the sign of the determinant of M, cached by the set
+        """
+        return self.camera_set._orientation(self.index)
+
+    def __eq__(self, other):
+        if isinstance(other, CameraView):
+            return self.camera_set is other.camera_set and self.index == other.index
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((id(self.camera_set), self.index))
+
+    def __reduce__(self):
+        # Pickle the camera on its own rather than its whole set
+        return (Camera, (np.array(self.projection_matrix, dtype=float), self.image_bounds.tolist(),
+                         self.image_center.tolist(), self.geo_bounds.tolist(), self.elevation,
+                         self.crs, self.image_path))
+
+class _CameraViews():
+    """ A sequence of the cameras of a set, creating the views on access
+    """
+
+    def __init__(self, camera_set):
+        self.camera_set = camera_set
+
+    def __len__(self):
+        return len(self.camera_set)
+
+    def __iter__(self):
+        return iter(self.camera_set)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [CameraView(self.camera_set, i) for i in range(len(self.camera_set))[idx]]
+        return self.camera_set[idx]
+
+def _as_array(values, shape):
+    """ Get values as a float array of a shape, without copying arrays which already match
+    """
+    arr = np.asarray(values)
+    if arr.dtype != np.float64:
+        arr = arr.astype(np.float64)
+    return arr.reshape(shape)
@@ -0,0 +1,308 @@
+""" Collections of cameras with spatial queries """
+
+import numpy as np
+
+from .geodesy import get_transformer
+
+class CameraCollection():
+    """ A collection of cameras with a spatial index over their geographic bounds
+
+    The index is a packed R-tree built once from the `geo_bounds` of every camera, so that point,
+    bounding box and polygon queries only visit the cameras near the query.
+
+    :param cameras: The cameras in the collection
+    :type cameras: list
+    :param node_size: The number of children of each node of the index, defaults to 16
+    :type node_size: int, optional
+    """
+
+    def __init__(self, cameras, node_size = 16):
+        """ Constructor method
+        """
+        self.cameras = list(cameras)
+        self.geo_bounds = np.array([cam.geo_bounds for cam in self.cameras], dtype=float).reshape(-1, 4)
+        self._tree = _BoxTree(self.geo_bounds, node_size)
+        self._projection_matrices = None
+        self._image_bounds = None
+        self._camera_centers = None
+        self._crs_groups = None
+
+    def __len__(self):
+        return len(self.cameras)
+
+    def __iter__(self):
+        return iter(self.cameras)
+
+    def __getitem__(self, idx):
+        return self.cameras[idx]
+
+    @property
+    def projection_matrices(self):
+        """ The (C,3,4) stacked projection matrices of the cameras
+        """
+        if self._projection_matrices is None:
+            self._projection_matrices = np.stack([np.asarray(cam.projection_matrix, dtype=float)
+                                                  for cam in self.cameras]).reshape(-1, 3, 4)
+        return self._projection_matrices
+
+    @property
+    def image_bounds(self):
+        """ The (C,4) stacked image bounds of the cameras
+        """
+        if self._image_bounds is None:
+            self._image_bounds = np.array([cam.image_bounds[0:4] for cam in self.cameras],
+                                          dtype=float).reshape(-1, 4)
+        return self._image_bounds
+
+    @property
+    def camera_centers(self):
+        """ The (C,3) stacked camera centers of the cameras
+        """
+        if self._camera_centers is None:
+            self._camera_centers = np.array([cam.image_center[0:3] for cam in self.cameras],
+                                            dtype=float).reshape(-1, 3)
+        return self._camera_centers
+
+    def query_point(self, lon, lat, sort_by = None):
+        """ Find the cameras whose geographic bounds contain a point
+
+        :param lon: The longitude
+        :type lon: float
+        :param lat: The latitude
+        :type lat: float
+        :param sort_by: Order the cameras by "distance", "obliquity" or a function(camera), defaults to None
+        :type sort_by: str or function, optional
+        :return: The cameras containing the point
+        :rtype: list
+        """
+        idx = self._tree.query([lon, lat, lon, lat])
+        return self._sorted(idx, sort_by, lon, lat)
+
+    def query_bbox(self, min_lon, min_lat, max_lon, max_lat, sort_by = None):
+        """ Find the cameras whose geographic bounds intersect a bounding box
+
+        :param min_lon: The minimum longitude
+        :type min_lon: float
+        :param min_lat: The minimum latitude
+        :type min_lat: float
+        :param max_lon: The maximum longitude
+        :type max_lon: float
+        :param max_lat: The maximum latitude
+        :type max_lat: float
+        :param sort_by: Order the cameras by "distance" to the center of the box, "obliquity" or a function(camera), defaults to None
+        :type sort_by: str or function, optional
+        :return: The cameras intersecting the box
+        :rtype: list
+        """
+        idx = self._tree.query([min_lon, min_lat, max_lon, max_lat])
+        return self._sorted(idx, sort_by, (min_lon + max_lon) / 2, (min_lat + max_lat) / 2)
+
+    def query_polygon(self, polygon, sort_by = None):
+        """ Find the cameras whose geographic bounds intersect a polygon
+
+        :param polygon: The polygon in lon/lat
+        :type polygon: class: `shapely.Polygon`
+        :param sort_by: Order the cameras by "distance" to the centroid of the polygon, "obliquity" or a function(camera), defaults to None
+        :type sort_by: str or function, optional
+        :return: The cameras intersecting the polygon
+        :rtype: list
+        """
+        from shapely.geometry import box
+        from shapely.prepared import prep
+
+        idx = self._tree.query(polygon.bounds)
+        prepared = prep(polygon)
+        idx = np.array([i for i in idx if prepared.intersects(box(*self.geo_bounds[i]))], dtype=np.intp)
+        centroid = polygon.centroid
+        return self._sorted(idx, sort_by, centroid.x, centroid.y)
+
+    def project_points(self, lon, lat, elevation):
+        """ Project M lat/lon/elevation points into all C cameras with one tensor operation
+
+        :param lon: The longitudes
+        :type lon: numpy.Array
+        :param lat: The latitudes
+        :type lat: numpy.Array
+        :param elevation: The elevations, a scalar is applied to all points
+        :type elevation: numpy.Array
+        :return: The (M,C,2) col, row values of the pixels, a (M,C) mask of points in front of a camera and within its image bounds and a (M,C) mask of points in front of the cameras
+        :rtype: tuple: numpy.Array, numpy.Array, numpy.Array
+        """
+        lon, lat, elevation = np.broadcast_arrays(np.asarray(lon, dtype=float).ravel(),
+                                                  np.asarray(lat, dtype=float).ravel(),
+                                                  np.asarray(elevation, dtype=float).ravel())
+        proj = self.projection_matrices
+        img_pt_h = np.empty((len(lon), len(self), 3))
+
+        # Convert the points once for each CRS among the cameras
+        groups, crs_list = self._get_crs_groups()
+        for group in np.unique(groups):
+            members = np.flatnonzero(groups == group)
+            x, y, z = get_transformer(4326, crs_list[group]).transform(lon, lat, elevation)
+            world_pts = np.column_stack([x, y, z])
+            img_pt_h[:, members] = (np.einsum('cij,mj->mci', proj[members, :, 0:3], world_pts)
+                                    + proj[members, :, 3][np.newaxis])
+
+        w = img_pt_h[:, :, 2]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            img_pts = img_pt_h[:, :, 0:2] / w[:, :, np.newaxis]
+
+        # Offset pixels by bounds, the max bounds are the last pixel of the image
+        bounds = self.image_bounds
+        img_pts -= bounds[np.newaxis, :, 0:2]
+        size = bounds[:, 2:4] - bounds[:, 0:2] + 1
+        in_frame = ((img_pts >= 0) & (img_pts < size[np.newaxis])).all(axis=2)
+
+        # Points are in front when depth has the same sign as the orientation of M
+        in_front = w * np.sign(np.linalg.det(proj[:, :, 0:3]))[np.newaxis] > 0
+        return img_pts, in_frame & in_front, in_front
+
+    def visible_cameras(self, lon, lat, elevation):
+        """ Find the cameras whose image contains a lat/lon/elevation point
+
+        :param lon: The longitude
+        :type lon: float
+        :param lat: The latitude
+        :type lat: float
+        :param elevation: The elevation
+        :type elevation: float
+        :return: The cameras that see the point
+        :rtype: list
+        """
+        _, in_frame, _ = self.project_points(lon, lat, elevation)
+        return [self.cameras[i] for i in np.flatnonzero(in_frame[0])]
+
+    def obliquity(self, idx = None):
+        """ Compute the angle between the viewing direction of cameras and straight down
+
+        :param idx: The indices of the cameras, defaults to all cameras
+        :type idx: numpy.Array, optional
+        :return: The angle in degrees for each camera
+        :rtype: numpy.Array
+        """
+        proj = self.projection_matrices if idx is None else self.projection_matrices[idx]
+        m = proj[:, :, 0:3]
+
+        # The principal axis is the third row of M, oriented by the sign of its determinant
+        axis = m[:, 2, :] * np.sign(np.linalg.det(m))[:, np.newaxis]
+        axis /= np.linalg.norm(axis, axis=1)[:, np.newaxis]
+        return np.degrees(np.arccos(np.clip(-axis[:, 2], -1.0, 1.0)))
+
+    def distance(self, lon, lat, idx = None):
+        """ Compute the horizontal distance from the camera centers to a point
+
+        :param lon: The longitude
+        :type lon: float
+        :param lat: The latitude
+        :type lat: float
+        :param idx: The indices of the cameras, defaults to all cameras
+        :type idx: numpy.Array, optional
+        :return: The distance for each camera in the units of its CRS
+        :rtype: numpy.Array
+        """
+        idx = np.arange(len(self)) if idx is None else np.asarray(idx, dtype=np.intp)
+        dist = np.empty(len(idx))
+
+        # Convert the point once for each CRS among the cameras
+        groups, crs_list = self._get_crs_groups()
+        for group in np.unique(groups[idx]):
+            members = np.flatnonzero(groups[idx] == group)
+            x, y = get_transformer(4326, crs_list[group]).transform(lon, lat)
+            centers = self.camera_centers[idx[members]]
+            dist[members] = np.hypot(centers[:, 0] - x, centers[:, 1] - y)
+        return dist
+
+    def _get_crs_groups(self):
+        """ Get a group label for the CRS of each camera and the CRS of each group
+        """
+        if self._crs_groups is None:
+            labels = {}
+            crs_list = []
+            groups = np.empty(len(self), dtype=np.intp)
+            for i, cam in enumerate(self.cameras):
+                key = cam.crs.srs
+                if key not in labels:
+                    labels[key] = len(crs_list)
+                    crs_list.append(cam.crs)
+                groups[i] = labels[key]
+            self._crs_groups = (groups, crs_list)
+        return self._crs_groups
+
+    def _sorted(self, idx, sort_by, lon, lat):
+        """ Get the cameras at indices ordered by a metric
+        """
+        idx = np.sort(np.asarray(idx, dtype=np.intp))
+        if sort_by is None or len(idx) == 0:
+            return [self.cameras[i] for i in idx]
+
+        if sort_by == "distance":
+            keys = self.distance(lon, lat, idx)
+        elif sort_by == "obliquity":
+            keys = self.obliquity(idx)
+        elif callable(sort_by):
+            keys = [sort_by(self.cameras[i]) for i in idx]
+            return [self.cameras[idx[j]] for j in sorted(range(len(idx)), key=lambda j: keys[j])]
+        else:
+            raise ValueError("Unknown sort metric: {}".format(sort_by))
+
+        return [self.cameras[i] for i in idx[np.argsort(keys, kind='stable')]]
+
+class _BoxTree():
+    """ A static R-tree over boxes packed with the Sort-Tile-Recursive algorithm
+    """
+
+    def __init__(self, boxes, node_size):
+        self.node_size = node_size
+        self.boxes = boxes
+        count = len(boxes)
+
+        # Sort into vertical slices by x, then by y within each slice
+        num_leaves = -(-count // node_size)
+        num_slices = max(1, int(np.ceil(np.sqrt(num_leaves))))
+        slice_len = num_slices * node_size
+        cx = (boxes[:, 0] + boxes[:, 2]) / 2
+        cy = (boxes[:, 1] + boxes[:, 3]) / 2
+        order = np.argsort(cx, kind='stable')
+        for start in range(0, count, slice_len):
+            part = order[start:start + slice_len]
+            order[start:start + slice_len] = part[np.argsort(cy[part], kind='stable')]
+        self.order = order
+
+        # Build the bounds of each level, children of node i are nodes [i*n, (i+1)*n) of the level below
+        self.levels = []
+        level = boxes[order]
+        while True:
+            level = self._group(level)
+            self.levels.append(level)
+            if len(level) <= 1:
+                break
+        self.levels.reverse()
+
+    def _group(self, level):
+        """ Merge the bounds of consecutive groups of nodes
+        """
+        pad = -len(level) % self.node_size
+        padded = np.concatenate([level, np.tile([np.inf, np.inf, -np.inf, -np.inf], (pad, 1))])
+        groups = padded.reshape(-1, self.node_size, 4)
+        return np.concatenate([groups[:, :, 0:2].min(axis=1), groups[:, :, 2:4].max(axis=1)], axis=1)
+
+    def query(self, bounds):
+        """ Find the indices of the boxes intersecting bounds [min_x, min_y, max_x, max_y]
+        """
+        if len(self.boxes) == 0:
+            return np.empty(0, dtype=np.intp)
+
+        min_x, min_y, max_x, max_y = bounds
+        offsets = np.arange(self.node_size)
+        nodes = np.arange(len(self.levels[0]))
+        for level in self.levels:
+            nodes = nodes[nodes < len(level)]
+            b = level[nodes]
+            nodes = nodes[(b[:, 0] <= max_x) & (b[:, 2] >= min_x) & (b[:, 1] <= max_y) & (b[:, 3] >= min_y)]
+            nodes = (nodes[:, np.newaxis] * self.node_size + offsets).ravel()
+
+        # Nodes below the last level are the packed boxes themselves
+        nodes = nodes[nodes < len(self.order)]
+        items = self.order[nodes]
+        b = self.boxes[items]
+        return items[(b[:, 0] <= max_x) & (b[:, 2] >= min_x) & (b[:, 1] <= max_y) & (b[:, 3] >= min_y)]
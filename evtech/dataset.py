@@ -1,37 +1,229 @@
 import json
+import threading
 
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
-from evtech import camera_from_json
 
-def load_dataset(dir_path, loader = camera_from_json):
+from .camera import camera_from_json
+from .cameraset import CameraSet
+from .geodesy import utm_epsg_from_latlon
+from .index import open_dataset_index
+
+class LazyCamera():
+    """ A proxy for a camera whose JSON data is only read and loaded on first access
+
+    Any attribute other than the image path is forwarded to the loaded camera.
+
+    :param json_path: Path to the serialized JSON data of the camera
+    :type json_path: pathlib.Path
+    :param image_path: Path to the image data
+    :type image_path: pathlib.Path
+    :param loader: function(dict, str) that creates the camera, defaults to None which uses camera_from_json
+    :type loader: function, optional
+    """
+
+    def __init__(self, json_path, image_path, loader = None):
+        """ Constructor method
+        """
+        object.__setattr__(self, "_json_path", json_path)
+        object.__setattr__(self, "_loader", loader)
+        object.__setattr__(self, "_camera", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+        object.__setattr__(self, "_image_path", image_path)
+
+    @property
+    def image_path(self):
+        """ The path to the image data, available without loading the camera
+        """
+        if self._camera is not None:
+            return self._camera.image_path
+        return self._image_path
+
+    @image_path.setter
+    def image_path(self, image_path):
+        object.__setattr__(self, "_image_path", image_path)
+        if self._camera is not None:
+            self._camera.image_path = image_path
+
+    @property
+    def is_loaded(self):
+        """ True once the camera has been loaded
+        """
+        return self._camera is not None
+
+    def load(self):
+        """ Load the camera if it has not been loaded yet
+
+        :return: The loaded camera
+        :rtype: evtech.Camera
+        """
+        if self._camera is None:
+            with self._lock:
+                if self._camera is None:
+                    loader = camera_from_json if self._loader is None else self._loader
+                    object.__setattr__(self, "_camera", _load_camera(self._json_path, self._image_path, loader))
+        return self._camera
+
+    def __getattr__(self, name):
+        # Only called for attributes missing from the proxy
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def __setattr__(self, name, value):
+        if name == "image_path":
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.load(), name, value)
+
+def load_dataset(dir_path, loader = None, workers = None, lazy = False, index = None,
+                 camera_set = False):
     """ Loads a dataset into two arrays of cameras
-    
+
     :param dir_path: Path to the dataset
     :type dir_path: string
-    :param loader: function(str, str), optional, defaults to camera_from_json
+    :param loader: function(dict, str), optional, defaults to None which uses camera_from_json
     :type loader: function
+    :param workers: Number of threads used to read and load the cameras, defaults to None which loads serially
+    :type workers: int, optional
+    :param lazy: Return `LazyCamera` proxies which load their JSON data on first access, defaults to False
+    :type lazy: bool, optional
+    :param index: Load from a memory mapped index, True for the default index path or the path to the index,
+        the index is compiled if it is missing or stale, see `evtech.compile_dataset_index`, defaults to None
+    :type index: bool or string, optional
+    :param camera_set: Return each list of cameras as an array backed `evtech.CameraSet`, the sets loaded
+        from an index are read-only, defaults to False
+    :type camera_set: bool, optional
 
     :return: A tuple with list of nadir cams and list of oblique cams
     :rtype: tuple: list,list
     """
+    if camera_set and lazy:
+        raise ValueError("Lazy cameras can not be loaded into a camera set")
+
+    # The default loader is resolved here rather than bound as the default argument, so the
+    # fast paths are taken and the loader is timed while instrumentation wraps camera_from_json
+    default_loader = (loader is None or getattr(loader, "__wrapped__", loader)
+                      is getattr(camera_from_json, "__wrapped__", camera_from_json))
+    if loader is None:
+        loader = camera_from_json
+
+    if index:
+        index_path = None if index is True else index
+        dataset_index = open_dataset_index(dir_path, index_path)
+        if camera_set and default_loader:
+            return CameraSet.from_index(dataset_index)
+        cams = dataset_index.load(None if default_loader else loader)
+        return tuple(CameraSet.from_cameras(c) for c in cams) if camera_set else cams
+
     nadir_path = Path(dir_path).joinpath("nadirs")
     oblique_path = Path(dir_path).joinpath("obliques")
 
     # Find Jpg/Json pairs
     def load(path):
-        cams = []
-        for img in path.glob('*.jpg'):
-            img_data_path = img.with_suffix('').with_suffix(".json")
+        pairs = [(img.with_suffix('').with_suffix(".json"), img) for img in path.glob('*.jpg')]
+
+        if lazy:
+            return [LazyCamera(img_data_path, img, None if default_loader else loader) for img_data_path, img in pairs]
 
-            # Load json data
-            with open(img_data_path) as f:
-                img_data = json.load(f)
+        if camera_set and default_loader:
+            return _load_camera_set(pairs, workers)
 
-            # Add camera
-            cams.append(loader(img_data,img))
-        return cams
+        if workers is not None and workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                return list(pool.map(lambda pair: _load_camera(pair[0], pair[1], loader), pairs))
+
+        return [_load_camera(img_data_path, img, loader) for img_data_path, img in pairs]
 
     nadirs = load(nadir_path)
     obliques = load(oblique_path)
 
+    if camera_set and not default_loader:
+        return CameraSet.from_cameras(nadirs), CameraSet.from_cameras(obliques)
     return nadirs, obliques
+
+def iter_images(cameras, workers = 4, prefetch = None, ordered = True, loader = None):
+    """ Iterate over the images of cameras, decoding upcoming images on a thread pool
+
+    At most `prefetch` images are being decoded or waiting to be consumed at any time,
+    which caps the memory held by the iterator. OpenCV releases the GIL while decoding,
+    so decoding overlaps with the processing of the images by the caller.
+
+    :param cameras: The cameras to load the images of
+    :type cameras: list
+    :param workers: Number of threads decoding images, defaults to 4
+    :type workers: int, optional
+    :param prefetch: Maximum number of images decoded ahead, defaults to twice the number of workers
+    :type prefetch: int, optional
+    :param ordered: Yield the images in the order of the cameras, otherwise as they are decoded, defaults to True
+    :type ordered: bool, optional
+    :param loader: function(str) passed to `Camera.load_image`, defaults to None which uses its default loader
+    :type loader: function, optional
+    :return: Generator of (camera, image) tuples
+    :rtype: generator
+    """
+    if prefetch is None:
+        prefetch = 2 * workers
+    prefetch = max(int(prefetch), 1)
+
+    def load(cam):
+        img = cam.load_image() if loader is None else cam.load_image(loader)
+        return cam, img
+
+    cameras = iter(cameras)
+    pool = ThreadPoolExecutor(max_workers=max(workers, 1))
+    pending = deque()
+    try:
+        # Fill the window, then submit a new camera for every image consumed
+        for cam in cameras:
+            pending.append(pool.submit(load, cam))
+            if len(pending) >= prefetch:
+                break
+
+        while pending:
+            if ordered:
+                future = pending.popleft()
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                future = next(f for f in pending if f in done)
+                pending.remove(future)
+            result = future.result()
+
+            for cam in cameras:
+                pending.append(pool.submit(load, cam))
+                break
+
+            yield result
+    finally:
+        # Do not decode the rest of the images when the caller stops early
+        for future in pending:
+            future.cancel()
+        pool.shutdown(wait=True)
+
+def _load_camera(img_data_path, img, loader):
+    """ Read the JSON data for an image and load its camera
+    """
+    return loader(_read_json(img_data_path), img)
+
+def _read_json(img_data_path):
+    """ Read the JSON data for an image
+    """
+    with open(img_data_path) as f:
+        return json.load(f)
+
+def _load_camera_set(pairs, workers):
+    """ Read the JSON data for images straight into the arrays of a camera set
+    """
+    if workers is not None and workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            records = list(pool.map(lambda pair: _read_json(pair[0]), pairs))
+    else:
+        records = [_read_json(img_data_path) for img_data_path, _ in pairs]
+
+    # Cameras are given the UTM zone of their bounds, as with camera_from_json
+    return CameraSet([r["projection"] for r in records], [r["bounds"][0:4] for r in records],
+                     [r["camera_center"][0:3] for r in records], [r["geo_bounds"][0:4] for r in records],
+                     [r["elevation"] for r in records],
+                     [utm_epsg_from_latlon(r["geo_bounds"][1], r["geo_bounds"][0]) for r in records],
+                     [img for _, img in pairs])
@@ -0,0 +1,277 @@
+""" Gridded elevation models and terrain-aware ray intersection """
+
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor
+
+from .geodesy import get_transformer, same_crs
+from .instrumentation import record
+from .ray import Ray
+
+class ElevationModel():
+    """ A north-up gridded elevation model, such as a DSM or DTM
+
+    Each cell is treated as a flat top at its elevation. Rays are intersected by marching
+    through a pyramid of the maximum elevation over 2^k x 2^k blocks of cells, so rays skip
+    whole blocks that are below them and only visit full resolution cells near the surface.
+
+    :param array: The (H,W) elevations
+    :type array: class: `numpy.array`
+    :param geotransform: The GDAL style geotransform (x_origin, x_size, 0, y_origin, 0, y_size) of the top left corner of the raster
+    :type geotransform: tuple
+    :param crs: The coordinate system of the raster, must match the CRS of the rays it intersects
+    :type crs: class: `pyproj.CRS`
+    :param nodata: The value of cells without an elevation, defaults to None
+    :type nodata: float, optional
+    """
+
+    def __init__(self, array, geotransform, crs, nodata = None):
+        """ Constructor method
+        """
+        if geotransform[2] != 0 or geotransform[4] != 0:
+            raise ValueError("Rotated geotransforms are not supported")
+
+        self.array = np.asarray(array, dtype=float)
+        self.geotransform = tuple(float(v) for v in geotransform)
+        self.crs = crs
+        self.nodata = nodata
+
+        # Cells without an elevation are never hit
+        surface = self.array.copy()
+        invalid = ~np.isfinite(surface)
+        if nodata is not None:
+            invalid |= surface == nodata
+        surface[invalid] = -np.inf
+        self._levels = _max_pyramid(surface)
+        self._flat = np.concatenate([level.ravel() for level in self._levels])
+        self._offsets = np.cumsum([0] + [level.size for level in self._levels[:-1]])
+        self._widths = np.array([level.shape[1] for level in self._levels], dtype=np.intp)
+
+        valid = surface[~invalid]
+        self.min_elevation = float(valid.min()) if len(valid) else np.nan
+        self.max_elevation = float(valid.max()) if len(valid) else np.nan
+
+    @property
+    def shape(self):
+        """ The (H,W) shape of the raster
+        """
+        return self.array.shape
+
+    def elevation_at(self, x, y, latlng = False):
+        """ Get the elevation of the cells containing points
+
+        :param x: The x coordinates, or longitudes
+        :type x: class: `numpy.array`
+        :param y: The y coordinates, or latitudes
+        :type y: class: `numpy.array`
+        :param latlng: The points are given as lon/lat, defaults to False
+        :type latlng: bool, optional
+        :return: The elevations, NaN outside of the raster or where there is no data
+        :rtype: numpy.array
+        """
+        x, y = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+        if latlng:
+            x, y = get_transformer(4326, self.crs).transform(x, y)
+            x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+
+        col, row = self._to_pixel(x, y)
+        col = np.floor(col)
+        row = np.floor(row)
+        height, width = self.shape
+        inside = (col >= 0) & (col < width) & (row >= 0) & (row < height)
+
+        elev = np.full(x.shape, np.nan)
+        surface = self._levels[0]
+        elev[inside] = surface[row[inside].astype(np.intp), col[inside].astype(np.intp)]
+        elev[np.isinf(elev)] = np.nan
+        return elev
+
+    def intersect(self, rays, latlng = True, workers = None, max_iterations = 100000):
+        """ Intersect rays with the elevation model
+
+        :param rays: The rays to intersect, in the CRS of the elevation model
+        :type rays: class: `evtech.Ray` or class: `evtech.RayBundle`
+        :param latlng: Return the points as lat,lng, elevation, defaults to True
+        :type latlng: bool, optional
+        :param workers: Number of threads intersecting chunks of rays, defaults to None which intersects serially
+        :type workers: int, optional
+        :param max_iterations: The maximum number of cells visited by a ray, defaults to 100000
+        :type max_iterations: int, optional
+        :return: The first intersection of each ray, NaN for rays that miss the surface. A (3,) point for a single ray or a (N,3) array of points for a bundle
+        :rtype: numpy.array
+        """
+        if rays.crs is not None and self.crs is not None and not same_crs(rays.crs, self.crs):
+            raise ValueError("Rays and elevation model have different coordinate systems")
+
+        if isinstance(rays, Ray):
+            origins = rays.origin.reshape(1, 3)
+            directions = rays.direction.reshape(1, 3)
+        else:
+            origins = rays.origins
+            directions = rays.directions
+
+        depth = self._march(origins, directions, max_iterations, workers)
+        pts = origins + depth[:, np.newaxis] * directions
+
+        if latlng:
+            hit = np.isfinite(depth)
+            x, y, z = get_transformer(self.crs, 4326).transform(pts[hit, 0], pts[hit, 1], pts[hit, 2])
+            pts[hit] = np.column_stack([x, y, z])
+
+        if isinstance(rays, Ray):
+            return pts[0]
+        return pts
+
+    def _to_pixel(self, x, y):
+        """ Convert coordinates to fractional pixel coordinates of the raster
+        """
+        gt = self.geotransform
+        return (x - gt[0]) / gt[1], (y - gt[3]) / gt[5]
+
+    def _march(self, origins, directions, max_iterations, workers = None, chunk_size = 65536):
+        """ Find the depth of the first intersection of each ray, NaN for misses
+        """
+        count = len(origins)
+        depth = np.full(count, np.nan)
+        if count == 0 or not np.isfinite(self.max_elevation):
+            return depth
+
+        # Chunks keep the temporaries of each step small enough to stay in cache
+        def march(start):
+            chunk = slice(start, start + chunk_size)
+            depth[chunk] = self._march_chunk(origins[chunk], directions[chunk], max_iterations)
+
+        starts = range(0, count, chunk_size)
+        if workers is not None and workers > 1 and len(starts) > 1:
+            # NumPy releases the GIL in the array operations, so chunks march in parallel on threads
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(march, starts))
+        else:
+            for start in starts:
+                march(start)
+        return depth
+
+    def _march_chunk(self, origins, directions, max_iterations):
+        """ Find the depth of the first intersection of each ray in a chunk, NaN for misses
+        """
+        count = len(origins)
+        depth = np.full(count, np.nan)
+
+        # March in pixel space, depth along the ray is unchanged by the affine transform
+        gt = self.geotransform
+        o_col, o_row = self._to_pixel(origins[:, 0], origins[:, 1])
+        d_col = directions[:, 0] / gt[1]
+        d_row = directions[:, 1] / gt[5]
+        o_z = origins[:, 2]
+        d_z = directions[:, 2]
+
+        # Clip the rays to the footprint of the raster
+        height, width = self.shape
+        t_start = np.zeros(count)
+        t_end = np.full(count, np.inf)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for o, d, hi in ((o_col, d_col, width), (o_row, d_row, height)):
+                t_lo = -o / d
+                t_hi = (hi - o) / d
+                parallel = d == 0
+                outside = parallel & ((o < 0) | (o > hi))
+                t_near = np.where(parallel, -np.inf, np.minimum(t_lo, t_hi))
+                t_far = np.where(parallel, np.where(outside, -np.inf, np.inf), np.maximum(t_lo, t_hi))
+                t_start = np.maximum(t_start, t_near)
+                t_end = np.minimum(t_end, t_far)
+
+            # and to the elevation range, the terrain is solid below the surface so rays
+            # entering the footprint below the lowest elevation hit the side of the raster
+            t_max = (self.max_elevation - o_z) / d_z
+            t_min = (self.min_elevation - o_z) / d_z
+            down = d_z < 0
+            t_start = np.where(down, np.maximum(t_start, t_max), t_start)
+            t_end = np.where(down, np.minimum(t_end, np.maximum(t_min, t_start)), t_end)
+            t_end = np.where(d_z > 0, np.minimum(t_end, t_max), t_end)
+            t_end = np.where((d_z == 0) & (o_z > self.max_elevation), -np.inf, t_end)
+
+        # The state of the rays still marching, compacted as rays finish
+        idx = np.flatnonzero(t_start <= t_end)
+        t = t_start[idx]
+        t_end = t_end[idx]
+        o_col, o_row, o_z, d_z = o_col[idx], o_row[idx], o_z[idx], d_z[idx]
+        d_col, d_row = d_col[idx], d_row[idx]
+
+        # Cell exits along an axis are (boundary - origin) * inv + never, with never infinite for rays parallel to the axis
+        with np.errstate(divide='ignore'):
+            inv_col = np.where(d_col == 0, 0.0, 1.0 / d_col)
+            inv_row = np.where(d_row == 0, 0.0, 1.0 / d_row)
+        never_col = np.where(d_col == 0, np.inf, 0.0)
+        never_row = np.where(d_row == 0, np.inf, 0.0)
+        ahead_col = (d_col > 0).astype(np.intp)
+        ahead_row = (d_row > 0).astype(np.intp)
+
+        # Nudge positions along the ray so points on a cell boundary fall in the next cell
+        p_col = o_col + np.sign(d_col) * 1e-7
+        p_row = o_row + np.sign(d_row) * 1e-7
+
+        # Start at the level of blocks about the size of the distance covered through the elevation range,
+        # steep rays start near full resolution and shallow rays skip across large blocks
+        top_level = len(self._levels) - 1
+        travel = np.hypot(d_col, d_row) * (t_end - t)
+        level = np.clip(np.floor(np.log2(np.fmax(travel, 1.0))), 0, top_level).astype(np.intp)
+
+        steps = 0
+        for _ in range(max_iterations):
+            if len(idx) == 0:
+                break
+            steps += 1
+
+            # The cell of each ray at its level and the depth where the ray leaves it
+            col = np.clip(p_col + t * d_col, 0, width - 1).astype(np.intp) >> level
+            row = np.clip(p_row + t * d_row, 0, height - 1).astype(np.intp) >> level
+            exit_col = (((col + ahead_col) << level) - o_col) * inv_col + never_col
+            exit_row = (((row + ahead_row) << level) - o_row) * inv_row + never_row
+            t_exit = np.minimum(np.minimum(exit_col, exit_row), t_end)
+
+            # The highest elevation of the cell, from all levels flattened into one array
+            top = self._flat[self._offsets[level] + row * self._widths[level] + col]
+            z_enter = o_z + t * d_z
+            z_exit = o_z + t_exit * d_z
+            below = np.minimum(z_enter, z_exit) <= top
+
+            # Nothing in the cell is above its top, so move the ray down to the top when it enters above it
+            with np.errstate(divide='ignore', invalid='ignore'):
+                t_top = np.where(z_enter <= top, t, (top - o_z) / d_z)
+
+            # Hits at full resolution are on the wall or the top of the cell
+            hit = below & (level == 0)
+            depth[idx[hit]] = t_top[hit]
+
+            # Rays which do not advance past their cell have left the raster through an edge, where the
+            # clipped cell exit can round to just below t_end
+            advanced = (t_exit > t) & (t_exit < t_end)
+
+            # Descend into cells the ray passes below the top of, skip the others and climb back up
+            t = np.where(below, t_top, t_exit)
+            level = np.where(below, level - 1, np.minimum(level + 1, top_level))
+
+            keep = ~hit & (below | advanced)
+            if not keep.all():
+                idx, t, t_end, level = idx[keep], t[keep], t_end[keep], level[keep]
+                o_col, o_row, o_z, d_col, d_row, d_z = (o_col[keep], o_row[keep], o_z[keep],
+                                                        d_col[keep], d_row[keep], d_z[keep])
+                p_col, p_row = p_col[keep], p_row[keep]
+                inv_col, inv_row, never_col, never_row = inv_col[keep], inv_row[keep], never_col[keep], never_row[keep]
+                ahead_col, ahead_row = ahead_col[keep], ahead_row[keep]
+
+        record("ElevationModel.march_steps", steps)
+        return depth
+
+def _max_pyramid(surface):
+    """ Build the levels of maximum elevation over 2^k x 2^k blocks, up to a single cell
+    """
+    levels = [surface]
+    while levels[-1].shape[0] > 1 or levels[-1].shape[1] > 1:
+        prev = levels[-1]
+        pad_row = prev.shape[0] % 2
+        pad_col = prev.shape[1] % 2
+        if pad_row or pad_col:
+            prev = np.pad(prev, ((0, pad_row), (0, pad_col)), constant_values=-np.inf)
+        levels.append(prev.reshape(prev.shape[0] // 2, 2, prev.shape[1] // 2, 2).max(axis=(1, 3)))
+    return levels
@@ -0,0 +1,145 @@
+""" Epipolar geometry between pairs of cameras """
+
+import numpy as np
+
+from .cache import LRUCache
+from .triangulation import stack_cameras
+
+# Process-wide cache of fundamental matrices keyed by the projection matrices and bounds of the cameras
+_fundamental_cache = LRUCache(maxsize=4096)
+
+def fundamental_matrix(camera1, camera2):
+    """ Get the (cached) fundamental matrix between the images of two cameras
+
+    The matrix works in the pixels of each image, with the offsets of the image bounds applied, so
+    x2^T F x1 = 0 for homogeneous image points x1 in camera1 and x2 in camera2 of the same world point.
+
+    :param camera1: The first camera
+    :type camera1: class: `evtech.Camera`
+    :param camera2: The second camera
+    :type camera2: class: `evtech.Camera`
+    :return: The 3x3 fundamental matrix, normalized to unit norm
+    :rtype: numpy.array
+    """
+    return _fundamental_cache.get_or_create(
+        (_camera_key(camera1), _camera_key(camera2)), lambda: _fundamental_matrix(camera1, camera2))
+
+def fundamental_cache_stats():
+    """ Get the hit/miss statistics for the fundamental matrix cache
+
+    :return: The statistics of the cache
+    :rtype: dict
+    """
+    return _fundamental_cache.stats()
+
+def clear_fundamental_cache():
+    """ Remove all cached fundamental matrices
+    """
+    _fundamental_cache.clear()
+
+def epipolar_lines(camera, points, others):
+    """ Compute the epipolar lines of image points of a camera in other cameras
+
+    :param camera: The camera the points are in
+    :type camera: class: `evtech.Camera`
+    :param points: The (N,2) col, row image points
+    :type points: class: `numpy.array`
+    :param others: The C cameras to compute the lines in
+    :type others: list
+    :return: The (N,C,3) lines a*col + b*row + c = 0, scaled so (a, b) has unit norm
+    :rtype: numpy.array
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    pts_h = np.column_stack([points, np.ones(len(points))])
+    fundamentals = np.stack([fundamental_matrix(camera, other) for other in others]).reshape(-1, 3, 3)
+    lines = np.einsum('cij,nj->nci', fundamentals, pts_h)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return lines / np.linalg.norm(lines[:, :, 0:2], axis=2)[:, :, np.newaxis]
+
+def epipolar_segments(camera, points, others, min_elevation, max_elevation, clip = True):
+    """ Compute the segments of the epipolar lines of image points where the matching points in other cameras lie,
+    given the range of elevations of the world points
+
+    :param camera: The camera the points are in
+    :type camera: class: `evtech.Camera`
+    :param points: The (N,2) col, row image points
+    :type points: class: `numpy.array`
+    :param others: The C cameras to compute the segments in, in the CRS of the camera
+    :type others: list
+    :param min_elevation: The lowest elevation of the world points
+    :type min_elevation: float
+    :param max_elevation: The highest elevation of the world points
+    :type max_elevation: float
+    :param clip: Clip the segments to the images of the cameras, defaults to True
+    :type clip: bool, optional
+    :return: The (N,C,2,2) col, row end points of the segments at the min and max elevations and a (N,C) mask of the valid segments, where both ends are in front of the camera and, when clipping, the segment crosses the image
+    :rtype: tuple: numpy.array, numpy.array
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    count = len(points)
+
+    # The world points at either end of the elevation range, along the ray of each point
+    rays = camera.project_points_from_camera(points[:, 0], points[:, 1])
+    ends = np.concatenate([rays.point_at_depth(rays.depth_at_elevation(min_elevation)),
+                           rays.point_at_depth(rays.depth_at_elevation(max_elevation))])
+
+    # Project both ends into every camera at once
+    proj, offsets = stack_cameras(others)
+    img_pts_h = np.einsum('cij,mj->mci', proj[:, :, 0:3], ends) + proj[np.newaxis, :, :, 3]
+    w = img_pts_h[:, :, 2]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        img_pts = img_pts_h[:, :, 0:2] / w[:, :, np.newaxis] - offsets[np.newaxis]
+    orientation = np.sign(np.linalg.det(proj[:, :, 0:3]))
+    in_front = w * orientation[np.newaxis] > 0
+
+    segments = np.stack([img_pts[0:count], img_pts[count:]], axis=2)
+    valid = in_front[0:count] & in_front[count:]
+    if clip:
+        bounds = np.array([cam.image_bounds[0:4] for cam in others], dtype=float).reshape(-1, 4)
+        size = bounds[:, 2:4] - bounds[:, 0:2] + 1
+        segments, inside = _clip_segments(segments, size)
+        valid &= inside
+    return segments, valid
+
+def _fundamental_matrix(camera1, camera2):
+    """ Compute the fundamental matrix between the images of two cameras
+    """
+    p2 = np.asarray(camera2.projection_matrix, dtype=float)
+
+    # F = [e2]x M2 M1^-1 for finite cameras, with e2 the image of the center of camera1 in camera2
+    e2 = p2[:, 0:3] @ camera1.camera_position + p2[:, 3]
+    e2_x = np.array([[0, -e2[2], e2[1]], [e2[2], 0, -e2[0]], [-e2[1], e2[0], 0]])
+    fundamental = e2_x @ p2[:, 0:3] @ camera1.inverse_projection
+
+    # Move from full image pixels to the pixels of each image
+    t1 = np.array([[1, 0, camera1.image_bounds[0]], [0, 1, camera1.image_bounds[1]], [0, 0, 1]], dtype=float)
+    t2 = np.array([[1, 0, camera2.image_bounds[0]], [0, 1, camera2.image_bounds[1]], [0, 0, 1]], dtype=float)
+    fundamental = t2.T @ fundamental @ t1
+    return fundamental / np.linalg.norm(fundamental)
+
+def _camera_key(camera):
+    """ Get a hashable key for the geometry of a camera
+    """
+    return (np.asarray(camera.projection_matrix, dtype=float).tobytes(),
+            tuple(float(v) for v in camera.image_bounds[0:2]))
+
+def _clip_segments(segments, size):
+    """ Clip (N,C,2,2) segments to the (C,2) sizes of the images with the Liang-Barsky algorithm
+    """
+    start = segments[:, :, 0]
+    delta = segments[:, :, 1] - start
+    t0 = np.zeros(segments.shape[0:2])
+    t1 = np.ones(segments.shape[0:2])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for axis in range(2):
+            d = delta[:, :, axis]
+            lo = -start[:, :, axis] / d
+            hi = (size[np.newaxis, :, axis] - start[:, :, axis]) / d
+            parallel = d == 0
+            outside = parallel & ((start[:, :, axis] < 0) | (start[:, :, axis] > size[np.newaxis, :, axis]))
+            t0 = np.where(parallel, t0, np.maximum(t0, np.minimum(lo, hi)))
+            t1 = np.where(parallel, np.where(outside, -1.0, t1), np.minimum(t1, np.maximum(lo, hi)))
+
+    inside = t0 <= t1
+    clipped = np.stack([start + t0[:, :, np.newaxis] * delta, start + t1[:, :, np.newaxis] * delta], axis=2)
+    return clipped, inside
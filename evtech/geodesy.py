@@ -1,11 +1,20 @@
 """ Functions for converting coordinates """
 
+import threading
+
 import utm
-from pyproj import CRS
+from pyproj import CRS, Transformer
+
+from .cache import LRUCache
+
+# Process-wide caches, CRS objects are keyed by their user input and
+# transformers by (src, dst, always_xy) per thread
+_crs_cache = LRUCache(maxsize=256)
+_transformer_cache = LRUCache(maxsize=256)
 
 def utm_crs_from_latlon(lat, lon):
     """ Determines the UTM CRS from a given lat lon point
-    
+
     :param lat: The latitude
     :type lat: float
     :param lon: The longitude
@@ -13,10 +22,105 @@ def utm_crs_from_latlon(lat, lon):
     :return: A coordinate system for the associated UTM zone
     :rtype: class:`pyroj.CRS`
     """
+    return get_crs(utm_epsg_from_latlon(lat, lon))
+
+def utm_epsg_from_latlon(lat, lon):
+    """ Determines the EPSG code of the UTM zone for a given lat lon point
+
+    :param lat: The latitude
+    :type lat: float
+    :param lon: The longitude
+    :type lon: float
+    :return: The EPSG code of the associated UTM zone
+    :rtype: int
+    """
     _, _, zone, _ = utm.from_latlon(lat, lon)
-    if lat >= 0:
-        epsg = '326' + str(zone)
-    else:
-        epsg = '327' + str(zone)
+    return _utm_epsg(zone, lat >= 0)
+
+def utm_crs_from_zone(zone, northern=True):
+    """ Get the (cached) UTM CRS for a zone and hemisphere
+
+    :param zone: The UTM zone number
+    :type zone: int
+    :param northern: True for the northern hemisphere, defaults to True
+    :type northern: bool, optional
+    :return: A coordinate system for the UTM zone
+    :rtype: class:`pyroj.CRS`
+    """
+    return get_crs(_utm_epsg(zone, northern))
+
+def get_crs(crs):
+    """ Get a (cached) CRS from any input accepted by `pyproj.CRS.from_user_input`
+
+    :param crs: The CRS definition, such as an EPSG code
+    :type crs: int, str or class:`pyroj.CRS`
+    :return: The coordinate system
+    :rtype: class:`pyroj.CRS`
+    """
+    if isinstance(crs, CRS):
+        return crs
+    return _crs_cache.get_or_create(crs, lambda: CRS.from_user_input(crs))
+
+def get_transformer(src, dst, always_xy=True):
+    """ Get a (cached) transformer between two coordinate systems
+
+    Transformers are cached per thread, as pyproj transformers may not be shared between threads.
+
+    :param src: The source CRS
+    :type src: int, str or class:`pyroj.CRS`
+    :param dst: The destination CRS
+    :type dst: int, str or class:`pyroj.CRS`
+    :param always_xy: Use lon/lat, easting/northing axis order, defaults to True
+    :type always_xy: bool, optional
+    :return: The transformer
+    :rtype: class:`pyroj.Transformer`
+    """
+    key = (_crs_key(src), _crs_key(dst), always_xy, threading.get_ident())
+    return _transformer_cache.get_or_create(key, lambda: _create_transformer(src, dst, always_xy))
+
+def same_crs(crs1, crs2):
+    """ Check whether two CRS definitions describe the same coordinate system
+
+    :param crs1: The first CRS
+    :type crs1: int, str or class:`pyroj.CRS`
+    :param crs2: The second CRS
+    :type crs2: int, str or class:`pyroj.CRS`
+    :return: True if the coordinate systems are equivalent
+    :rtype: bool
+    """
+    if crs1 is crs2:
+        return True
+    return get_crs(crs1) == get_crs(crs2)
+
+def crs_cache_stats():
+    """ Get the hit/miss statistics for the CRS and transformer caches
 
-    return CRS.from_user_input(int(epsg))
\ No newline at end of file
+    :return: The statistics of each cache
+    :rtype: dict
+    """
+    return {"crs": _crs_cache.stats(), "transformer": _transformer_cache.stats()}
+
+def clear_crs_cache():
+    """ Remove all cached CRS and transformer objects
+    """
+    _crs_cache.clear()
+    _transformer_cache.clear()
+
+def _create_transformer(src, dst, always_xy):
+    """ Create a transformer between two coordinate systems
+    """
+    return Transformer.from_crs(get_crs(src), get_crs(dst), always_xy=always_xy)
+
+def _utm_epsg(zone, northern):
+    """ Get the EPSG code of a WGS84 UTM zone
+    """
+    if northern:
+        return 32600 + int(zone)
+    return 32700 + int(zone)
+
+def _crs_key(crs):
+    """ Get a hashable key for a CRS definition
+    """
+    if isinstance(crs, CRS):
+        return crs.srs
+    return crs
@@ -0,0 +1,87 @@
+""" Opt-in process-wide cache of decoded images """
+
+import os
+import sys
+
+from .cache import LRUCache
+from .instrumentation import record
+
+# The active cache, None while caching is disabled
+_image_cache = None
+
+def enable_image_cache(max_bytes):
+    """ Enable caching of decoded images, replacing any existing cache
+
+    Cached images are keyed by path, modification time and loader. Cached numpy images are
+    shared between callers and are therefore marked read-only, copy an image before modifying it.
+
+    :param max_bytes: The maximum total size of the cached images in bytes
+    :type max_bytes: int
+    """
+    global _image_cache
+    _image_cache = LRUCache(maxsize=max_bytes, getsizeof=_sizeof)
+
+def disable_image_cache():
+    """ Disable caching of decoded images and release the cached images
+    """
+    global _image_cache
+    _image_cache = None
+
+def clear_image_cache():
+    """ Release the cached images and reset the statistics, keeping the cache enabled
+    """
+    if _image_cache is not None:
+        _image_cache.clear()
+
+def image_cache_stats():
+    """ Get the statistics of the image cache
+
+    :return: The hits, misses, evictions, number of images, bytes used and byte budget, or None if disabled
+    :rtype: dict
+    """
+    if _image_cache is None:
+        return None
+    return _image_cache.stats()
+
+def cached_imread(path, loader, *args):
+    """ Load an image through the image cache when it is enabled
+
+    :param path: The path to the image
+    :type path: str
+    :param loader: function(str, `*args`) that loads the image
+    :type loader: function
+    :param args: Extra arguments passed to the loader, which are part of the cache key
+    :return: image data
+    :rtype: numpy.array
+    """
+    cache = _image_cache
+    if cache is None:
+        return _decode(path, loader, args)
+
+    # Images that can not be stat-ed are loaded without caching
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except (OSError, TypeError, ValueError):
+        return _decode(path, loader, args)
+
+    def load():
+        img = _decode(path, loader, args)
+        if hasattr(img, "flags"):
+            img.flags.writeable = False
+        return img
+
+    return cache.get_or_create((str(path), mtime, loader, args), load)
+
+def _decode(path, loader, args):
+    """ Load an image with a loader, counting the decoded bytes
+    """
+    img = loader(str(path), *args)
+    record("image.decoded_bytes", getattr(img, "nbytes", 0))
+    return img
+
+def _sizeof(img):
+    """ Get the size of a decoded image in bytes
+    """
+    if hasattr(img, "nbytes"):
+        return img.nbytes
+    return sys.getsizeof(img)
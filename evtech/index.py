@@ -0,0 +1,274 @@
+""" Compiled binary index of a dataset for fast reloads """
+
+import json
+import os
+import struct
+import uuid
+import numpy as np
+
+from pathlib import Path
+
+from .camera import Camera, camera_from_json
+from .geodesy import get_crs, utm_epsg_from_latlon
+
+# The default file name of the index within a dataset directory
+DEFAULT_INDEX_NAME = "evtech_index.bin"
+
+_MAGIC = b"EVTIDX1\n"
+_ALIGNMENT = 64
+_SUBSETS = ("nadirs", "obliques")
+
+def compile_dataset_index(dir_path, index_path = None):
+    """ Compile the cameras of a dataset directory into a single binary index file
+
+    The index holds the stacked projection matrices, bounds, camera centers, geo bounds,
+    elevations, UTM zone EPSG codes and image paths of every camera, along with the
+    modification times of the source JSON files so stale indexes can be detected.
+
+    :param dir_path: Path to the dataset
+    :type dir_path: string
+    :param index_path: Path to write the index to, defaults to `DEFAULT_INDEX_NAME` in the dataset
+    :type index_path: string, optional
+    :return: The path of the index
+    :rtype: pathlib.Path
+    """
+    dir_path = Path(dir_path)
+    if index_path is None:
+        index_path = dir_path.joinpath(DEFAULT_INDEX_NAME)
+    index_path = Path(index_path)
+
+    images = []
+    records = []
+    counts = {}
+    for subset in _SUBSETS:
+        subset_images = list(dir_path.joinpath(subset).glob('*.jpg'))
+        counts[subset] = len(subset_images)
+        for img in subset_images:
+            img_data_path = img.with_suffix('').with_suffix(".json")
+            with open(img_data_path) as f:
+                img_data = json.load(f)
+            images.append(img.relative_to(dir_path).as_posix())
+            records.append((img_data, os.stat(img_data_path).st_mtime_ns))
+
+    num = len(records)
+    arrays = {
+        "projection": np.array([r[0]["projection"] for r in records], dtype=np.float64).reshape(num, 3, 4),
+        "bounds": np.array([r[0]["bounds"] for r in records], dtype=np.float64).reshape(num, 4),
+        "camera_center": np.array([r[0]["camera_center"][0:3] for r in records], dtype=np.float64).reshape(num, 3),
+        "geo_bounds": np.array([r[0]["geo_bounds"] for r in records], dtype=np.float64).reshape(num, 4),
+        "elevation": np.array([r[0]["elevation"] for r in records], dtype=np.float64).reshape(num),
+        "epsg": np.array([utm_epsg_from_latlon(r[0]["geo_bounds"][1], r[0]["geo_bounds"][0])
+                          for r in records], dtype=np.int32).reshape(num),
+        "mtime_ns": np.array([r[1] for r in records], dtype=np.int64).reshape(num),
+    }
+
+    header = {
+        "counts": counts,
+        "images": images,
+        "dir_mtime_ns": {subset: _dir_mtime(dir_path.joinpath(subset)) for subset in _SUBSETS},
+        "arrays": {},
+    }
+
+    # Lay the arrays out after the header, offsets are relative to the aligned end of the header
+    offset = 0
+    for name, arr in arrays.items():
+        header["arrays"][name] = {"dtype": arr.dtype.str, "shape": list(arr.shape), "offset": offset}
+        offset = _align(offset + arr.nbytes)
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = _align(len(_MAGIC) + 8 + len(header_bytes))
+
+    # Write to a temporary file first so readers never see a partial index, the file is unique
+    # to this writer so concurrent rebuilds each publish a complete index
+    tmp_path = index_path.with_name("{}.{}.tmp".format(index_path.name, uuid.uuid4().hex))
+    try:
+        with open(tmp_path, "xb") as f:
+            f.write(_MAGIC)
+            f.write(struct.pack("<Q", len(header_bytes)))
+            f.write(header_bytes)
+            for name, arr in arrays.items():
+                f.seek(data_start + header["arrays"][name]["offset"])
+                f.write(np.ascontiguousarray(arr).tobytes())
+        os.replace(tmp_path, index_path)
+    except BaseException:
+        _remove(tmp_path)
+        raise
+
+    return index_path
+
+class DatasetIndex():
+    """ A memory mapped dataset index written by `compile_dataset_index`
+
+    :param index_path: Path to the index
+    :type index_path: string
+    :param dir_path: Path to the dataset, defaults to the directory holding the index
+    :type dir_path: string, optional
+    """
+
+    def __init__(self, index_path, dir_path = None):
+        """ Constructor method
+        """
+        self.index_path = Path(index_path)
+        self.dir_path = Path(dir_path) if dir_path is not None else self.index_path.parent
+
+        with open(self.index_path, "rb") as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError("Not an evtech dataset index: {}".format(self.index_path))
+            header_len, = struct.unpack("<Q", f.read(8))
+            self.header = json.loads(f.read(header_len).decode("utf-8"))
+        data_start = _align(len(_MAGIC) + 8 + header_len)
+
+        self.arrays = {}
+        for name, spec in self.header["arrays"].items():
+            shape = tuple(spec["shape"])
+            if np.prod(shape) == 0:
+                self.arrays[name] = np.zeros(shape, dtype=spec["dtype"])
+            else:
+                self.arrays[name] = np.memmap(self.index_path, dtype=spec["dtype"], mode="r",
+                                              offset=data_start + spec["offset"], shape=shape)
+
+    def __len__(self):
+        return len(self.header["images"])
+
+    @property
+    def nadir_count(self):
+        """ The number of nadir cameras, which are stored before the oblique cameras
+        """
+        return self.header["counts"]["nadirs"]
+
+    def image_path(self, i):
+        """ Get the path of the image for a camera
+
+        :param i: The index of the camera
+        :type i: int
+        :return: The path to the image
+        :rtype: pathlib.Path
+        """
+        return self.dir_path.joinpath(self.header["images"][i])
+
+    def is_stale(self):
+        """ Check whether the dataset changed since the index was compiled
+
+        Images added or removed are detected from the subset directory modification times, and
+        edited camera data from the modification time of every source JSON file.
+
+        :return: True if the index no longer matches the dataset
+        :rtype: bool
+        """
+        for subset, mtime in self.header["dir_mtime_ns"].items():
+            if _dir_mtime(self.dir_path.joinpath(subset)) != mtime:
+                return True
+
+        mtimes = self.arrays["mtime_ns"]
+        for i, image in enumerate(self.header["images"]):
+            try:
+                json_path = self.dir_path.joinpath(image).with_suffix('').with_suffix(".json")
+                if os.stat(json_path).st_mtime_ns != mtimes[i]:
+                    return True
+            except OSError:
+                return True
+        return False
+
+    def camera_data(self, i):
+        """ Get the data for a camera in the same layout as its serialized JSON
+
+        :param i: The index of the camera
+        :type i: int
+        :return: The camera data
+        :rtype: dict
+        """
+        return {
+            "projection": self.arrays["projection"][i].tolist(),
+            "bounds": self.arrays["bounds"][i].tolist(),
+            "camera_center": self.arrays["camera_center"][i].tolist(),
+            "geo_bounds": self.arrays["geo_bounds"][i].tolist(),
+            "elevation": float(self.arrays["elevation"][i]),
+        }
+
+    def camera(self, i):
+        """ Create the camera at an index, its projection matrix is a view of the memory mapped data
+
+        :param i: The index of the camera
+        :type i: int
+        :return: The camera
+        :rtype: evtech.Camera
+        """
+        arrays = self.arrays
+        return Camera(arrays["projection"][i], arrays["bounds"][i].tolist(),
+                      arrays["camera_center"][i].tolist(), arrays["geo_bounds"][i].tolist(),
+                      float(arrays["elevation"][i]), get_crs(int(arrays["epsg"][i])), self.image_path(i))
+
+    def load(self, loader = None):
+        """ Load the cameras of the index
+
+        :param loader: function(dict, str), optional, defaults to None which creates the cameras from the arrays
+            of the index like camera_from_json
+        :type loader: function
+        :return: A tuple with list of nadir cams and list of oblique cams
+        :rtype: tuple: list,list
+        """
+        # Compare the unwrapped loader, camera_from_json is wrapped while instrumentation is enabled
+        if loader is None or (getattr(loader, "__wrapped__", loader)
+                              is getattr(camera_from_json, "__wrapped__", camera_from_json)):
+            cams = [self.camera(i) for i in range(len(self))]
+        else:
+            cams = [loader(self.camera_data(i), self.image_path(i)) for i in range(len(self))]
+        return cams[0:self.nadir_count], cams[self.nadir_count:]
+
+def open_dataset_index(dir_path, index_path = None, rebuild = True):
+    """ Open the index of a dataset, compiling it if it is missing or stale
+
+    :param dir_path: Path to the dataset
+    :type dir_path: string
+    :param index_path: Path to the index, defaults to `DEFAULT_INDEX_NAME` in the dataset
+    :type index_path: string, optional
+    :param rebuild: Rebuild a missing or stale index, otherwise raise a ValueError, defaults to True
+    :type rebuild: bool, optional
+    :return: The index
+    :rtype: evtech.DatasetIndex
+    """
+    dir_path = Path(dir_path)
+    if index_path is None:
+        index_path = dir_path.joinpath(DEFAULT_INDEX_NAME)
+
+    if Path(index_path).exists():
+        index = DatasetIndex(index_path, dir_path)
+        if not index.is_stale():
+            return index
+        if not rebuild:
+            raise ValueError("Dataset index is stale: {}".format(index_path))
+    elif not rebuild:
+        raise ValueError("Dataset index does not exist: {}".format(index_path))
+
+    try:
+        compile_dataset_index(dir_path, index_path)
+    except OSError:
+        # Replacing an index that is open elsewhere can fail on some platforms, use the
+        # index of a concurrent rebuild if it is up to date
+        if not Path(index_path).exists():
+            raise
+        index = DatasetIndex(index_path, dir_path)
+        if index.is_stale():
+            raise
+        return index
+    return DatasetIndex(index_path, dir_path)
+
+def _align(offset):
+    """ Round an offset up to the array alignment
+    """
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+def _remove(path):
+    """ Remove a file if it exists
+    """
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def _dir_mtime(path):
+    """ Get the modification time of a directory, or -1 if it does not exist
+    """
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return -1
@@ -0,0 +1,204 @@
+""" Opt-in timing and counting of the evtech hot paths """
+
+import functools
+import importlib
+import sys
+import threading
+import time
+
+# The functions timed while instrumentation is enabled, as module, attribute and metric name
+_TARGETS = (
+    ("camera", "BaseCamera.project_to_camera", "Camera.project_to_camera"),
+    ("camera", "BaseCamera.project_points_to_camera", "Camera.project_points_to_camera"),
+    ("camera", "BaseCamera.project_world_points", "Camera.project_world_points"),
+    ("camera", "BaseCamera.project_from_camera", "Camera.project_from_camera"),
+    ("camera", "BaseCamera.project_points_from_camera", "Camera.project_points_from_camera"),
+    ("camera", "BaseCamera.height_between_points", "Camera.height_between_points"),
+    ("camera", "BaseCamera.heights_between_points", "Camera.heights_between_points"),
+    ("camera", "BaseCamera.load_image", "Camera.load_image"),
+    ("camera", "BaseCamera.load_chip", "Camera.load_chip"),
+    ("camera", "BaseCamera.load_raw_chip", "Camera.load_raw_chip"),
+    ("camera", "_calibrate", "camera.decompose_projection_matrix"),
+    ("camera", "camera_from_json", "camera_from_json"),
+    ("camera", "triangulate_point_from_cameras", "triangulate_point_from_cameras"),
+    ("ray", "Ray.intersect_at_elevation", "Ray.intersect_at_elevation"),
+    ("ray", "RayBundle.intersect_at_elevation", "RayBundle.intersect_at_elevation"),
+    ("geodesy", "get_crs", "geodesy.get_crs"),
+    ("geodesy", "get_transformer", "geodesy.get_transformer"),
+    ("geodesy", "_create_transformer", "geodesy.create_transformer"),
+    ("geodesy", "utm_crs_from_latlon", "geodesy.utm_crs_from_latlon"),
+    ("triangulation", "triangulate_points", "triangulate_points"),
+    ("triangulation", "triangulate_points_robust", "triangulate_points_robust"),
+    ("dataset", "load_dataset", "load_dataset"),
+    ("dataset", "_load_camera", "dataset.load_camera"),
+    ("dataset", "LazyCamera.load", "LazyCamera.load"),
+    ("index", "compile_dataset_index", "compile_dataset_index"),
+    ("index", "open_dataset_index", "open_dataset_index"),
+    ("image_cache", "_decode", "image.decode"),
+)
+
+# The aggregated metrics, callbacks and installed wrappers, guarded by the lock
+_lock = threading.RLock()
+_enabled = False
+_timers = {}
+_counters = {}
+_callbacks = []
+_patches = []
+
+def enable_instrumentation():
+    """ Start timing and counting calls to the main camera, ray, geodesy, triangulation and dataset functions
+
+    The functions are wrapped while instrumentation is enabled, so there is no cost while it is
+    disabled. Along with the timed calls, counters are kept of the Nelder-Mead and Levenberg-Marquardt
+    iterations of the triangulations, of the steps of the elevation model ray marching and of the
+    bytes of decoded images. Only calls made in this
+    process are measured, not those of worker processes.
+
+    Functions are replaced in the evtech modules, so calls through names imported from evtech
+    into other modules before enabling, such as `from evtech import load_dataset`, are not timed.
+    Use `evtech.load_dataset` instead, methods of cameras and rays are always timed.
+    """
+    global _enabled
+    with _lock:
+        if _enabled:
+            return
+        _enabled = True
+        for module_name, path, name in _TARGETS:
+            module = importlib.import_module("." + module_name, __package__)
+            _wrap(module, path, name)
+
+def disable_instrumentation():
+    """ Stop timing and counting calls, restoring the original functions and keeping the statistics
+    """
+    global _enabled
+    with _lock:
+        _enabled = False
+        while _patches:
+            owner, attr, original = _patches.pop()
+            setattr(owner, attr, original)
+
+def reset_instrumentation():
+    """ Reset the statistics of all timers and counters
+    """
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+
+def add_instrumentation_callback(callback):
+    """ Register a function called on every timed call and counted event while instrumentation is enabled
+
+    :param callback: function(kind, name, value) with kind "timer" and the value in seconds for timed calls, or kind "counter" and the counted value for events
+    :type callback: function
+    """
+    with _lock:
+        _callbacks.append(callback)
+
+def remove_instrumentation_callback(callback):
+    """ Unregister a callback added by `add_instrumentation_callback`
+
+    :param callback: The callback
+    :type callback: function
+    """
+    with _lock:
+        _callbacks.remove(callback)
+
+def instrumentation_stats():
+    """ Get the aggregated statistics of the timers and counters
+
+    :return: A dict with the "timers", each with the number of calls, total seconds and slowest call in seconds, and the "counters", each with the number of events and their total value
+    :rtype: dict
+    """
+    with _lock:
+        return {
+            "timers": {name: dict(stats) for name, stats in _timers.items()},
+            "counters": {name: dict(stats) for name, stats in _counters.items()},
+        }
+
+def instrumentation_prometheus():
+    """ Export the aggregated statistics in the Prometheus text exposition format
+
+    :return: The metrics text
+    :rtype: str
+    """
+    stats = instrumentation_stats()
+    metrics = [
+        ("evtech_calls_total", "counter", "Calls of instrumented evtech functions", "function", "timers", "calls"),
+        ("evtech_call_seconds_total", "counter", "Time spent in instrumented evtech functions", "function", "timers", "seconds"),
+        ("evtech_call_max_seconds", "gauge", "Slowest call of instrumented evtech functions", "function", "timers", "max_seconds"),
+        ("evtech_events_total", "counter", "Counted evtech events", "event", "counters", "calls"),
+        ("evtech_event_value_total", "counter", "Total value of counted evtech events", "event", "counters", "total"),
+    ]
+    lines = []
+    for metric, kind, doc, label, group, field in metrics:
+        lines.append("# HELP {} {}".format(metric, doc))
+        lines.append("# TYPE {} {}".format(metric, kind))
+        for name in sorted(stats[group]):
+            lines.append('{}{{{}="{}"}} {!r}'.format(metric, label, name, stats[group][name][field]))
+    return "\n".join(lines) + "\n"
+
+def record(name, value = 1):
+    """ Count an event while instrumentation is enabled
+
+    :param name: The name of the counter
+    :type name: str
+    :param value: The value added to the counter, defaults to 1
+    :type value: int or float, optional
+    """
+    if not _enabled:
+        return
+    with _lock:
+        stats = _counters.get(name)
+        if stats is None:
+            stats = _counters[name] = {"calls": 0, "total": 0}
+        stats["calls"] += 1
+        stats["total"] += value
+        callbacks = list(_callbacks)
+    for callback in callbacks:
+        callback("counter", name, value)
+
+def _record_time(name, seconds):
+    """ Add a timed call to a timer
+    """
+    with _lock:
+        stats = _timers.get(name)
+        if stats is None:
+            stats = _timers[name] = {"calls": 0, "seconds": 0.0, "max_seconds": 0.0}
+        stats["calls"] += 1
+        stats["seconds"] += seconds
+        stats["max_seconds"] = max(stats["max_seconds"], seconds)
+        callbacks = list(_callbacks)
+    for callback in callbacks:
+        callback("timer", name, seconds)
+
+def _timed(name, func):
+    """ Wrap a function to time its calls
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _record_time(name, time.perf_counter() - start)
+    return wrapper
+
+def _wrap(module, path, name):
+    """ Replace a function or method with a timed wrapper, including the references to a
+    function imported into other evtech modules
+    """
+    owner = module
+    parts = path.split(".")
+    for part in parts[:-1]:
+        owner = getattr(owner, part)
+    original = owner.__dict__[parts[-1]]
+    wrapper = _timed(name, original)
+
+    owners = [owner]
+    if owner is module:
+        owners = [mod for mod_name, mod in list(sys.modules.items())
+                  if mod is not None and (mod_name == __package__ or mod_name.startswith(__package__ + "."))]
+    for mod in owners:
+        for attr, value in list(vars(mod).items()):
+            if value is original:
+                _patches.append((mod, attr, original))
+                setattr(mod, attr, wrapper)
@@ -0,0 +1,224 @@
+""" Tiled mosaics of many nadir cameras """
+
+import json
+import os
+import cv2
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from .cache import LRUCache
+from .collection import CameraCollection
+from .dataset import LazyCamera
+from .geodesy import get_crs, get_transformer
+from .ortho import render_tile, _tile_coordinates
+
+# The name of the manifest within a mosaic directory
+MOSAIC_MANIFEST = "mosaic.json"
+
+# The state of the current worker process, see `_init_worker`
+_worker_state = None
+
+def build_mosaic(cameras, out_dir, resolution, bounds = None, tile_size = 1024, dsm = None,
+                 workers = None, max_cameras = 8, dtype = np.uint8, channels = 3,
+                 interpolation = cv2.INTER_LINEAR, cache_bytes = 1 << 30):
+    """ Build a mosaic of nadir cameras as a directory of tiles
+
+    Every output pixel is taken from the camera whose center is closest to it horizontally among
+    the cameras that see it, so the choice of camera does not depend on the tiling and tiles join
+    without seams. The candidate cameras of a tile are found from the spatial index of their
+    footprints, closest first.
+
+    Tiles are written to `<out_dir>/tiles/<row>_<col>.npy` as they are rendered, with the grid
+    described by `<out_dir>/mosaic.json`. Rendering the same mosaic into an existing directory
+    resumes it, only the missing tiles are rendered. Images are loaded as tiles need them and kept
+    in a cache bounded in bytes, and when workers are requested tiles are rendered across a process
+    pool with a cache in each worker.
+
+    :param cameras: The cameras, all cameras must share a CRS
+    :type cameras: list
+    :param out_dir: The directory of the mosaic
+    :type out_dir: str
+    :param resolution: The size of an output pixel in the units of the camera CRS
+    :type resolution: float
+    :param bounds: The area [min_x, min_y, max_x, max_y] in the camera CRS, defaults to the union of the geo bounds of the cameras
+    :type bounds: list, optional
+    :param tile_size: The width and height of the tiles, defaults to 1024
+    :type tile_size: int, optional
+    :param dsm: An elevation model for the ground, defaults to None which uses the elevation of each camera
+    :type dsm: class: `evtech.ElevationModel`, optional
+    :param workers: Number of processes rendering tiles, defaults to None which renders serially
+    :type workers: int, optional
+    :param max_cameras: The maximum number of cameras considered for each tile, defaults to 8
+    :type max_cameras: int, optional
+    :param dtype: The data type of the mosaic, defaults to numpy.uint8
+    :type dtype: numpy.dtype, optional
+    :param channels: The number of channels of the images, defaults to 3
+    :type channels: int, optional
+    :param interpolation: The OpenCV interpolation used to resample the images, defaults to cv2.INTER_LINEAR
+    :type interpolation: int, optional
+    :param cache_bytes: The size of the image cache of each process in bytes, defaults to 1GB
+    :type cache_bytes: int, optional
+    :return: The manifest of the mosaic
+    :rtype: dict
+    """
+    cameras = [cam.load() if isinstance(cam, LazyCamera) else cam for cam in cameras]
+    if len(cameras) == 0:
+        raise ValueError("No cameras to mosaic")
+    crs = cameras[0].crs
+    if any(cam.crs.srs != crs.srs for cam in cameras):
+        raise ValueError("All cameras of a mosaic must share a CRS")
+
+    if bounds is None:
+        geo_bounds = np.array([cam.geo_bounds[0:4] for cam in cameras], dtype=float)
+        lon = np.concatenate([geo_bounds[:, 0], geo_bounds[:, 0], geo_bounds[:, 2], geo_bounds[:, 2]])
+        lat = np.concatenate([geo_bounds[:, 1], geo_bounds[:, 3], geo_bounds[:, 1], geo_bounds[:, 3]])
+        x, y = get_transformer(4326, crs).transform(lon, lat)
+        bounds = [np.min(x), np.min(y), np.max(x), np.max(y)]
+
+    min_x, min_y, max_x, max_y = [float(v) for v in bounds]
+    width = max(int(np.ceil((max_x - min_x) / resolution)), 1)
+    height = max(int(np.ceil((max_y - min_y) / resolution)), 1)
+    manifest = {
+        "geotransform": [min_x, resolution, 0.0, max_y, 0.0, -resolution],
+        "crs": crs.srs,
+        "shape": [height, width, channels],
+        "dtype": np.dtype(dtype).str,
+        "tile_size": tile_size,
+        "tiles": [-(-height // tile_size), -(-width // tile_size)],
+    }
+
+    out_dir = Path(out_dir)
+    out_dir.joinpath("tiles").mkdir(parents=True, exist_ok=True)
+    manifest_path = out_dir.joinpath(MOSAIC_MANIFEST)
+    if manifest_path.exists():
+        with open(manifest_path) as f:
+            if json.load(f) != manifest:
+                raise ValueError("A different mosaic exists in {}".format(out_dir))
+    else:
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f)
+
+    # Find the candidate cameras of the missing tiles, closest first
+    collection = CameraCollection(cameras)
+    index = {id(cam): i for i, cam in enumerate(cameras)}
+    to_lonlat = get_transformer(crs, 4326)
+    tasks = []
+    for row in range(manifest["tiles"][0]):
+        for col in range(manifest["tiles"][1]):
+            if _tile_path(out_dir, row, col).exists():
+                continue
+            rows, cols = _tile_slices(manifest, row, col)
+            tile_x = [min_x + cols.start * resolution, min_x + cols.stop * resolution]
+            tile_y = [max_y - rows.stop * resolution, max_y - rows.start * resolution]
+            lon, lat = to_lonlat.transform([tile_x[0], tile_x[0], tile_x[1], tile_x[1]],
+                                           [tile_y[0], tile_y[1], tile_y[0], tile_y[1]])
+            candidates = collection.query_bbox(min(lon), min(lat), max(lon), max(lat), sort_by="distance")
+            idx = [index[id(cam)] for cam in candidates[0:max_cameras]]
+            tasks.append((row, col, idx))
+
+    options = {"manifest": manifest, "interpolation": interpolation, "out_dir": str(out_dir)}
+    if workers is not None and workers > 1:
+        initargs = (cameras, dsm, options, cache_bytes)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+            futures = [pool.submit(_render_worker_tile, row, col, idx) for row, col, idx in tasks]
+            for future in futures:
+                future.result()
+    else:
+        images = _image_cache(cache_bytes)
+        for row, col, idx in tasks:
+            _render_mosaic_tile(cameras, dsm, options, images, row, col, idx)
+
+    return manifest
+
+def read_mosaic(out_dir, window = None):
+    """ Read a window of a mosaic written by `build_mosaic`
+
+    :param out_dir: The directory of the mosaic
+    :type out_dir: str
+    :param window: The window [x_min, y_min, x_max, y_max] in mosaic pixels, the max being the last pixel, defaults to the whole mosaic
+    :type window: list, optional
+    :return: The pixels of the window, its GDAL style geotransform and the CRS of the mosaic
+    :rtype: tuple: numpy.array, tuple, class: `pyproj.CRS`
+    """
+    out_dir = Path(out_dir)
+    with open(out_dir.joinpath(MOSAIC_MANIFEST)) as f:
+        manifest = json.load(f)
+    height, width = manifest["shape"][0:2]
+    if window is None:
+        window = [0, 0, width - 1, height - 1]
+    c0, r0 = max(int(window[0]), 0), max(int(window[1]), 0)
+    c1, r1 = min(int(window[2]), width - 1), min(int(window[3]), height - 1)
+
+    out = np.zeros((r1 - r0 + 1, c1 - c0 + 1) + tuple(manifest["shape"][2:]), dtype=manifest["dtype"])
+    size = manifest["tile_size"]
+    for row in range(r0 // size, r1 // size + 1):
+        for col in range(c0 // size, c1 // size + 1):
+            tile_path = _tile_path(out_dir, row, col)
+            if not tile_path.exists():
+                continue
+            tile = np.load(tile_path, mmap_mode="r")
+            tr0, tc0 = max(r0 - row * size, 0), max(c0 - col * size, 0)
+            tr1, tc1 = min(r1 - row * size, size - 1), min(c1 - col * size, size - 1)
+            out[row * size + tr0 - r0:row * size + tr1 - r0 + 1, col * size + tc0 - c0:col * size + tc1 - c0 + 1] = \
+                tile[tr0:tr1 + 1, tc0:tc1 + 1]
+
+    gt = manifest["geotransform"]
+    geotransform = (gt[0] + c0 * gt[1], gt[1], 0.0, gt[3] + r0 * gt[5], 0.0, gt[5])
+    return out, geotransform, get_crs(manifest["crs"])
+
+def _render_mosaic_tile(cameras, dsm, options, images, row, col, idx):
+    """ Render a tile of a mosaic from the candidate cameras at indices and write it atomically
+    """
+    manifest = options["manifest"]
+    rows, cols = _tile_slices(manifest, row, col)
+    x, y = _tile_coordinates(manifest["geotransform"], rows, cols)
+    shape = x.shape + tuple(manifest["shape"][2:])
+    tile = np.zeros(shape, dtype=manifest["dtype"])
+
+    # Take each pixel from the camera closest to it horizontally, among the cameras seeing it
+    best = np.full(x.shape, np.inf)
+    for i in idx:
+        cam = cameras[i]
+        image = images.get_or_create(i, cam.load_image)
+        rendered, seen = render_tile(cam, image, x, y, dsm, options["interpolation"])
+        dist = np.hypot(x - cam.image_center[0], y - cam.image_center[1])
+        closer = seen & (dist < best)
+        tile[closer] = rendered.reshape(shape)[closer]
+        best[closer] = dist[closer]
+
+    tile_path = _tile_path(options["out_dir"], row, col)
+    tmp_path = tile_path.with_name(tile_path.stem + ".tmp.npy")
+    np.save(str(tmp_path), tile)
+    os.replace(tmp_path, tile_path)
+
+def _init_worker(cameras, dsm, options, cache_bytes):
+    """ Hold the cameras of the mosaic in a worker process
+    """
+    global _worker_state
+    _worker_state = (cameras, dsm, options, _image_cache(cache_bytes))
+
+def _render_worker_tile(row, col, idx):
+    """ Render a tile of the mosaic of a worker process
+    """
+    cameras, dsm, options, images = _worker_state
+    _render_mosaic_tile(cameras, dsm, options, images, row, col, idx)
+
+def _image_cache(cache_bytes):
+    """ Create a cache of the images of the cameras, bounded by their size in bytes
+    """
+    return LRUCache(maxsize=cache_bytes, getsizeof=lambda image: image.nbytes)
+
+def _tile_slices(manifest, row, col):
+    """ Get the rows and columns of the mosaic covered by a tile
+    """
+    size = manifest["tile_size"]
+    height, width = manifest["shape"][0:2]
+    return (slice(row * size, min((row + 1) * size, height)),
+            slice(col * size, min((col + 1) * size, width)))
+
+def _tile_path(out_dir, row, col):
+    """ Get the path of a tile of a mosaic
+    """
+    return Path(out_dir).joinpath("tiles", "{}_{}.npy".format(row, col))
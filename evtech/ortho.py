@@ -0,0 +1,138 @@
+""" Orthorectification of camera images onto a ground grid """
+
+import json
+import math
+import cv2
+import numpy as np
+
+from pathlib import Path
+
+from .geodesy import get_crs, get_transformer
+
+def ortho_grid(camera, resolution, bounds = None):
+    """ Get the ground grid covering the footprint of a camera in its CRS
+
+    :param camera: The camera
+    :type camera: class: `evtech.Camera`
+    :param resolution: The size of an output pixel in the units of the camera CRS
+    :type resolution: float
+    :param bounds: The area [min_x, min_y, max_x, max_y] in the camera CRS, defaults to the geo bounds of the camera
+    :type bounds: list, optional
+    :return: The GDAL style geotransform of the grid and its (height, width)
+    :rtype: tuple: tuple, tuple
+    """
+    if bounds is None:
+        lon_min, lat_min, lon_max, lat_max = camera.geo_bounds[0:4]
+        x, y = get_transformer(4326, camera.crs).transform([lon_min, lon_min, lon_max, lon_max],
+                                                           [lat_min, lat_max, lat_min, lat_max])
+        bounds = [min(x), min(y), max(x), max(y)]
+
+    min_x, min_y, max_x, max_y = bounds
+    width = max(int(math.ceil((max_x - min_x) / resolution)), 1)
+    height = max(int(math.ceil((max_y - min_y) / resolution)), 1)
+    return (min_x, resolution, 0.0, max_y, 0.0, -resolution), (height, width)
+
+def orthorectify(camera, out_path, resolution, bounds = None, tile_size = 1024, dsm = None,
+                 interpolation = cv2.INTER_LINEAR, image = None):
+    """ Orthorectify the image of a camera into a north-up raster in the camera CRS
+
+    The output is written tile by tile into a memory mapped `.npy` file, so the memory used does
+    not grow with the output area. The geotransform and CRS of the raster are written alongside
+    it to a `.json` file with the same name. Ground points outside of the image are zero.
+
+    Only the ground elevation is modelled, surfaces occluded from the camera are not detected.
+
+    :param camera: The camera
+    :type camera: class: `evtech.Camera`
+    :param out_path: The path of the output `.npy` file
+    :type out_path: str
+    :param resolution: The size of an output pixel in the units of the camera CRS
+    :type resolution: float
+    :param bounds: The area [min_x, min_y, max_x, max_y] in the camera CRS, defaults to the geo bounds of the camera
+    :type bounds: list, optional
+    :param tile_size: The width and height of the tiles, defaults to 1024
+    :type tile_size: int, optional
+    :param dsm: An elevation model for the ground, defaults to None which uses the elevation of the camera
+    :type dsm: class: `evtech.ElevationModel`, optional
+    :param interpolation: The OpenCV interpolation used to resample the image, defaults to cv2.INTER_LINEAR
+    :type interpolation: int, optional
+    :param image: The image of the camera, defaults to None which loads it
+    :type image: class: `numpy.array`, optional
+    :return: The metadata of the raster
+    :rtype: dict
+    """
+    if image is None:
+        image = camera.load_image()
+    geotransform, shape = ortho_grid(camera, resolution, bounds)
+    out_shape = shape + image.shape[2:]
+
+    out_path = Path(out_path)
+    out = np.lib.format.open_memmap(out_path, mode="w+", dtype=image.dtype, shape=out_shape)
+    for r0 in range(0, shape[0], tile_size):
+        for c0 in range(0, shape[1], tile_size):
+            rows = slice(r0, min(r0 + tile_size, shape[0]))
+            cols = slice(c0, min(c0 + tile_size, shape[1]))
+            x, y = _tile_coordinates(geotransform, rows, cols)
+            out[rows, cols], _ = render_tile(camera, image, x, y, dsm, interpolation)
+            out.flush()
+    del out
+
+    metadata = {"geotransform": list(geotransform), "crs": camera.crs.srs, "shape": list(out_shape)}
+    with open(out_path.with_suffix(".json"), "w") as f:
+        json.dump(metadata, f)
+    return metadata
+
+def open_orthophoto(path):
+    """ Open a raster written by `orthorectify` as a read-only memory map
+
+    :param path: The path of the `.npy` file
+    :type path: str
+    :return: The raster, its GDAL style geotransform and its CRS
+    :rtype: tuple: numpy.memmap, tuple, class: `pyproj.CRS`
+    """
+    path = Path(path)
+    with open(path.with_suffix(".json")) as f:
+        metadata = json.load(f)
+    return np.load(path, mmap_mode="r"), tuple(metadata["geotransform"]), get_crs(metadata["crs"])
+
+def render_tile(camera, image, x, y, dsm = None, interpolation = cv2.INTER_LINEAR):
+    """ Resample the image of a camera at a grid of ground points
+
+    :param camera: The camera
+    :type camera: class: `evtech.Camera`
+    :param image: The image of the camera
+    :type image: class: `numpy.array`
+    :param x: The (H,W) x coordinates of the ground points in the camera CRS
+    :type x: class: `numpy.array`
+    :param y: The (H,W) y coordinates of the ground points in the camera CRS
+    :type y: class: `numpy.array`
+    :param dsm: An elevation model for the ground, defaults to None which uses the elevation of the camera
+    :type dsm: class: `evtech.ElevationModel`, optional
+    :param interpolation: The OpenCV interpolation used to resample the image, defaults to cv2.INTER_LINEAR
+    :type interpolation: int, optional
+    :return: The resampled (H,W) tile and a mask of the ground points seen by the camera
+    :rtype: tuple: numpy.array, numpy.array
+    """
+    z = np.full(x.shape, float(camera.get_elevation()))
+    if dsm is not None:
+        # Ground points without data in the elevation model fall back to the camera elevation
+        elev = dsm.elevation_at(x, y)
+        z = np.where(np.isnan(elev), z, elev)
+
+    # Project the whole tile at once
+    img_pts, in_front = camera.project_world_points(np.column_stack([x.ravel(), y.ravel(), z.ravel()]))
+    img_pts[~in_front] = -1
+    map_x = img_pts[:, 0].reshape(x.shape).astype(np.float32)
+    map_y = img_pts[:, 1].reshape(x.shape).astype(np.float32)
+
+    tile = cv2.remap(image, map_x, map_y, interpolation, borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+    height, width = image.shape[0:2]
+    seen = (map_x >= 0) & (map_x <= width - 1) & (map_y >= 0) & (map_y <= height - 1)
+    return tile, seen
+
+def _tile_coordinates(geotransform, rows, cols):
+    """ Get the coordinates of the centers of the pixels of a tile of a raster
+    """
+    col = np.arange(cols.start, cols.stop) + 0.5
+    row = np.arange(rows.start, rows.stop) + 0.5
+    return np.meshgrid(geotransform[0] + col * geotransform[1], geotransform[3] + row * geotransform[5])
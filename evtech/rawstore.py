@@ -0,0 +1,135 @@
+""" Uncompressed, memory mapped copies of dataset images for fast random access crops
+
+The raw store mirrors the dataset layout, the image `<dataset>/nadirs/<name>.jpg` is
+stored row-major as `<dataset>/raw/nadirs/<name>.npy`.
+
+The store of a dataset can be built from the command line::
+
+    python -m evtech.rawstore <dataset> --workers 4
+"""
+
+import argparse
+import os
+import uuid
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from .cache import LRUCache
+
+# The directory of the raw store within a dataset
+RAW_DIR = "raw"
+
+_SUBSETS = ("nadirs", "obliques")
+
+# Open memory maps keyed by path and modification time
+_raw_cache = LRUCache(maxsize=64)
+
+def raw_image_path(image_path):
+    """ Get the path of the raw copy of a dataset image
+
+    :param image_path: The path to the image in the dataset
+    :type image_path: str
+    :return: The path to the raw image
+    :rtype: pathlib.Path
+    """
+    image_path = Path(image_path)
+    return image_path.parent.parent.joinpath(RAW_DIR, image_path.parent.name, image_path.stem + ".npy")
+
+def convert_image(image_path, raw_path = None, loader = None, overwrite = False):
+    """ Decode an image and write it to the raw store
+
+    The raw image is written to a temporary file first, so readers never see a partial image.
+
+    :param image_path: The path to the image
+    :type image_path: str
+    :param raw_path: The path to write the raw image to, defaults to `raw_image_path`
+    :type raw_path: str, optional
+    :param loader: function(str) that loads the image, defaults to cv2.imread
+    :type loader: function, optional
+    :param overwrite: Convert the image even if the raw image is newer than the image, defaults to False
+    :type overwrite: bool, optional
+    :return: True if the image was converted, False if it was up to date
+    :rtype: bool
+    """
+    if loader is None:
+        import cv2
+        loader = cv2.imread
+
+    raw_path = raw_image_path(image_path) if raw_path is None else Path(raw_path)
+    if not overwrite and raw_path.exists() and os.stat(raw_path).st_mtime_ns >= os.stat(image_path).st_mtime_ns:
+        return False
+
+    img = loader(str(image_path))
+    if img is None:
+        raise IOError("Unable to read image: {}".format(image_path))
+
+    raw_path.parent.mkdir(parents=True, exist_ok=True)
+    # The temporary file is unique to this converter so concurrent conversions do not share it
+    tmp_path = raw_path.with_name("{}.{}.tmp".format(raw_path.name, uuid.uuid4().hex))
+    try:
+        out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=img.dtype, shape=img.shape)
+        out[...] = img
+        out.flush()
+        del out
+        os.replace(tmp_path, raw_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return True
+
+def build_raw_store(dir_path, workers = None, overwrite = False):
+    """ Convert the images of a dataset into its raw store
+
+    :param dir_path: Path to the dataset
+    :type dir_path: string
+    :param workers: Number of threads converting images, defaults to None which converts serially
+    :type workers: int, optional
+    :param overwrite: Convert all images, otherwise only images newer than their raw copy, defaults to False
+    :type overwrite: bool, optional
+    :return: The number of images converted
+    :rtype: int
+    """
+    images = []
+    for subset in _SUBSETS:
+        images.extend(Path(dir_path).joinpath(subset).glob('*.jpg'))
+
+    convert = lambda img: convert_image(img, overwrite=overwrite)
+    if workers is not None and workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return sum(pool.map(convert, images))
+    return sum(convert(img) for img in images)
+
+def open_raw_image(image_path):
+    """ Open the raw copy of a dataset image as a read-only memory map
+
+    :param image_path: The path to the image in the dataset
+    :type image_path: str
+    :return: The memory mapped image
+    :rtype: numpy.memmap
+    """
+    raw_path = raw_image_path(image_path)
+    try:
+        mtime = os.stat(raw_path).st_mtime_ns
+    except OSError:
+        raise FileNotFoundError("No raw image for {}, see build_raw_store".format(image_path))
+    return _raw_cache.get_or_create((str(raw_path), mtime), lambda: np.load(raw_path, mmap_mode="r"))
+
+def _main(args = None):
+    """ Build the raw store of a dataset from the command line
+    """
+    parser = argparse.ArgumentParser(description="Convert the images of a dataset into a memory mappable raw store")
+    parser.add_argument("dataset", help="Path to the dataset")
+    parser.add_argument("--workers", type=int, default=None, help="Number of threads converting images")
+    parser.add_argument("--overwrite", action="store_true", help="Convert images that are already up to date")
+    args = parser.parse_args(args)
+
+    count = build_raw_store(args.dataset, args.workers, args.overwrite)
+    print("Converted {} images".format(count))
+
+if __name__ == "__main__":
+    _main()
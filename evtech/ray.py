@@ -1,8 +1,8 @@
 """Ray class for evtech."""
 
 import numpy as np
-from sklearn import preprocessing
-from pyproj import CRS, Transformer
+
+from .geodesy import get_transformer
 
 class Ray():
     """ A class to represent rays in three dimensional space
@@ -19,7 +19,9 @@ class Ray():
         """ Constructor method
         """
         self.origin = np.transpose(np.array([origin]))
-        self.direction = np.transpose(preprocessing.normalize(np.array([direction]), norm='l2'))
+        direction = np.array([direction], dtype=float)
+        norm = np.linalg.norm(direction)
+        self.direction = np.transpose(direction / norm if norm > 0 else direction)
         self.crs = crs
 
     def point_at_depth(self, depth):
@@ -55,8 +57,82 @@ class Ray():
         pt = self.point_at_depth(depth)
 
         if latlng:
-            transformer = Transformer.from_crs(self.crs, CRS.from_user_input(4326), always_xy=True)
+            transformer = get_transformer(self.crs, 4326)
             pt[0],pt[1],pt[2] = transformer.transform(pt[0], pt[1], pt[2])
     
         [pt] = np.transpose(pt)
-        return pt
\ No newline at end of file
+        return pt
+
+class RayBundle():
+    """ A class to represent many rays in three dimensional space as arrays
+
+    :param origins: A (N,3) array of ray origins, a single 3 element origin is shared by all rays
+    :type origins: class: `numpy.array`
+    :param directions: A (N,3) array of ray directions
+    :type directions: class: `numpy.array`
+    :param crs: The CRS for the coordinates of the rays
+    :type crs: class: `pyproj.CRS`
+    """
+
+    def __init__(self, origins, directions, crs):
+        """ Constructor method
+        """
+        directions = np.asarray(directions, dtype=float).reshape(-1, 3)
+        origins = np.asarray(origins, dtype=float)[..., 0:3]
+        self.origins = np.array(np.broadcast_to(origins, directions.shape))
+        self.directions = directions / np.linalg.norm(directions, axis=1)[:, np.newaxis]
+        self.crs = crs
+
+    def __len__(self):
+        return len(self.directions)
+
+    def __getitem__(self, idx):
+        """ Get a single ray from the bundle
+
+        :param idx: The index of the ray
+        :type idx: int
+        :return: The ray at the index
+        :rtype: class: `evtech.Ray`
+        """
+        return Ray(self.origins[idx], self.directions[idx], self.crs)
+
+    def point_at_depth(self, depth):
+        """ Return 3D points at given depths along the rays
+
+        :param depth: The depth along each ray, a scalar is applied to all rays
+        :type depth: class: `numpy.array`
+        :return: A (N,3) array of points
+        :rtype: numpy.array
+        """
+        depth = np.asarray(depth, dtype=float)
+        return self.origins + depth.reshape(-1, 1) * self.directions
+
+    def depth_at_elevation(self, elevation):
+        """ Return the depths at given elevations
+
+        :param elevation: The elevation for each ray, a scalar is applied to all rays
+        :type elevation: class: `numpy.array`
+        :return: The depth along each ray
+        :rtype: numpy.array
+        """
+        return (np.asarray(elevation, dtype=float) - self.origins[:, 2])/self.directions[:, 2]
+
+    def intersect_at_elevation(self, elevation, latlng=True):
+        """Return three dimensional points intersected at given elevations
+
+        :param elevation: The elevation for each ray, a scalar is applied to all rays
+        :type elevation: class: `numpy.array`
+        :param latlng: Return the points as lat,lng, elevation, defaults to True
+        :type latlng: bool, optional
+        :return: A (N,3) array of points
+        :rtype: numpy.array
+        """
+        depth = self.depth_at_elevation(elevation)
+        pts = self.point_at_depth(depth)
+
+        if latlng:
+            transformer = get_transformer(self.crs, 4326)
+            x, y, z = transformer.transform(pts[:, 0], pts[:, 1], pts[:, 2])
+            pts = np.column_stack([x, y, z])
+
+        return pts
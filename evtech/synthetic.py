@@ -0,0 +1,287 @@
+""" Synthetic datasets of simulated flights for testing at scale """
+
+import json
+import math
+import cv2
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from .geodesy import get_transformer, utm_epsg_from_latlon
+
+# The name of the ground truth file within a synthetic dataset directory
+GROUND_TRUTH_NAME = "ground_truth.npz"
+
+# The look directions of the obliques captured at every station, as name and azimuth in degrees
+_OBLIQUE_VIEWS = (("N", 0.0), ("E", 90.0), ("S", 180.0), ("W", 270.0))
+
+def generate_dataset(dir_path, stations = 100, origin = (-88.0755, 42.3885), altitude = 1000.0,
+                     elevation = 250.0, spacing = None, image_size = (4000, 3000), focal_length = 10000.0,
+                     obliques = True, oblique_tilt = 45.0, images = False, points = 0, relief = 30.0,
+                     pixel_noise = 0.0, seed = 0, workers = None):
+    """ Generate a dataset of a simulated flight in the layout read by `evtech.load_dataset`
+
+    The flight is a grid of stations flown in east-west lines, centered on the origin, over flat
+    ground at the given elevation. A nadir is captured at every station, along with four obliques
+    looking north, east, south and west. Each camera is written as a `.jpg` and `.json` pair, with
+    a projection matrix, camera center, geo bounds and elevation in the UTM zone of the origin.
+
+    With points, ground truth points are scattered over the flight between the ground elevation and
+    the relief above it, and projected into every camera that sees them. They are written to
+    `ground_truth.npz` in the dataset, see `load_ground_truth`. Occlusions are not modelled.
+
+    :param dir_path: The directory to write the dataset to
+    :type dir_path: str
+    :param stations: The number of stations, defaults to 100
+    :type stations: int, optional
+    :param origin: The lon, lat center of the flight, defaults to (-88.0755, 42.3885)
+    :type origin: tuple, optional
+    :param altitude: The height of the cameras above the ground, defaults to 1000.0
+    :type altitude: float, optional
+    :param elevation: The elevation of the ground, defaults to 250.0
+    :type elevation: float, optional
+    :param spacing: The distance between stations, defaults to None which overlaps nadirs by 40%
+    :type spacing: float, optional
+    :param image_size: The width and height of the images, defaults to (4000, 3000)
+    :type image_size: tuple, optional
+    :param focal_length: The focal length in pixels, defaults to 10000.0
+    :type focal_length: float, optional
+    :param obliques: Capture obliques at every station, defaults to True
+    :type obliques: bool, optional
+    :param oblique_tilt: The angle of the obliques from nadir in degrees, defaults to 45.0
+    :type oblique_tilt: float, optional
+    :param images: Write gray placeholder JPEGs of the image size, otherwise the image files are empty, defaults to False
+    :type images: bool, optional
+    :param points: The number of ground truth points, defaults to 0
+    :type points: int, optional
+    :param relief: The height of the ground truth points above the ground, defaults to 30.0
+    :type relief: float, optional
+    :param pixel_noise: The standard deviation of the noise added to the observations in pixels, defaults to 0.0
+    :type pixel_noise: float, optional
+    :param seed: The seed of the random ground truth, defaults to 0
+    :type seed: int, optional
+    :param workers: Number of threads writing the files, defaults to None which writes serially
+    :type workers: int, optional
+    :return: A summary of the dataset with its EPSG code and the number of cameras, points and observations
+    :rtype: dict
+    """
+    width, height = image_size
+    calibration = np.array([[focal_length, 0, width / 2], [0, focal_length, height / 2], [0, 0, 1]])
+    views = [("", 0.0, 0.0)]
+    if obliques:
+        views += [(name, oblique_tilt, azimuth) for name, azimuth in _OBLIQUE_VIEWS]
+    if oblique_tilt + math.degrees(math.atan(max(width, height) / 2 / focal_length)) >= 90:
+        raise ValueError("The obliques must not see the horizon")
+    if spacing is None:
+        spacing = 0.6 * altitude * min(width, height) / focal_length
+
+    # Lay out the stations in the UTM zone of the origin
+    epsg = utm_epsg_from_latlon(origin[1], origin[0])
+    x0, y0 = get_transformer(4326, epsg).transform(origin[0], origin[1])
+    grid = _station_grid(stations, spacing, (x0, y0))
+    centers = np.column_stack([grid["x"], grid["y"], np.full(stations, elevation + altitude)])
+
+    # Every view shares its rotation across stations, P = K R [I | -C]
+    rotations = np.stack([_rotation(tilt, azimuth) for _, tilt, azimuth in views])
+    kr = calibration @ rotations
+    proj = np.empty((stations, len(views), 3, 4))
+    proj[:, :, :, 0:3] = kr[np.newaxis]
+    proj[:, :, :, 3] = -np.einsum('vij,sj->svi', kr, centers)
+    proj = proj.reshape(-1, 3, 4)
+
+    # The geo bounds are the footprints of the image corners on the ground
+    corners = np.array([[0, 0, 1], [width, 0, 1], [0, height, 1], [width, height, 1]], dtype=float)
+    dirs = np.einsum('vij,kj->vki', np.linalg.inv(kr), corners)
+    depth = -altitude / dirs[:, :, 2]
+    ground = centers[:, np.newaxis, np.newaxis, 0:2] + (depth[:, :, np.newaxis] * dirs[:, :, 0:2])[np.newaxis]
+    lon, lat = get_transformer(epsg, 4326).transform(ground[..., 0].ravel(), ground[..., 1].ravel())
+    lon = np.asarray(lon).reshape(-1, 4)
+    lat = np.asarray(lat).reshape(-1, 4)
+    geo_bounds = np.column_stack([lon.min(axis=1), lat.min(axis=1), lon.max(axis=1), lat.max(axis=1)])
+
+    # Cameras are placed in the UTM zone of the corner of their geo bounds when loaded
+    for lon_corner in (geo_bounds[:, 0].min(), geo_bounds[:, 0].max()):
+        for lat_corner in (geo_bounds[:, 1].min(), geo_bounds[:, 1].max()):
+            if utm_epsg_from_latlon(lat_corner, lon_corner) != epsg:
+                raise ValueError("The flight crosses the boundary of UTM zone EPSG:{}".format(epsg))
+
+    names = ["{}{:06d}{}".format("O" if tilt else "N", grid["order"][s], name)
+             for s in range(stations) for name, tilt, _ in views]
+    subsets = ["obliques" if tilt else "nadirs" for _ in range(stations) for _, tilt, _ in views]
+    records = [{
+        "projection": proj[i].tolist(),
+        "bounds": [0, 0, width - 1, height - 1],
+        "camera_center": centers[i // len(views)].tolist(),
+        "geo_bounds": geo_bounds[i].tolist(),
+        "elevation": elevation,
+    } for i in range(len(names))]
+
+    dir_path = Path(dir_path)
+    for subset in ("nadirs", "obliques"):
+        dir_path.joinpath(subset).mkdir(parents=True, exist_ok=True)
+    image_data = b""
+    if images:
+        image_data = cv2.imencode(".jpg", np.full((height, width, 3), 128, dtype=np.uint8))[1].tobytes()
+
+    def write(i):
+        img_path = dir_path.joinpath(subsets[i], names[i] + ".jpg")
+        img_path.write_bytes(image_data)
+        img_path.with_suffix(".json").write_text(json.dumps(records[i]))
+
+    if workers is not None and workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(write, range(len(names))))
+    else:
+        for i in range(len(names)):
+            write(i)
+
+    summary = {
+        "epsg": epsg,
+        "nadirs": stations,
+        "obliques": stations * (len(views) - 1),
+        "points": points,
+        "observations": 0,
+    }
+    if points > 0:
+        truth = _ground_truth(proj, grid, dirs, (width, height), points, spacing,
+                              altitude, elevation, relief, pixel_noise, seed)
+        truth["cameras"] = np.array([names[i] + ".jpg" for i in range(len(names))])
+        truth["epsg"] = np.array(epsg)
+        np.savez(dir_path.joinpath(GROUND_TRUTH_NAME), **truth)
+        summary["observations"] = len(truth["pixels"])
+    return summary
+
+def load_ground_truth(dir_path):
+    """ Load the ground truth of a dataset written by `generate_dataset`
+
+    The ground truth holds the (T,3) `points` in the CRS of the dataset, its `epsg` code, the
+    image file names of the `cameras` and, for every observation of a point, the index of the
+    point in `point_index`, the index of the camera in `camera_index` and the col, row `pixels`.
+
+    :param dir_path: The directory of the dataset
+    :type dir_path: str
+    :return: The ground truth arrays
+    :rtype: dict
+    """
+    with np.load(Path(dir_path).joinpath(GROUND_TRUTH_NAME)) as data:
+        return {key: data[key] for key in data.files}
+
+def ground_truth_tracks(ground_truth, cameras):
+    """ Gather the observations of the ground truth points in a set of cameras as tracks,
+    the layout taken by `evtech.triangulate_points`
+
+    :param ground_truth: The ground truth, see `load_ground_truth`
+    :type ground_truth: dict
+    :param cameras: The C cameras, matched to the ground truth by the file names of their images
+    :type cameras: list
+    :return: The (T,C,2) col, row observations, NaN where a point is not seen by a camera
+    :rtype: numpy.array
+    """
+    lookup = {name: i for i, name in enumerate(ground_truth["cameras"])}
+    columns = np.full(len(ground_truth["cameras"]), -1)
+    for c, cam in enumerate(cameras):
+        columns[lookup[Path(cam.image_path).name]] = c
+
+    tracks = np.full((len(ground_truth["points"]), len(cameras), 2), np.nan)
+    column = columns[ground_truth["camera_index"]]
+    used = column >= 0
+    tracks[ground_truth["point_index"][used], column[used]] = ground_truth["pixels"][used]
+    return tracks
+
+def _station_grid(stations, spacing, center):
+    """ Lay out stations in east-west flight lines, alternating direction, centered on a point
+    """
+    cols = max(int(math.ceil(math.sqrt(stations))), 1)
+    rows = -(-stations // cols)
+    order = np.arange(stations)
+    row = order // cols
+    col = np.where(row % 2 == 0, order % cols, cols - 1 - order % cols)
+    return {
+        "x": center[0] + (col - (cols - 1) / 2) * spacing,
+        "y": center[1] + (row - (rows - 1) / 2) * spacing,
+        "row": row,
+        "col": col,
+        "rows": rows,
+        "cols": cols,
+        "order": order,
+    }
+
+def _rotation(tilt, azimuth):
+    """ Get the world to camera rotation of a camera tilted from nadir towards an azimuth,
+    with the rows of the images running away from the camera
+    """
+    tilt, azimuth = math.radians(tilt), math.radians(azimuth)
+    if tilt == 0:
+        return np.array([[1.0, 0, 0], [0, -1.0, 0], [0, 0, -1.0]])
+    forward = np.array([math.sin(tilt) * math.sin(azimuth), math.sin(tilt) * math.cos(azimuth), -math.cos(tilt)])
+    right = np.cross(forward, [0, 0, 1.0])
+    right /= np.linalg.norm(right)
+    return np.vstack([right, np.cross(forward, right), forward])
+
+def _ground_truth(proj, grid, dirs, image_size, points, spacing, altitude, elevation, relief, pixel_noise, seed):
+    """ Scatter ground truth points over the stations and observe them in the cameras seeing them
+    """
+    views = len(dirs)
+    rs = np.random.RandomState(seed)
+    stations = len(grid["x"])
+    station = rs.randint(0, stations, points)
+    world = np.column_stack([grid["x"][station] + rs.uniform(-spacing / 2, spacing / 2, points),
+                             grid["y"][station] + rs.uniform(-spacing / 2, spacing / 2, points),
+                             elevation + rs.uniform(0, relief, points)])
+
+    # The cameras that can see a point are those of the stations whose footprint, for each view,
+    # can reach the cell of the point's station
+    d_row, d_col, view = _candidate_offsets(dirs, altitude, relief, spacing)
+    lookup = np.full((grid["rows"], grid["cols"]), -1)
+    lookup[grid["row"], grid["col"]] = np.arange(stations)
+
+    point_index, camera_index, pixels = [], [], []
+    chunk = max(1, (1 << 20) // len(view))
+    width, height = image_size
+    for start in range(0, points, chunk):
+        idx = np.arange(start, min(start + chunk, points))
+        row = grid["row"][station[idx], np.newaxis] + d_row[np.newaxis]
+        col = grid["col"][station[idx], np.newaxis] + d_col[np.newaxis]
+        inside = (row >= 0) & (row < grid["rows"]) & (col >= 0) & (col < grid["cols"])
+        pt, candidate = np.nonzero(inside)
+        neighbor = lookup[row[pt, candidate], col[pt, candidate]]
+        pt, candidate, neighbor = pt[neighbor >= 0], candidate[neighbor >= 0], neighbor[neighbor >= 0]
+        cam = neighbor * views + view[candidate]
+
+        # Project every point into its candidate cameras at once
+        img = np.einsum('nij,nj->ni', proj[cam, :, 0:3], world[idx[pt]]) + proj[cam, :, 3]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            img_pts = img[:, 0:2] / img[:, 2:3]
+        seen = (img[:, 2] > 0) & (img_pts[:, 0] >= 0) & (img_pts[:, 0] <= width - 1) & \
+            (img_pts[:, 1] >= 0) & (img_pts[:, 1] <= height - 1)
+        point_index.append(idx[pt[seen]])
+        camera_index.append(cam[seen])
+        pixels.append(img_pts[seen])
+
+    pixels = np.concatenate(pixels)
+    if pixel_noise > 0:
+        pixels += rs.normal(0, pixel_noise, pixels.shape)
+    return {
+        "points": world,
+        "point_index": np.concatenate(point_index),
+        "camera_index": np.concatenate(camera_index),
+        "pixels": pixels,
+    }
+
+def _candidate_offsets(dirs, altitude, relief, spacing):
+    """ Get the station grid offsets, and views, of the cameras that may see a point within the cell of a station
+    """
+    d_row, d_col, view = [], [], []
+    for v in range(len(dirs)):
+        # The footprint of the view relative to its station, from the ground up to the relief
+        depth = np.concatenate([-altitude / dirs[v, :, 2], -(altitude - relief) / dirs[v, :, 2]])
+        offsets = depth[:, np.newaxis] * np.concatenate([dirs[v, :, 0:2], dirs[v, :, 0:2]])
+        low, high = offsets.min(axis=0), offsets.max(axis=0)
+        cols = np.arange(math.floor((-spacing / 2 - high[0]) / spacing), math.ceil((spacing / 2 - low[0]) / spacing) + 1)
+        rows = np.arange(math.floor((-spacing / 2 - high[1]) / spacing), math.ceil((spacing / 2 - low[1]) / spacing) + 1)
+        r, c = np.meshgrid(rows, cols, indexing="ij")
+        d_row.append(r.ravel())
+        d_col.append(c.ravel())
+        view.append(np.full(r.size, v))
+    return np.concatenate(d_row), np.concatenate(d_col), np.concatenate(view)
@@ -0,0 +1,371 @@
+""" Batched multi-view triangulation for evtech """
+
+import tempfile
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from .collection import CameraCollection
+from .geodesy import get_transformer
+from .instrumentation import record
+
+# Names of the memory mapped arrays shared with worker processes
+_SHARED_INPUTS = ("proj", "offsets", "tracks")
+
+# Arrays shared with the current worker process, see `_init_worker`
+_worker_arrays = None
+
+def triangulate_points(cameras, tracks, to_latlng = False, max_iterations = 20, tolerance = 1e-6,
+                       workers = None, chunk_size = 4096):
+    """ Triangulates many 3D points from tracks of image points across a set of cameras
+
+    An initial guess for every track is found with a batched DLT, which is then refined by
+    minimizing the squared reprojection error with Levenberg-Marquardt using analytic Jacobians.
+
+    Tracks are solved in chunks of a fixed size. When workers are requested the chunks are spread
+    across a process pool, with the camera matrices, tracks and results shared through memory mapped
+    arrays so cameras are never pickled. Every track is solved independently, so the results do not
+    depend on the number of workers.
+
+    :param cameras: The C cameras the tracks are observed in, all cameras must share a CRS
+    :type cameras: list
+    :param tracks: A (T,C,2) array of [col,row] image points, with NaN where a track is not observed in a camera
+    :type tracks: numpy.Array
+    :param to_latlng: Flag to return the points as lat/lng/elevation, otherwise will return in the cameras' CRS
+    :type to_latlng: bool, optional
+    :param max_iterations: The maximum number of refinement iterations, defaults to 20
+    :type max_iterations: int, optional
+    :param tolerance: The step size, in CRS units, at which a point is considered converged, defaults to 1e-6
+    :type tolerance: float, optional
+    :param workers: The number of worker processes, defaults to None which solves in this process
+    :type workers: int, optional
+    :param chunk_size: The number of tracks solved together, defaults to 4096
+    :type chunk_size: int, optional
+    :return: The (T,3) points, the (T,C) reprojection error of each observation in pixels and a (T,) mask of converged points
+    :rtype: tuple: numpy.Array, numpy.Array, numpy.Array
+    """
+    options = {"max_iterations": max_iterations, "tolerance": tolerance, "threshold": None}
+    results = _run(cameras, tracks, options, workers, chunk_size)
+
+    # Convert if needed
+    if to_latlng:
+        results["points"] = _to_latlng(results["points"], cameras[0].crs)
+
+    return results["points"], results["residuals"], results["converged"]
+
+def triangulate_points_robust(cameras, tracks, threshold = 4.0, to_latlng = False, max_iterations = 20,
+                              tolerance = 1e-6, max_views = 8, workers = None, chunk_size = 1024):
+    """ Triangulates many 3D points from tracks of image points, rejecting outlying observations
+
+    Two-view hypotheses are generated from every pair among the first `max_views` observations of
+    each track. All hypotheses are scored against all observations in one vectorized reprojection
+    pass, and the best hypothesis is refined on its inliers only, see `triangulate_points`.
+
+    :param cameras: The C cameras the tracks are observed in, all cameras must share a CRS
+    :type cameras: list
+    :param tracks: A (T,C,2) array of [col,row] image points, with NaN where a track is not observed in a camera
+    :type tracks: numpy.Array
+    :param threshold: The reprojection error in pixels below which an observation is an inlier, defaults to 4.0
+    :type threshold: float, optional
+    :param to_latlng: Flag to return the points as lat/lng/elevation, otherwise will return in the cameras' CRS
+    :type to_latlng: bool, optional
+    :param max_iterations: The maximum number of refinement iterations, defaults to 20
+    :type max_iterations: int, optional
+    :param tolerance: The step size, in CRS units, at which a point is considered converged, defaults to 1e-6
+    :type tolerance: float, optional
+    :param max_views: The number of observations per track used to generate hypotheses, defaults to 8
+    :type max_views: int, optional
+    :param workers: The number of worker processes, defaults to None which solves in this process
+    :type workers: int, optional
+    :param chunk_size: The number of tracks solved together, defaults to 1024
+    :type chunk_size: int, optional
+    :return: The (T,3) points, the (T,C) reprojection errors, a (T,) mask of converged points and a (T,C) mask of inliers
+    :rtype: tuple: numpy.Array, numpy.Array, numpy.Array, numpy.Array
+    """
+    options = {"max_iterations": max_iterations, "tolerance": tolerance,
+               "threshold": threshold, "max_views": max_views}
+    results = _run(cameras, tracks, options, workers, chunk_size)
+
+    # Convert if needed
+    if to_latlng:
+        results["points"] = _to_latlng(results["points"], cameras[0].crs)
+
+    return results["points"], results["residuals"], results["converged"], results["inliers"]
+
+def stack_cameras(cameras):
+    """ Stack the projection matrices and image offsets of cameras into arrays
+
+    :param cameras: The cameras to stack
+    :type cameras: list
+    :return: A (C,3,4) array of projection matrices and a (C,2) array of image offsets
+    :rtype: tuple: numpy.Array, numpy.Array
+    """
+    # Collections already hold the stacked arrays
+    if isinstance(cameras, CameraCollection):
+        return cameras.projection_matrices, cameras.image_bounds[:, 0:2]
+
+    proj = np.stack([np.asarray(cam.projection_matrix, dtype=float) for cam in cameras])
+    offsets = np.array([cam.image_bounds[0:2] for cam in cameras], dtype=float)
+    return proj, offsets
+
+def _run(cameras, tracks, options, workers, chunk_size):
+    """ Triangulate all tracks in chunks, in this process or across a process pool
+    """
+    proj, offsets = stack_cameras(cameras)
+    tracks = np.asarray(tracks, dtype=float).reshape(-1, len(cameras), 2)
+
+    if workers is not None and workers > 1:
+        return _run_parallel(proj, offsets, tracks, options, workers, chunk_size)
+
+    results = _allocate_results(len(tracks), len(cameras), options)
+    for start, stop in _chunks(len(tracks), chunk_size):
+        _solve_chunk(proj, offsets, tracks, results, start, stop, options)
+    return results
+
+def _allocate_results(num_tracks, num_cameras, options):
+    """ Allocate the result arrays for a triangulation
+    """
+    results = {
+        "points": np.empty((num_tracks, 3)),
+        "residuals": np.empty((num_tracks, num_cameras)),
+        "converged": np.empty(num_tracks, dtype=bool),
+    }
+    if options["threshold"] is not None:
+        results["inliers"] = np.empty((num_tracks, num_cameras), dtype=bool)
+    return results
+
+def _chunks(num_tracks, chunk_size):
+    """ Split tracks into fixed size [start, stop) ranges
+    """
+    return [(start, min(start + chunk_size, num_tracks)) for start in range(0, num_tracks, chunk_size)]
+
+def _solve_chunk(proj, offsets, tracks, results, start, stop, options):
+    """ Triangulate a range of tracks, writing into the result arrays
+    """
+    chunk = _triangulate(proj, offsets, tracks[start:stop], options)
+    for name, arr in results.items():
+        arr[start:stop] = chunk[name]
+
+def _run_parallel(proj, offsets, tracks, options, workers, chunk_size):
+    """ Triangulate chunks of tracks across a process pool using memory mapped arrays
+    """
+    results = _allocate_results(len(tracks), len(proj), options)
+    with tempfile.TemporaryDirectory(prefix="evtech_") as tmp:
+        # Inputs and results live in files that every worker memory maps once
+        for name, arr in zip(_SHARED_INPUTS, (proj, offsets, tracks)):
+            np.save(str(Path(tmp, name + ".npy")), arr)
+        for name, arr in results.items():
+            np.lib.format.open_memmap(str(Path(tmp, name + ".npy")), mode="w+",
+                                      dtype=arr.dtype, shape=arr.shape).flush()
+
+        initargs = (tmp, tuple(results))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+            futures = [pool.submit(_solve_shared_chunk, start, stop, options)
+                       for start, stop in _chunks(len(tracks), chunk_size)]
+            for future in futures:
+                future.result()
+
+        return {name: np.load(str(Path(tmp, name + ".npy"))) for name in results}
+
+def _init_worker(tmp, result_names):
+    """ Memory map the shared arrays in a worker process
+    """
+    global _worker_arrays
+    inputs = {name: np.load(str(Path(tmp, name + ".npy")), mmap_mode="r") for name in _SHARED_INPUTS}
+    results = {name: np.load(str(Path(tmp, name + ".npy")), mmap_mode="r+") for name in result_names}
+    _worker_arrays = (inputs, results)
+
+def _solve_shared_chunk(start, stop, options):
+    """ Triangulate a range of tracks from the shared arrays of a worker process
+    """
+    inputs, results = _worker_arrays
+    _solve_chunk(inputs["proj"], inputs["offsets"], inputs["tracks"], results, start, stop, options)
+    for arr in results.values():
+        arr.flush()
+
+def _to_latlng(points, crs):
+    """ Convert (N,3) points from a CRS to lat/lng/elevation
+    """
+    transformer = get_transformer(crs, 4326)
+    x, y, z = transformer.transform(points[:, 0], points[:, 1], points[:, 2])
+    return np.column_stack([x, y, z])
+
+def _triangulate(proj, offsets, tracks, options):
+    """ Triangulate tracks given stacked camera arrays, see `triangulate_points`
+    """
+    # Work in full image coordinates
+    obs = tracks + offsets[np.newaxis]
+    valid = ~np.isnan(obs).any(axis=2)
+
+    # Shift the world origin to the mean camera center for numerical stability
+    m = proj[:, :, 0:3]
+    centers = -np.linalg.solve(m, proj[:, :, 3:4])[:, :, 0]
+    origin = centers.mean(axis=0)
+    proj = np.concatenate([m, (m @ origin + proj[:, :, 3])[:, :, np.newaxis]], axis=2)
+
+    points = np.full((len(obs), 3), np.nan)
+    converged = np.zeros(len(obs), dtype=bool)
+
+    # Select the observations to solve with and an initial guess
+    threshold = options["threshold"]
+    if threshold is None:
+        used = valid
+        X0 = None
+    else:
+        X0, used = _ransac(proj, obs, valid, threshold, options["max_views"])
+
+    # At least two views are needed to triangulate
+    solvable = used.sum(axis=1) >= 2
+    if solvable.any():
+        idx = np.flatnonzero(solvable)
+        if X0 is None:
+            X_init = _dlt(proj, obs[idx], used[idx])
+        else:
+            X_init = X0[idx]
+        points[idx], converged[idx] = _refine(proj, obs[idx], used[idx], X_init,
+                                              options["max_iterations"], options["tolerance"])
+
+    residuals = _reprojection_error(proj, obs, valid, points)
+    results = {"points": points + origin, "residuals": residuals, "converged": converged}
+    if threshold is not None:
+        with np.errstate(invalid='ignore'):
+            results["inliers"] = residuals < threshold
+    return results
+
+def _dlt_rows(proj, xy):
+    """ Build the two DLT equations for each image point, (...,3,4) matrices and (...,2) points give (...,2,4) rows
+    """
+    rows_x = xy[..., 0:1] * proj[..., 2, :] - proj[..., 0, :]
+    rows_y = xy[..., 1:2] * proj[..., 2, :] - proj[..., 1, :]
+    return np.stack([rows_x, rows_y], axis=-2)
+
+def _solve_dlt(A):
+    """ Solve stacked homogeneous systems (...,N,4) with one SVD, returning (...,3) points
+    """
+    # Normalize rows so each observation is equally weighted
+    norm = np.linalg.norm(A, axis=-1, keepdims=True)
+    A = np.divide(A, norm, out=np.zeros_like(A), where=norm > 0)
+
+    _, _, vt = np.linalg.svd(A, full_matrices=False)
+    X = vt[..., -1, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return X[..., 0:3] / X[..., 3:4]
+
+def _dlt(proj, obs, valid):
+    """ Find the linear least squares solution for each track with one stacked SVD
+    """
+    # Build the (T,2C,4) design matrices, unobserved rows are zero
+    xy = np.where(valid[:, :, np.newaxis], obs, 0.0)
+    A = _dlt_rows(proj[np.newaxis], xy) * valid[:, :, np.newaxis, np.newaxis]
+    return _solve_dlt(A.reshape(len(obs), -1, 4))
+
+def _ransac(proj, obs, valid, threshold, max_views):
+    """ Find the best two-view hypothesis for each track and its inlying observations
+    """
+    num_tracks = len(obs)
+
+    # Order the observed cameras of each track first, keeping camera order
+    order = np.argsort(~valid, axis=1, kind='stable')[:, 0:max_views]
+    first, second = np.triu_indices(order.shape[1], k=1)
+    cam_a = order[:, first]
+    cam_b = order[:, second]
+    pair_valid = second[np.newaxis] < valid.sum(axis=1)[:, np.newaxis]
+
+    # Two-view DLT for every (track, pair) hypothesis, (T,H,3)
+    xy = np.nan_to_num(obs)
+    xy_a = np.take_along_axis(xy, cam_a[:, :, np.newaxis], axis=1)
+    xy_b = np.take_along_axis(xy, cam_b[:, :, np.newaxis], axis=1)
+    A = np.concatenate([_dlt_rows(proj[cam_a], xy_a), _dlt_rows(proj[cam_b], xy_b)], axis=-2)
+    hypotheses = _solve_dlt(A)
+
+    # Score every hypothesis against every observation, (T,H,C)
+    h = np.einsum('cij,thj->thci', proj[:, :, 0:3], hypotheses) + proj[np.newaxis, np.newaxis, :, :, 3]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        error = np.linalg.norm(obs[:, np.newaxis] - h[..., 0:2] / h[..., 2:3], axis=-1)
+        orientation = np.sign(np.linalg.det(proj[:, :, 0:3]))
+        inlier = valid[:, np.newaxis] & (h[..., 2] * orientation > 0) & (error < threshold)
+
+    # Truncated quadratic cost so that ties in inlier counts prefer the more accurate hypothesis
+    cost = np.where(inlier, error * error, threshold * threshold)
+    cost = np.where(valid[:, np.newaxis], cost, 0.0).sum(axis=2)
+    cost[~pair_valid | ~np.isfinite(hypotheses).all(axis=2)] = np.inf
+
+    best = np.argmin(cost, axis=1)
+    tracks = np.arange(num_tracks)
+    inliers = inlier[tracks, best] & np.isfinite(cost[tracks, best])[:, np.newaxis]
+    return hypotheses[tracks, best], inliers
+
+def _project(proj, X):
+    """ Project (T,3) points into every camera, returning (T,C,3) homogeneous image points
+    """
+    return np.einsum('cij,tj->tci', proj[:, :, 0:3], X) + proj[np.newaxis, :, :, 3]
+
+def _cost(proj, obs, valid, X):
+    """ Compute the sum of squared reprojection errors and residuals for each track
+    """
+    h = _project(proj, X)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = obs - h[:, :, 0:2] / h[:, :, 2:3]
+    r = np.where(valid[:, :, np.newaxis], r, 0.0)
+    return (r * r).sum(axis=(1, 2)), r, h
+
+def _refine(proj, obs, valid, X, max_iterations, tolerance):
+    """ Refine points with a batched Levenberg-Marquardt on the reprojection error
+    """
+    X = X.copy()
+    converged = np.zeros(len(X), dtype=bool)
+    cost, r, h = _cost(proj, obs, valid, X)
+    lam = np.full(len(X), 1e-3)
+
+    m = proj[:, :, 0:3]
+    active = np.flatnonzero(np.isfinite(cost))
+    iterations = 0
+    for _ in range(max_iterations):
+        if len(active) == 0:
+            break
+        iterations += len(active)
+
+        # Analytic Jacobian of the projection for the active tracks, (T,C,2,3)
+        ha = h[active]
+        w = ha[:, :, 2:3]
+        uv = ha[:, :, 0:2] / w
+        J = (m[np.newaxis, :, 0:2, :] - uv[:, :, :, np.newaxis] * m[np.newaxis, :, np.newaxis, 2, :]) / w[:, :, :, np.newaxis]
+        J = J * valid[active][:, :, np.newaxis, np.newaxis]
+
+        JtJ = np.einsum('tcki,tckj->tij', J, J)
+        Jtr = np.einsum('tcki,tck->ti', J, r[active])
+
+        # Damp with the scaled diagonal
+        diag = np.einsum('tii->ti', JtJ)
+        A = JtJ + (lam[active, np.newaxis] * diag)[:, :, np.newaxis] * np.eye(3)
+        step = np.linalg.solve(A, Jtr[:, :, np.newaxis])[:, :, 0]
+
+        # Accept steps which reduce the cost
+        X_new = X[active] + step
+        cost_new, r_new, h_new = _cost(proj, obs[active], valid[active], X_new)
+        better = cost_new <= cost[active]
+        accept = active[better]
+        X[accept] = X_new[better]
+        cost[accept] = cost_new[better]
+        r[accept] = r_new[better]
+        h[accept] = h_new[better]
+        lam[accept] /= 10
+        lam[active[~better]] *= 10
+
+        # Converged when an accepted step is small or no step can reduce the cost
+        done = better & (np.linalg.norm(step, axis=1) < tolerance)
+        done |= lam[active] > 1e10
+        converged[active[done]] = True
+        active = active[~done]
+
+    record("triangulate_points.iterations", iterations)
+    return X, converged
+
+def _reprojection_error(proj, obs, valid, X):
+    """ Compute the (T,C) reprojection error of each observation in pixels
+    """
+    _, r, _ = _cost(proj, obs, valid, np.nan_to_num(X))
+    error = np.linalg.norm(r, axis=2)
+    error[~valid | np.isnan(X).any(axis=1)[:, np.newaxis]] = np.nan
+    return error
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+"""Tests for cache classes."""
+
+import unittest
+
+from evtech.cache import LRUCache
+
+class TestCache(unittest.TestCase):
+    """Tests for `evtech.cache` package."""
+
+    def test_lru_eviction(self):
+        cache = LRUCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+
+        # Touch a so b is the least recently used
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get_or_create("c", lambda: 4), 3)
+        self.assertEqual(cache.get_or_create("d", lambda: 4), 4)
+        self.assertEqual(len(cache), 2)
+
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["misses"], 2)
+        self.assertEqual(stats["evictions"], 2)
+
+    def test_sized_eviction(self):
+        cache = LRUCache(maxsize=10, getsizeof=len)
+        cache.put("a", "aaaa")
+        cache.put("b", "bbbb")
+        self.assertEqual(cache.currsize, 8)
+
+        # Adding c must evict a to stay within the budget
+        cache.put("c", "cccc")
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.currsize, 8)
+
+        # Entries larger than the budget are not cached
+        cache.put("d", "d" * 11)
+        self.assertIsNone(cache.get("d"))
+        self.assertEqual(cache.stats()["evictions"], 1)
@@ -2,18 +2,26 @@
 
 """Tests for camera class."""
 
+import os
 import sys
+import tempfile
 import unittest
+import cv2
 import numpy as np 
 
 from pyproj import CRS
 from evtech import Camera
 from evtech import camera_from_json
 from evtech import triangulate_point_from_cameras
+from evtech import ElevationModel
+from evtech import get_transformer
+from evtech import enable_instrumentation, disable_instrumentation, reset_instrumentation, instrumentation_stats
 
 from shapely.geometry import mapping
 import json
 
+from .test_util import CAMERA_JSON
+
 class TestCamera(unittest.TestCase):
     """Tests for `evtech.camera` package."""
 
@@ -60,12 +68,73 @@ class TestCamera(unittest.TestCase):
         self.assertTrue(pt[0] >= x_idx and pt[0] < x_idx+1)
         self.assertTrue(pt[1] >= y_idx and pt[1] < y_idx+1)
 
+    def test_project_points_to_camera(self):
+        lons = [self.geo_bounds[2], self.geo_bounds[0]]
+        lats = [self.geo_bounds[1], self.geo_bounds[3]]
+        pts, in_front = self.cam.project_points_to_camera(lons, lats, self.elev)
+        self.assertEqual(pts.shape, (2,2))
+        self.assertTrue(in_front.all())
+
+        # Batched projection should match the single point projection
+        for i in range(2):
+            pt = self.cam.project_to_camera(lons[i], lats[i], self.elev)
+            self.assertAlmostEqual(pts[i][0], pt[0], places=6)
+            self.assertAlmostEqual(pts[i][1], pt[1], places=6)
+
+        # Points already in the camera CRS project the same
+        x, y, z = get_transformer(4326, self.crs).transform(lons, lats, [self.elev, self.elev])
+        world_pts, world_in_front = self.cam.project_world_points(np.column_stack([x, y, z]))
+        np.testing.assert_allclose(world_pts, pts)
+        self.assertTrue(world_in_front.all())
+
+        # A point above the camera is behind it
+        _, in_front = self.cam.project_points_to_camera(lons, lats, [self.elev, 10000.0])
+        self.assertTrue(in_front[0])
+        self.assertFalse(in_front[1])
+
     def test_project_from_camera(self):
         ray = self.cam.project_from_camera(0,0)
         self.assertEqual(ray.origin[0], self.cen[0])
         self.assertEqual(ray.origin[1], self.cen[1])
         self.assertEqual(ray.origin[2], self.cen[2])
 
+    def test_calibration_cache(self):
+        # Camera center decomposed from the projection should match the stored center
+        self.assertTrue(np.allclose(self.cam.camera_position, self.cen[0:3], atol=1e-2))
+        self.assertTrue(np.allclose(self.cam.inverse_projection @ self.proj[:,0:3], np.eye(3)))
+        self.assertTrue(np.allclose(self.cam.rotation_matrix @ self.cam.rotation_matrix.T, np.eye(3)))
+        self.assertTrue(np.allclose(self.cam.translation, -self.cam.rotation_matrix @ self.cam.camera_position))
+        self.assertGreater(self.cam.focal_length, 0)
+
+        # Values are computed once and reused
+        self.assertIs(self.cam.camera_matrix, self.cam.camera_matrix)
+
+        # Setting a new projection clears the cache
+        focal = self.cam.focal_length
+        self.cam.projection_matrix = self.proj * np.array([[2.0],[2.0],[1.0]])
+        self.assertAlmostEqual(self.cam.focal_length, 2*focal, places=4)
+
+    def test_orientation_cache(self):
+        # Projecting points only needs the orientation, not the decomposed calibration
+        x, y = get_transformer(4326, self.crs).transform(self.geo_bounds[0], self.geo_bounds[1])
+        cam = Camera(self.proj, self.bounds, self.cen, self.geo_bounds, self.elev, self.crs, self.path)
+        enable_instrumentation()
+        try:
+            _, in_front = cam.project_world_points([[x, y, self.elev]])
+            stats = instrumentation_stats()
+        finally:
+            disable_instrumentation()
+            reset_instrumentation()
+        self.assertTrue(in_front[0])
+        self.assertNotIn("camera.decompose_projection_matrix", stats["timers"])
+
+        # Negating the projection flips the orientation and keeps the points in front
+        cam.projection_matrix = -np.asarray(self.proj)
+        _, in_front = cam.project_world_points([[x, y, self.elev]])
+        self.assertTrue(in_front[0])
+        _, in_front = cam.project_world_points([[x, y, 10000.0]])
+        self.assertFalse(in_front[0])
+
     def test_to_full_image(self):
         x, y = self.cam.to_full_image(0,0)
         self.assertEqual(x, self.bounds[0])
@@ -94,6 +163,39 @@ class TestCamera(unittest.TestCase):
             return self.path == img
         self.assertTrue(self.cam.load_image(loader))
 
+    def test_load_chip(self):
+        # A 363x247 image matching the bounds of the camera, with a gradient across the columns
+        img = np.tile(np.arange(363, dtype=np.uint8)[np.newaxis, :, np.newaxis], (247, 1, 3))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "chip.png")
+            cv2.imwrite(path, img)
+            self.cam.set_path(path)
+
+            chip, window = self.cam.load_chip([100, 50, 139, 69])
+            self.assertEqual(window, [100, 50, 139, 69])
+            self.assertEqual(chip.shape, (20, 40, 3))
+            self.assertEqual(chip[0, 0, 0], 100)
+            self.assertEqual(self.cam.to_full_image(window[0], window[1]), (3394, 999))
+
+            # Reduced windows are aligned to the scale and clipped to the image
+            chip, window = self.cam.load_chip([101, 50, 400, 69], scale=4)
+            # Reduced PNG decoding drops the partial blocks at the edges, 90 columns cover pixels 0-359
+            self.assertEqual(window, [100, 48, 359, 71])
+            self.assertEqual(chip.shape[0:2], (6, 65))
+            self.assertTrue(abs(int(chip[0, 0, 0]) - 101) <= 2)
+
+            thumb, window = self.cam.load_chip(scale=8, loader=cv2.imread)
+            self.assertEqual(thumb.shape[0:2], (31, 46))
+            self.assertEqual(window, [0, 0, 362, 246])
+            thumb, window = self.cam.load_chip(scale=8)
+            self.assertEqual(thumb.shape[0:2], (30, 45))
+            self.assertEqual(window, [0, 0, 359, 239])
+
+            with self.assertRaises(ValueError):
+                self.cam.load_chip(scale=3)
+            with self.assertRaises(ValueError):
+                self.cam.load_chip([1000, 1000, 1100, 1100])
+
     def test_hightbetweenpoints(self):
         cam1_json = {
             "id": "13470217", 
@@ -118,6 +220,28 @@ class TestCamera(unittest.TestCase):
         height = cam1.height_between_points(base_pt, peak_pt, cam1.elevation)
         self.assertAlmostEqual(height, 5.478992222195782)
 
+    def test_heightsbetweenpoints(self):
+        cam1 = camera_from_json(CAMERA_JSON[0])
+        base_pts = np.array([[41,118], [300,200], [500,100]])
+        peak_pts = np.array([[35,90], [310,150], [500,100]])
+
+        heights = cam1.heights_between_points(base_pts, peak_pts)
+        self.assertEqual(heights.shape, (3,))
+        self.assertAlmostEqual(heights[0], 5.478992222195782)
+        self.assertAlmostEqual(heights[1], cam1.height_between_points(base_pts[1], peak_pts[1]))
+        self.assertEqual(heights[2], 0)
+
+        # Per point base elevations
+        elevs = np.array([cam1.elevation, cam1.elevation + 10, cam1.elevation])
+        heights = cam1.heights_between_points(base_pts, peak_pts, elevs)
+        self.assertAlmostEqual(heights[0], 5.478992222195782)
+        self.assertAlmostEqual(heights[1], cam1.height_between_points(base_pts[1], peak_pts[1], elevs[1]))
+
+        # Base elevations from a flat elevation model match a constant elevation
+        dsm = ElevationModel(np.full((400, 400), cam1.elevation), (411300.0, 1.0, 0, 4693700.0, 0, -1.0), cam1.crs)
+        heights = cam1.heights_between_points(base_pts[0:2], peak_pts[0:2], dsm)
+        self.assertAlmostEqual(heights[0], 5.478992222195782)
+
     def test_triangualte(self):
         cam1_json = {
             "id": "13470217", 
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+"""Tests for camera sets."""
+
+import pickle
+import tempfile
+import unittest
+import numpy as np
+
+from evtech import camera_from_json, get_crs
+from evtech import BaseCamera, CameraCollection, CameraSet, CameraView
+from evtech import generate_dataset, load_dataset, triangulate_points
+
+from .test_util import CAMERA_JSON
+
+class TestCameraSet(unittest.TestCase):
+    """Tests for `evtech.cameraset` package."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.cams = [camera_from_json(data, "img{}.jpg".format(i)) for i, data in enumerate(CAMERA_JSON)]
+        self.cameras = CameraSet.from_cameras(self.cams)
+
+    def test_arrays(self):
+        self.assertEqual(len(self.cameras), 3)
+        self.assertEqual(self.cameras.projection_matrices.shape, (3, 3, 4))
+        self.assertEqual(self.cameras.image_bounds.shape, (3, 4))
+        self.assertEqual(self.cameras.camera_centers.shape, (3, 3))
+        self.assertEqual(self.cameras.elevations.shape, (3,))
+
+        # Cameras in one UTM zone share a single CRS
+        self.assertEqual(len(self.cameras.crs_list), 1)
+        self.assertEqual(self.cameras.crs_index.tolist(), [0, 0, 0])
+        self.assertIs(self.cameras[0].crs, self.cameras[2].crs)
+
+        # Distinct inputs for the same CRS are merged
+        cameras = CameraSet(self.cameras.projection_matrices, self.cameras.image_bounds,
+                            self.cameras.camera_centers, self.cameras.geo_bounds, self.cameras.elevations,
+                            [32616, get_crs(32616), "EPSG:4326"])
+        self.assertEqual(len(cameras.crs_list), 2)
+        self.assertEqual(cameras.crs_index.tolist(), [0, 0, 1])
+
+        with self.assertRaises(ValueError):
+            CameraSet(self.cameras.projection_matrices, self.cameras.image_bounds, self.cameras.camera_centers,
+                      self.cameras.geo_bounds, self.cameras.elevations, [32616])
+
+    def test_views(self):
+        view = self.cameras[1]
+        self.assertIsInstance(view, CameraView)
+        self.assertIsInstance(view, BaseCamera)
+        self.assertFalse(hasattr(view, "__dict__"))
+        with self.assertRaises(AttributeError):
+            view.name = "view"
+
+        # Plain cameras keep their instance dict
+        self.cams[0].name = "camera"
+        self.assertEqual(self.cams[0].name, "camera")
+        self.assertEqual(view, self.cameras[-2])
+        self.assertEqual(list(self.cameras)[1], view)
+        self.assertEqual(self.cameras.cameras[1:], [self.cameras[1], self.cameras[2]])
+        with self.assertRaises(IndexError):
+            self.cameras[3]
+
+        cam = self.cams[1]
+        self.assertEqual(view.image_path, "img1.jpg")
+        self.assertEqual(view.elevation, cam.elevation)
+        np.testing.assert_array_equal(view.projection_matrix, cam.projection_matrix)
+        self.assertAlmostEqual(view.focal_length, cam.focal_length)
+        for x, y in ([0, 0], [1500, 1000]):
+            np.testing.assert_allclose(view.project_from_camera(x, y).origin, cam.project_from_camera(x, y).origin)
+            np.testing.assert_allclose(view.project_from_camera(x, y).direction,
+                                       cam.project_from_camera(x, y).direction)
+        np.testing.assert_allclose(view.project_to_camera(-88.0755, 42.3885, 250.0),
+                                   cam.project_to_camera(-88.0755, 42.3885, 250.0))
+
+        # Views share the storage of the set
+        proj = cam.projection_matrix.copy()
+        proj[0] *= 2.0
+        view.projection_matrix = proj
+        np.testing.assert_array_equal(self.cameras.projection_matrices[1], proj)
+        # Doubling the x axis scales the mean of the x and y focal lengths by about 1.5
+        self.assertAlmostEqual(view.focal_length / cam.focal_length, 1.5, places=3)
+
+        # Views pickle as plain cameras
+        copy = pickle.loads(pickle.dumps(self.cameras[2]))
+        self.assertNotIsInstance(copy, CameraView)
+        np.testing.assert_array_equal(copy.projection_matrix, self.cams[2].projection_matrix)
+
+    def test_subset_and_queries(self):
+        sub = self.cameras[1:]
+        self.assertIsInstance(sub, CameraSet)
+        self.assertEqual([cam.image_path for cam in sub], ["img1.jpg", "img2.jpg"])
+        self.assertEqual([cam.image_path for cam in self.cameras[np.array([True, False, True])]],
+                         ["img0.jpg", "img2.jpg"])
+
+        # Queries and projections match a collection of the cameras
+        collection = CameraCollection(self.cams)
+        for sort_by in (None, "distance", "obliquity"):
+            self.assertEqual([cam.image_path for cam in self.cameras.query_point(-88.0755, 42.3885, sort_by)],
+                             [cam.image_path for cam in collection.query_point(-88.0755, 42.3885, sort_by)])
+        expected = collection.project_points([-88.0755, -88.0750], [42.3885, 42.3880], 250.0)
+        actual = self.cameras.project_points([-88.0755, -88.0750], [42.3885, 42.3880], 250.0)
+        for a, b in zip(actual, expected):
+            np.testing.assert_array_equal(a, b)
+
+    def test_load_dataset(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            generate_dataset(tmp, stations=4, points=50, spacing=150.0)
+            nadirs, obliques = load_dataset(tmp)
+            for kwargs in ({}, {"workers": 2}, {"index": True}, {"loader": lambda data, path: camera_from_json(data, path)}):
+                set_nadirs, set_obliques = load_dataset(tmp, camera_set=True, **kwargs)
+                self.assertIsInstance(set_nadirs, CameraSet)
+                self.assertEqual((len(set_nadirs), len(set_obliques)), (4, 16))
+                self.assertEqual(len(set_obliques.crs_list), 1)
+                order = {cam.image_path: cam for cam in nadirs + obliques}
+                for view in list(set_nadirs) + list(set_obliques):
+                    np.testing.assert_array_equal(view.projection_matrix, order[view.image_path].projection_matrix)
+                    self.assertEqual(view.crs, order[view.image_path].crs)
+
+            with self.assertRaises(ValueError):
+                load_dataset(tmp, lazy=True, camera_set=True)
+
+            # Sets of an index are views of the read-only index file
+            cams, _ = load_dataset(tmp, camera_set=True, index=True)
+            with self.assertRaises(ValueError):
+                cams[0].elevation = 0.0
+            cams, _ = load_dataset(tmp, camera_set=True)
+            cams[0].elevation = 0.0
+            self.assertEqual(cams.elevations[0], 0.0)
+
+            # Triangulation takes the stacked arrays of the set
+            cams, _ = load_dataset(tmp, camera_set=True, index=True)
+            tracks = [cam.project_to_camera(-88.0755, 42.3885, 250.0) for cam in cams]
+            points, _, converged = triangulate_points(cams, [tracks], to_latlng=True)
+            self.assertTrue(converged[0])
+            np.testing.assert_allclose(points[0], [-88.0755, 42.3885, 250.0], atol=1e-5)
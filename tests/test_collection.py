@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+"""Tests for camera collections."""
+
+import unittest
+import numpy as np
+
+from shapely.geometry import Polygon
+
+from evtech import camera_from_json
+from evtech import CameraCollection
+
+from .test_util import CAMERA_JSON
+
+class TestCollection(unittest.TestCase):
+    """Tests for `evtech.collection` package."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.cams = [camera_from_json(data) for data in CAMERA_JSON]
+        self.collection = CameraCollection(self.cams)
+
+        # A point only covered by the larger footprints of the first two cameras
+        self.edge = (-88.07610, 42.38790)
+        self.center = (-88.0755, 42.3885)
+
+    def test_query_point(self):
+        self.assertEqual(3, len(self.collection.query_point(*self.center)))
+        self.assertEqual(self.cams[0:2], self.collection.query_point(*self.edge))
+        self.assertEqual([], self.collection.query_point(-88.0, 42.0))
+
+    def test_query_bbox(self):
+        self.assertEqual(self.cams, self.collection.query_bbox(-88.08, 42.38, -88.07, 42.39))
+        self.assertEqual([], self.collection.query_bbox(-88.0, 42.0, -87.9, 42.1))
+
+    def test_query_polygon(self):
+        # The bounds of the triangle overlap every camera, but the triangle does not
+        triangle = Polygon([(-88.0740, 42.3890), (-88.0740, 42.3900), (-88.0752, 42.3900)])
+        self.assertEqual(self.cams, self.collection.query_bbox(*triangle.bounds))
+        self.assertEqual([], self.collection.query_polygon(triangle))
+
+        square = Polygon([(-88.0756, 42.3884), (-88.0754, 42.3884), (-88.0754, 42.3886), (-88.0756, 42.3886)])
+        self.assertEqual(self.cams, self.collection.query_polygon(square))
+
+    def test_sorted_queries(self):
+        # The third camera is the closest to nadir
+        obliquity = self.collection.obliquity()
+        self.assertLess(obliquity[2], 10)
+        self.assertGreater(obliquity[0], 30)
+        cams = self.collection.query_point(*self.center, sort_by="obliquity")
+        self.assertIs(self.cams[2], cams[0])
+
+        cams = self.collection.query_point(*self.center, sort_by="distance")
+        dist = self.collection.distance(*self.center)
+        self.assertEqual([self.cams[i] for i in np.argsort(dist)], cams)
+
+        cams = self.collection.query_point(*self.center, sort_by=lambda cam: -cam.elevation)
+        self.assertIsNot(self.cams[2], cams[0])
+
+        with self.assertRaises(ValueError):
+            self.collection.query_point(*self.center, sort_by="foo")
+
+    def test_large_collection(self):
+        # Compare the index against a linear scan
+        rng = np.random.RandomState(0)
+        bounds = rng.uniform(-1, 1, (5000, 2))
+        bounds = np.hstack([bounds, bounds + rng.uniform(0, 0.1, (5000, 2))])
+
+        class Footprint():
+            def __init__(self, geo_bounds):
+                self.geo_bounds = geo_bounds
+
+        footprints = [Footprint(b.tolist()) for b in bounds]
+        collection = CameraCollection(footprints)
+        for lon, lat in rng.uniform(-1, 1, (20, 2)):
+            expected = [f for f, b in zip(footprints, bounds)
+                        if b[0] <= lon <= b[2] and b[1] <= lat <= b[3]]
+            self.assertEqual(expected, collection.query_point(lon, lat))
+
+    def test_project_points(self):
+        lons = np.array([self.center[0], self.edge[0], -88.0])
+        lats = np.array([self.center[1], self.edge[1], 42.0])
+        elev = self.cams[2].elevation
+        pts, in_frame, in_front = self.collection.project_points(lons, lats, elev)
+        self.assertEqual((3,3,2), pts.shape)
+        self.assertTrue(in_front[0:2].all())
+
+        for c, cam in enumerate(self.cams):
+            expected, _ = cam.project_points_to_camera(lons, lats, elev)
+            self.assertTrue(np.allclose(expected, pts[:,c]))
+
+        self.assertTrue(in_frame[0].all())
+        self.assertFalse(in_frame[2].any())
+        self.assertEqual([self.cams[0]], self.collection.visible_cameras(self.edge[0], self.edge[1], elev))
@@ -2,11 +2,14 @@
 
 """Tests for dataset functions"""
 
+import threading
+import time
 import unittest
 
 from pathlib import Path
 
 from evtech import load_dataset
+from evtech import iter_images
 from evtech import Camera
 
 from .test_util import rmtree
@@ -44,4 +47,64 @@ class TestDataset(unittest.TestCase):
         self.assertEqual(1,len(obliques))
 
         self.assertEqual(self.nadirs.joinpath("test.jpg"), nadirs[0].image_path)
-        self.assertEqual(self.obliques.joinpath("test.jpg"), obliques[0].image_path)
\ No newline at end of file
+        self.assertEqual(self.obliques.joinpath("test.jpg"), obliques[0].image_path)
+
+    def test_load_dataset_workers(self):
+        nadirs, obliques = load_dataset(self.tmp, mock_loader, workers=4)
+
+        self.assertEqual(1,len(nadirs))
+        self.assertEqual(1,len(obliques))
+        self.assertEqual(self.nadirs.joinpath("test.jpg"), nadirs[0].image_path)
+
+    def test_load_dataset_lazy(self):
+        calls = []
+        def loader(json_data, image_path):
+            calls.append(image_path)
+            return mock_loader(json_data, image_path)
+
+        nadirs, obliques = load_dataset(self.tmp, loader, lazy=True)
+        self.assertEqual(1,len(nadirs))
+        self.assertEqual(1,len(obliques))
+
+        # Image paths are known without loading
+        self.assertEqual(self.obliques.joinpath("test.jpg"), obliques[0].image_path)
+        self.assertFalse(nadirs[0].is_loaded)
+        self.assertEqual(0, len(calls))
+
+        # First access loads the camera once
+        self.assertIsNone(nadirs[0].get_elevation())
+        self.assertIsNone(nadirs[0].elevation)
+        self.assertTrue(nadirs[0].is_loaded)
+        self.assertEqual(1, len(calls))
+
+    def test_iter_images(self):
+        cams = [mock_loader(None, "img{}.jpg".format(i)) for i in range(20)]
+        lock = threading.Lock()
+        active = [0, 0]
+        def loader(path):
+            with lock:
+                active[0] += 1
+                active[1] = max(active[1], active[0])
+            time.sleep(0.001 * (hash(path) % 3))
+            with lock:
+                active[0] -= 1
+            return path
+
+        paths = [img for _, img in iter_images(cams, workers=3, loader=loader)]
+        self.assertEqual(["img{}.jpg".format(i) for i in range(20)], paths)
+        self.assertTrue(active[1] <= 3)
+
+        paths = [img for _, img in iter_images(cams, workers=3, prefetch=4, ordered=False, loader=loader)]
+        self.assertEqual(sorted(["img{}.jpg".format(i) for i in range(20)]), sorted(paths))
+
+    def test_iter_images_bounded(self):
+        cams = [mock_loader(None, "img{}.jpg".format(i)) for i in range(20)]
+        calls = []
+        images = iter_images(cams, workers=2, prefetch=3, loader=lambda path: calls.append(path) or path)
+        self.assertEqual(next(images)[1], "img0.jpg")
+        time.sleep(0.05)
+
+        # Only the prefetch window is decoded ahead of the consumer, and stopping releases it
+        self.assertTrue(len(calls) <= 4)
+        images.close()
+        self.assertTrue(len(calls) <= 4)
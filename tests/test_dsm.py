@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+"""Tests for elevation models."""
+
+import unittest
+import numpy as np
+
+from pyproj import CRS
+from evtech import ElevationModel, Ray, RayBundle
+from evtech import enable_instrumentation, disable_instrumentation, reset_instrumentation, instrumentation_stats
+
+class TestElevationModel(unittest.TestCase):
+    """Tests for `evtech.dsm` package."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        # A flat 100m surface of 1m cells with a 20m building over cells [40,50) x [60,70)
+        self.crs = CRS.from_user_input(32616)
+        self.array = np.full((100, 120), 100.0)
+        self.array[60:70, 40:50] = 120.0
+        self.gt = (400000.0, 1.0, 0, 4700000.0, 0, -1.0)
+        self.dsm = ElevationModel(self.array, self.gt, self.crs)
+
+    def test_elevation_at(self):
+        elev = self.dsm.elevation_at([400045.5, 400010.0, 399999.0], [4699935.0, 4699990.0, 4699990.0])
+        np.testing.assert_array_equal(elev[0:2], [120.0, 100.0])
+        self.assertTrue(np.isnan(elev[2]))
+
+    def test_intersect_ray(self):
+        # Straight down onto the roof
+        ray = Ray([400045.0, 4699935.0, 1000.0], [0, 0, -1], self.crs)
+        pt = self.dsm.intersect(ray, latlng=False)
+        np.testing.assert_allclose(pt, [400045.0, 4699935.0, 120.0])
+
+        # A shallow ray from the west hits the wall of the building below the roof
+        ray = Ray([400000.5, 4699935.0, 121.0], [1, 0, -0.1], self.crs)
+        pt = self.dsm.intersect(ray, latlng=False)
+        np.testing.assert_allclose(pt, [400040.0, 4699935.0, 117.05])
+
+        lonlat = self.dsm.intersect(Ray([400045.0, 4699935.0, 1000.0], [0, 0, -1], self.crs))
+        self.assertAlmostEqual(lonlat[0], -88.2, 0)
+        self.assertAlmostEqual(lonlat[2], 120.0)
+
+    def test_intersect_bundle(self):
+        rs = np.random.RandomState(1)
+        array = rs.rand(40, 50) * 30 + 100
+        dsm = ElevationModel(array, self.gt, self.crs)
+        origin = np.array([400030.0, 4699980.0, 300.0])
+        targets = np.column_stack([400000 + rs.rand(30) * 50, 4700000 - rs.rand(30) * 40, np.full(30, 90.0)])
+        rays = RayBundle(origin, targets - origin, self.crs)
+        pts = dsm.intersect(rays, latlng=False, workers=2)
+
+        # Compare against sampling the rays finely
+        depths = np.linspace(0, 400, 200001)
+        for i in range(len(rays)):
+            samples = rays.origins[i] + depths[:, np.newaxis] * rays.directions[i]
+            under = np.flatnonzero(samples[:, 2] <= dsm.elevation_at(samples[:, 0], samples[:, 1]))
+            np.testing.assert_allclose(pts[i], samples[under[0]], atol=3e-3)
+
+        # Rays beyond the raster miss
+        rays = RayBundle(origin, [[1, 0, 0.1], [0, 0, -1]], self.crs)
+        pts = dsm.intersect(rays, latlng=False)
+        self.assertTrue(np.isnan(pts[0]).all())
+        self.assertTrue(np.isfinite(pts[1]).all())
+
+    def test_intersect_edge(self):
+        # Rays just above the flat ground north of the building, many leave the raster through
+        # an edge before descending to the ground, while still within the elevation range
+        rs = np.random.RandomState(2)
+        count = 20000
+        azimuth = rs.rand(count) * np.pi
+        origins = np.column_stack([400000 + rs.rand(count) * 120, 4700000 - rs.rand(count) * 40,
+                                   100.0 + rs.rand(count) * 0.05])
+        directions = np.column_stack([np.cos(azimuth), np.sin(azimuth), np.full(count, -1e-3)])
+        rays = RayBundle(origins, directions, self.crs)
+
+        reset_instrumentation()
+        enable_instrumentation()
+        try:
+            pts = self.dsm.intersect(rays, latlng=False)
+            steps = instrumentation_stats()["counters"]["ElevationModel.march_steps"]["total"]
+        finally:
+            disable_instrumentation()
+            reset_instrumentation()
+
+        # Rays hit the ground where they descend to it within the raster and miss otherwise
+        ground = origins + ((origins[:, 2] - 100.0) / 1e-3)[:, np.newaxis] * directions
+        inside = ((ground[:, 0] > 400000) & (ground[:, 0] < 400120) & (ground[:, 1] < 4700000)
+                  & (ground[:, 1] > 4699900))
+        self.assertTrue(inside.any() and not inside.all())
+        np.testing.assert_allclose(pts[inside], ground[inside], atol=1e-6)
+        self.assertTrue(np.isnan(pts[~inside]).all())
+
+        # Every ray finishes after visiting a few cells per pixel it crosses
+        self.assertLess(steps, 1000)
+
+    def test_nodata(self):
+        array = self.array.copy()
+        array[10, 10] = -9999
+        dsm = ElevationModel(array, self.gt, self.crs, nodata=-9999)
+        self.assertTrue(np.isnan(dsm.elevation_at(400010.5, 4699989.5)))
+        self.assertTrue(np.isnan(dsm.intersect(Ray([400010.5, 4699989.5, 500], [0, 0, -1], self.crs))).all())
+
+    def test_crs_mismatch(self):
+        ray = Ray([400045.0, 4699935.0, 1000.0], [0, 0, -1], CRS.from_user_input(32617))
+        with self.assertRaises(ValueError):
+            self.dsm.intersect(ray)
+
+if __name__ == '__main__':
+    unittest.main()
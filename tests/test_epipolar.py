@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+"""Tests for epipolar geometry."""
+
+import unittest
+import numpy as np
+
+from evtech import camera_from_json
+from evtech import fundamental_matrix, epipolar_lines, epipolar_segments
+from evtech import fundamental_cache_stats, clear_fundamental_cache
+
+from .test_util import CAMERA_JSON
+
+class TestEpipolar(unittest.TestCase):
+    """Tests for `evtech.epipolar` package."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.cams = [camera_from_json(data) for data in CAMERA_JSON]
+        self.lon = np.array([-88.0755, -88.0756, -88.0754])
+        self.lat = np.array([42.3885, 42.3886, 42.3884])
+        self.elev = np.array([254.0, 260.0, 270.0])
+        clear_fundamental_cache()
+
+    def test_fundamental_matrix(self):
+        pts0, _ = self.cams[0].project_points_to_camera(self.lon, self.lat, self.elev)
+        pts1, _ = self.cams[1].project_points_to_camera(self.lon, self.lat, self.elev)
+        fundamental = fundamental_matrix(self.cams[0], self.cams[1])
+        self.assertIs(fundamental, fundamental_matrix(self.cams[0], self.cams[1]))
+        self.assertEqual(fundamental_cache_stats()["hits"], 1)
+
+        # Matching points lie on the epipolar lines of each other
+        lines = epipolar_lines(self.cams[0], pts0, self.cams[1:3])
+        self.assertEqual(lines.shape, (3, 2, 3))
+        dist = np.abs(np.einsum('ni,ni->n', lines[:, 0, 0:2], pts1) + lines[:, 0, 2])
+        self.assertTrue((dist < 1e-3).all())
+
+    def test_epipolar_segments(self):
+        pts0, _ = self.cams[0].project_points_to_camera(self.lon, self.lat, self.elev)
+        pts2, _ = self.cams[2].project_points_to_camera(self.lon, self.lat, self.elev)
+        segments, valid = epipolar_segments(self.cams[0], pts0, self.cams[1:3], 250.0, 280.0, clip=False)
+        self.assertEqual(segments.shape, (3, 2, 2, 2))
+        self.assertTrue(valid.all())
+
+        # The matching points lie between the ends of the segments
+        start, end = segments[:, 1, 0], segments[:, 1, 1]
+        along = np.einsum('ni,ni->n', pts2 - start, end - start) / np.sum((end - start) ** 2, axis=1)
+        self.assertTrue(((along > 0) & (along < 1)).all())
+        np.testing.assert_allclose(start + along[:, np.newaxis] * (end - start), pts2, atol=1e-3)
+
+        # Clipped segments stay within the images
+        clipped, valid = epipolar_segments(self.cams[0], pts0, self.cams[1:3], 0.0, 1000.0)
+        self.assertTrue(valid.all())
+        self.assertTrue((clipped >= -1e-6).all())
+        self.assertTrue((clipped[:, 0, :, 0] <= 4299 - 3569 + 1 + 1e-6).all())
+
+if __name__ == '__main__':
+    unittest.main()
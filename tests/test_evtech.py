@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+"""Tests for the `evtech` package."""
+
+import importlib
+import inspect
+import re
+import subprocess
+import sys
+import types
+import unittest
+
+import evtech
+
+# Dependencies which must not be imported by `import evtech`
+HEAVY_MODULES = ("cv2", "scipy", "sklearn", "shapely", "pyproj", "numpy")
+
+class TestEvtech(unittest.TestCase):
+    """Tests for `evtech` package."""
+
+    def test_lazy_import(self):
+        code = "import sys, evtech; print(' '.join(m for m in {!r} if m in sys.modules))".format(HEAVY_MODULES)
+        out = subprocess.run([sys.executable, "-c", code], check=True, stdout=subprocess.PIPE)
+        self.assertEqual(out.stdout.decode().strip(), "")
+
+        # Cameras only need the dependencies of their projections until other features are used
+        code = "import sys; from evtech import Camera; print(' '.join(m for m in ('cv2', 'scipy', 'sklearn', 'shapely') if m in sys.modules))"
+        out = subprocess.run([sys.executable, "-c", code], check=True, stdout=subprocess.PIPE)
+        self.assertEqual(out.stdout.decode().strip(), "")
+
+    def test_public_names(self):
+        # Every public name defined in a module is available from the package
+        for module_name in evtech._MODULE_NAMES:
+            module = importlib.import_module("evtech." + module_name)
+            source = inspect.getsource(module)
+            for name, value in vars(module).items():
+                if name.startswith("_") or isinstance(value, types.ModuleType):
+                    continue
+                defined = re.search(r"^{} = ".format(name), source, re.MULTILINE) is not None
+                if getattr(value, "__module__", None) == module.__name__ or defined:
+                    self.assertIn(name, evtech.__all__)
+                    self.assertIs(getattr(evtech, name), value)
+
+        self.assertIs(evtech.camera.Camera, evtech.Camera)
+        with self.assertRaises(AttributeError):
+            evtech.missing
+
+if __name__ == '__main__':
+    unittest.main()
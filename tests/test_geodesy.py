@@ -4,7 +4,15 @@
 
 import unittest
 
+import threading
+
 from evtech import utm_crs_from_latlon
+from evtech import utm_crs_from_zone
+from evtech import get_transformer
+from evtech import crs_cache_stats
+from evtech import clear_crs_cache
+from evtech import same_crs
+from pyproj import CRS
 
 class TestGeodesy(unittest.TestCase):
     """Tests for `evtech.geodesy` package."""
@@ -22,4 +30,43 @@ class TestGeodesy(unittest.TestCase):
 
         # Sourthern hemisphere
         crs = utm_crs_from_latlon(-1*self.lat, self.lon)
-        self.assertEqual(str(crs),"epsg:32713")
\ No newline at end of file
+        self.assertEqual(str(crs),"epsg:32713")
+
+    def test_crs_cache(self):
+        clear_crs_cache()
+        crs = utm_crs_from_latlon(self.lat, self.lon)
+        self.assertIs(crs, utm_crs_from_latlon(self.lat + 0.1, self.lon))
+        self.assertIs(crs, utm_crs_from_zone(13, True))
+        self.assertIsNot(crs, utm_crs_from_zone(13, False))
+
+        stats = crs_cache_stats()["crs"]
+        self.assertEqual(stats["misses"], 2)
+        self.assertEqual(stats["hits"], 2)
+
+    def test_same_crs(self):
+        crs = utm_crs_from_zone(13, True)
+        self.assertTrue(same_crs(crs, crs))
+        self.assertTrue(same_crs(32613, crs))
+        self.assertTrue(same_crs("EPSG:32613", CRS.from_user_input(32613)))
+        self.assertFalse(same_crs(32613, utm_crs_from_zone(13, False)))
+
+    def test_transformer_cache(self):
+        clear_crs_cache()
+        crs = utm_crs_from_latlon(self.lat, self.lon)
+        transformer = get_transformer(4326, crs)
+        self.assertIs(transformer, get_transformer(4326, crs))
+        self.assertIsNot(transformer, get_transformer(crs, 4326))
+
+        x, _ = transformer.transform(self.lon, self.lat)
+        self.assertTrue(400000 < x < 600000)
+
+        # Transformers are not shared between threads
+        other = []
+        thread = threading.Thread(target=lambda: other.append(get_transformer(4326, crs)))
+        thread.start()
+        thread.join()
+        self.assertIsNot(transformer, other[0])
+
+        stats = crs_cache_stats()["transformer"]
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 3)
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+"""Tests for the decoded image cache."""
+
+import os
+import tempfile
+import unittest
+import cv2
+import numpy as np
+
+from evtech import Camera
+from evtech import enable_image_cache, disable_image_cache, image_cache_stats, cached_imread
+
+class TestImageCache(unittest.TestCase):
+    """Tests for `evtech.image_cache` package."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.paths = []
+        for i in range(3):
+            path = os.path.join(self.tmp.name, "img{}.png".format(i))
+            cv2.imwrite(path, np.full((10, 10, 3), i, dtype=np.uint8))
+            self.paths.append(path)
+
+    def tearDown(self):
+        disable_image_cache()
+        self.tmp.cleanup()
+
+    def test_disabled(self):
+        self.assertIsNone(image_cache_stats())
+        img = cached_imread(self.paths[0], cv2.imread)
+        self.assertTrue(img.flags.writeable)
+
+    def test_hits_and_evictions(self):
+        # Room for two 300 byte images
+        enable_image_cache(700)
+        cam = Camera(np.eye(3, 4), [0, 0, 9, 9], [0, 0, 0], [0, 0, 1, 1], 0, None, self.paths[0])
+        img = cam.load_image()
+        self.assertIs(cam.load_image(), img)
+        self.assertFalse(img.flags.writeable)
+
+        cached_imread(self.paths[1], cv2.imread)
+        cached_imread(self.paths[2], cv2.imread)
+        stats = image_cache_stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 3)
+        self.assertEqual(stats["evictions"], 1)
+        self.assertEqual(stats["currsize"], 600)
+
+    def test_modified_file(self):
+        enable_image_cache(10000)
+        img = cached_imread(self.paths[0], cv2.imread)
+        cv2.imwrite(self.paths[0], np.full((10, 10, 3), 7, dtype=np.uint8))
+        stat = os.stat(self.paths[0])
+        os.utime(self.paths[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        reloaded = cached_imread(self.paths[0], cv2.imread)
+        self.assertEqual(img[0, 0, 0], 0)
+        self.assertEqual(reloaded[0, 0, 0], 7)
+
+    def test_custom_loader(self):
+        enable_image_cache(10000)
+        loader = lambda x: x
+        # Paths that can not be stat-ed bypass the cache
+        self.assertEqual(cached_imread("missing.jpg", loader), "missing.jpg")
+        self.assertEqual(image_cache_stats()["misses"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+"""Tests for dataset index functions"""
+
+import json
+import os
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from pathlib import Path
+
+from evtech import load_dataset
+from evtech import compile_dataset_index
+from evtech import open_dataset_index
+from evtech import DatasetIndex
+
+from .test_util import rmtree, CAMERA_JSON
+
+class TestIndex(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.tmp = Path("temp_index/")
+        self.nadirs = self.tmp.joinpath("nadirs")
+        self.obliques = self.tmp.joinpath("obliques")
+        self.nadirs.mkdir(parents=True, exist_ok=True)
+        self.obliques.mkdir(parents=True, exist_ok=True)
+
+        # One nadir and two obliques
+        for path, data in zip([self.nadirs.joinpath("a"), self.obliques.joinpath("b"), self.obliques.joinpath("c")],
+                              CAMERA_JSON):
+            path.with_suffix(".jpg").touch()
+            path.with_suffix(".json").write_text(json.dumps(data))
+        pass
+
+    def tearDown(self):
+        rmtree(self.tmp)
+        pass
+
+    def test_compile_and_load(self):
+        index_path = compile_dataset_index(self.tmp)
+        index = DatasetIndex(index_path)
+        self.assertEqual(3, len(index))
+        self.assertFalse(index.is_stale())
+
+        nadirs, obliques = load_dataset(self.tmp)
+        idx_nadirs, idx_obliques = load_dataset(self.tmp, index=True)
+        self.assertEqual(1, len(idx_nadirs))
+        self.assertEqual(2, len(idx_obliques))
+
+        expected = {cam.image_path: cam for cam in nadirs + obliques}
+        for cam in idx_nadirs + idx_obliques:
+            exp = expected[cam.image_path]
+            self.assertTrue(np.array_equal(exp.projection_matrix, cam.projection_matrix))
+            self.assertEqual(exp.image_bounds, cam.image_bounds)
+            self.assertEqual(exp.geo_bounds, cam.geo_bounds)
+            self.assertEqual(exp.elevation, cam.elevation)
+            self.assertEqual(exp.crs, cam.crs)
+
+    def test_custom_loader(self):
+        compile_dataset_index(self.tmp)
+        nadirs, _ = load_dataset(self.tmp, lambda data, path: (data["elevation"], path), index=True)
+        self.assertEqual((CAMERA_JSON[0]["elevation"], self.nadirs.joinpath("a.jpg")), nadirs[0])
+
+    def test_stale_index(self):
+        index_path = compile_dataset_index(self.tmp)
+
+        # Touching a source JSON makes the index stale
+        json_path = self.obliques.joinpath("b.json")
+        stat = os.stat(json_path)
+        os.utime(json_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+        self.assertTrue(DatasetIndex(index_path).is_stale())
+        with self.assertRaises(ValueError):
+            open_dataset_index(self.tmp, rebuild=False)
+
+        # It is rebuilt when opened
+        self.assertFalse(open_dataset_index(self.tmp).is_stale())
+
+        # Removing an image also makes it stale
+        self.nadirs.joinpath("a.jpg").unlink()
+        self.nadirs.joinpath("a.json").unlink()
+        self.assertTrue(DatasetIndex(index_path).is_stale())
+        nadirs, obliques = load_dataset(self.tmp, index=True)
+        self.assertEqual(0, len(nadirs))
+        self.assertEqual(2, len(obliques))
+
+    def test_concurrent_rebuild(self):
+        # Writers each use their own temporary file, so concurrent rebuilds of a stale index all
+        # publish a complete index
+        compile_dataset_index(self.tmp)
+        json_path = self.obliques.joinpath("b.json")
+        stat = os.stat(json_path)
+        os.utime(json_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+
+        def rebuild(i):
+            if i % 2:
+                return open_dataset_index(self.tmp)
+            return DatasetIndex(compile_dataset_index(self.tmp))
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            indexes = list(pool.map(rebuild, range(16)))
+        for index in indexes:
+            self.assertEqual(3, len(index))
+        self.assertFalse(open_dataset_index(self.tmp, rebuild=False).is_stale())
+        self.assertEqual([], list(self.tmp.glob("*.tmp")))
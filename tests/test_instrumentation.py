@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+"""Tests for instrumentation."""
+
+import tempfile
+import unittest
+
+import evtech
+from evtech import camera_from_json, clear_crs_cache
+from evtech import enable_instrumentation, disable_instrumentation, reset_instrumentation
+from evtech import instrumentation_stats, instrumentation_prometheus, record
+from evtech import add_instrumentation_callback, remove_instrumentation_callback
+from evtech import generate_dataset
+
+from .test_util import CAMERA_JSON
+
+class TestInstrumentation(unittest.TestCase):
+    """Tests for `evtech.instrumentation` package."""
+
+    def setUp(self):
+        self.cams = [camera_from_json(data) for data in CAMERA_JSON]
+        reset_instrumentation()
+
+    def tearDown(self):
+        disable_instrumentation()
+        reset_instrumentation()
+
+    def test_instrumentation(self):
+        events = []
+        callback = lambda kind, name, value: events.append((kind, name))
+        add_instrumentation_callback(callback)
+        clear_crs_cache()
+        enable_instrumentation()
+
+        pts = [cam.project_to_camera(-88.0755, 42.3885, 254.0) for cam in self.cams[0:2]]
+        evtech.triangulate_point_from_cameras(self.cams[0:2], pts)
+        for cam in self.cams[0:2]:
+            cam.project_from_camera(100, 100)
+        disable_instrumentation()
+        remove_instrumentation_callback(callback)
+
+        stats = instrumentation_stats()
+        self.assertEqual(stats["timers"]["Camera.project_to_camera"]["calls"], 2)
+        self.assertEqual(stats["timers"]["triangulate_point_from_cameras"]["calls"], 1)
+        self.assertEqual(stats["timers"]["camera.decompose_projection_matrix"]["calls"], 2)
+        self.assertEqual(stats["timers"]["geodesy.create_transformer"]["calls"], 1)
+        self.assertGreater(stats["counters"]["triangulate_point_from_cameras.iterations"]["total"], 0)
+        self.assertIn(("timer", "Camera.project_to_camera"), events)
+        self.assertIn(("counter", "triangulate_point_from_cameras.evaluations"), events)
+
+        text = instrumentation_prometheus()
+        self.assertIn('evtech_calls_total{function="Camera.project_to_camera"} 2\n', text)
+        self.assertIn("# TYPE evtech_call_seconds_total counter\n", text)
+
+    def test_disabled(self):
+        original = evtech.Camera.project_to_camera
+        enable_instrumentation()
+        self.assertIsNot(evtech.Camera.project_to_camera, original)
+        disable_instrumentation()
+
+        # The original functions are restored and nothing is recorded
+        self.assertIs(evtech.Camera.project_to_camera, original)
+        self.assertFalse(hasattr(evtech.camera.get_transformer, "__wrapped__"))
+        self.cams[0].project_to_camera(-88.0755, 42.3885, 254.0)
+        record("event")
+        self.assertEqual(instrumentation_stats(), {"timers": {}, "counters": {}})
+
+    def test_load_dataset(self):
+        # Instrumentation does not change which loading paths are taken
+        with tempfile.TemporaryDirectory() as tmp:
+            generate_dataset(tmp, stations=2)
+            options = [{}, {"index": True}, {"camera_set": True}, {"camera_set": True, "index": True},
+                       {"loader": evtech.camera_from_json, "index": True, "camera_set": True}]
+            expected = [evtech.load_dataset(tmp, **kwargs) for kwargs in options]
+            lazy = evtech.load_dataset(tmp, lazy=True)
+
+            enable_instrumentation()
+            actual = [evtech.load_dataset(tmp, **kwargs) for kwargs in options]
+            lazy[0][0].load()
+            stats = instrumentation_stats()
+            disable_instrumentation()
+
+        for exp, act in zip(expected, actual):
+            for exp_cams, act_cams in zip(exp, act):
+                self.assertEqual(type(exp_cams), type(act_cams))
+                for exp_cam, act_cam in zip(exp_cams, act_cams):
+                    self.assertEqual(type(exp_cam), type(act_cam))
+                    self.assertEqual(exp_cam.image_path, act_cam.image_path)
+                    self.assertEqual(type(exp_cam.projection_matrix), type(act_cam.projection_matrix))
+                    self.assertEqual(exp_cam.projection_matrix.flags.writeable,
+                                     act_cam.projection_matrix.flags.writeable)
+
+        # Sets of an index stay read-only views of it
+        self.assertFalse(actual[3][0][0].projection_matrix.flags.writeable)
+        self.assertFalse(actual[4][0][0].projection_matrix.flags.writeable)
+
+        # The default loader is timed, for the plain and the lazy loads
+        self.assertEqual(stats["timers"]["load_dataset"]["calls"], len(options))
+        self.assertEqual(stats["timers"]["camera_from_json"]["calls"], 2 + 8 + 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+"""Tests for mosaics."""
+
+import os
+import tempfile
+import unittest
+import cv2
+import numpy as np
+
+from pathlib import Path
+from pyproj import CRS
+
+from evtech import build_mosaic, read_mosaic
+
+from .test_util import nadir_camera
+
+class TestMosaic(unittest.TestCase):
+    """Tests for `evtech.mosaic` package."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.crs = CRS.from_user_input(32616)
+
+        # Two overlapping cameras 100m apart, the images hold 10 and 20
+        self.cams = []
+        for i, x in enumerate([410000.0, 410100.0]):
+            image_path = os.path.join(self.tmp.name, "cam{}.png".format(i))
+            cv2.imwrite(image_path, np.full((300, 400, 3), 10 * (i + 1), dtype=np.uint8))
+            self.cams.append(nadir_camera(self.crs, (x, 4693000.0), image_path))
+        self.bounds = [409950.0, 4692950.0, 410150.0, 4693050.0]
+        self.out_dir = Path(self.tmp.name).joinpath("mosaic")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_build_mosaic(self):
+        manifest = build_mosaic(self.cams, self.out_dir, 1.0, self.bounds, tile_size=64)
+        self.assertEqual(manifest["shape"], [100, 200, 3])
+        self.assertEqual(manifest["tiles"], [2, 4])
+
+        # Pixels come from the closest camera, switching halfway between the cameras
+        mosaic, geotransform, crs = read_mosaic(self.out_dir)
+        self.assertEqual(mosaic.shape, (100, 200, 3))
+        self.assertTrue((mosaic[:, 0:100] == 10).all())
+        self.assertTrue((mosaic[:, 100:200] == 20).all())
+        self.assertEqual(geotransform, (409950.0, 1.0, 0.0, 4693050.0, 0.0, -1.0))
+        self.assertEqual(crs, self.crs)
+
+        window, geotransform, _ = read_mosaic(self.out_dir, [90, 10, 109, 19])
+        self.assertEqual(window.shape, (10, 20, 3))
+        np.testing.assert_array_equal(window[0, :, 0], [10] * 10 + [20] * 10)
+        self.assertEqual(geotransform[0:4], (410040.0, 1.0, 0.0, 4693040.0))
+
+    def test_resume(self):
+        build_mosaic(self.cams, self.out_dir, 1.0, self.bounds, tile_size=64)
+        tile_path = self.out_dir.joinpath("tiles", "1_2.npy")
+        other_path = self.out_dir.joinpath("tiles", "0_0.npy")
+        mtime = os.stat(other_path).st_mtime_ns
+        tile_path.unlink()
+
+        build_mosaic(self.cams, self.out_dir, 1.0, self.bounds, tile_size=64)
+        self.assertTrue(tile_path.exists())
+        self.assertEqual(os.stat(other_path).st_mtime_ns, mtime)
+
+        with self.assertRaises(ValueError):
+            build_mosaic(self.cams, self.out_dir, 2.0, self.bounds, tile_size=64)
+
+    def test_build_mosaic_workers(self):
+        build_mosaic(self.cams, self.out_dir, 1.0, self.bounds, tile_size=64, workers=2)
+        mosaic, _, _ = read_mosaic(self.out_dir)
+        self.assertTrue((mosaic[:, 0:100] == 10).all())
+        self.assertTrue((mosaic[:, 100:200] == 20).all())
+
+if __name__ == '__main__':
+    unittest.main()
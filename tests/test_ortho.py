@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+"""Tests for orthorectification."""
+
+import tempfile
+import unittest
+import numpy as np
+
+from pathlib import Path
+from pyproj import CRS
+
+from evtech import ElevationModel
+from evtech import orthorectify, open_orthophoto
+
+from .test_util import nadir_camera
+
+class TestOrtho(unittest.TestCase):
+    """Tests for `evtech.ortho` package."""
+
+    def setUp(self):
+        self.crs = CRS.from_user_input(32616)
+        self.cam = nadir_camera(self.crs)
+        # Each pixel holds its own column and row
+        cols, rows = np.meshgrid(np.arange(400, dtype=np.float32), np.arange(300, dtype=np.float32))
+        self.image = np.dstack([cols, rows, np.ones_like(cols)])
+        self.tmp = tempfile.TemporaryDirectory()
+        self.out_path = Path(self.tmp.name).joinpath("ortho.npy")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_orthorectify(self):
+        bounds = [409950.0, 4692950.0, 410050.0, 4693050.0]
+        metadata = orthorectify(self.cam, self.out_path, 1.0, bounds, tile_size=64, image=self.image)
+        self.assertEqual(metadata["shape"], [100, 100, 3])
+
+        ortho, geotransform, crs = open_orthophoto(self.out_path)
+        self.assertEqual(geotransform, (409950.0, 1.0, 0.0, 4693050.0, 0.0, -1.0))
+        self.assertEqual(crs, self.crs)
+
+        # Ground point (409950.5, 4693049.5) is 49.5m west and north of the center, 2 pixels per meter
+        np.testing.assert_allclose(ortho[0, 0], [200 - 99, 150 - 99, 1], atol=1e-3)
+        np.testing.assert_allclose(ortho[99, 99], [200 + 99, 150 + 99, 1], atol=1e-3)
+
+        # The default grid covers the geo bounds, ground outside of the image is empty
+        metadata = orthorectify(self.cam, self.out_path, 2.0, tile_size=50, image=self.image)
+        ortho, _, _ = open_orthophoto(self.out_path)
+        self.assertTrue(abs(metadata["shape"][1] - 100) <= 1)
+        self.assertEqual(ortho[37, 50, 2], 1)
+        self.assertTrue(ortho[:, :, 2].mean() > 0.9)
+
+    def test_orthorectify_dsm(self):
+        # Raising the ground by 500m halves the distance to the camera, doubling the offsets from the center
+        dsm = ElevationModel(np.full((200, 200), 750.0), (409900.0, 1.0, 0, 4693100.0, 0, -1.0), self.crs)
+        bounds = [409990.0, 4692990.0, 410010.0, 4693010.0]
+        orthorectify(self.cam, self.out_path, 1.0, bounds, dsm=dsm, image=self.image)
+        ortho, _, _ = open_orthophoto(self.out_path)
+        np.testing.assert_allclose(ortho[0, 0, 0:2], [200 - 9.5 * 4, 150 - 9.5 * 4], atol=1e-3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+"""Tests for the raw image store."""
+
+import unittest
+import cv2
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from evtech import Camera
+from evtech import build_raw_store, convert_image, raw_image_path, open_raw_image
+
+from .test_util import rmtree
+
+class TestRawStore(unittest.TestCase):
+    """Tests for `evtech.rawstore` package."""
+
+    def setUp(self):
+        self.tmp = Path("temp_raw/")
+        self.tmp.joinpath("nadirs").mkdir(parents=True, exist_ok=True)
+        self.tmp.joinpath("obliques").mkdir(parents=True, exist_ok=True)
+        self.image_path = self.tmp.joinpath("obliques", "test.jpg")
+        img = np.random.RandomState(0).randint(0, 255, (60, 80, 3)).astype(np.uint8)
+        cv2.imwrite(str(self.image_path), img)
+
+    def tearDown(self):
+        rmtree(self.tmp)
+
+    def test_build_raw_store(self):
+        self.assertEqual(raw_image_path(self.image_path), self.tmp.joinpath("raw", "obliques", "test.npy"))
+        with self.assertRaises(FileNotFoundError):
+            open_raw_image(self.image_path)
+
+        self.assertEqual(build_raw_store(self.tmp), 1)
+        # Up to date images are skipped
+        self.assertEqual(build_raw_store(self.tmp, workers=2), 0)
+        self.assertEqual(build_raw_store(self.tmp, overwrite=True), 1)
+
+        raw = open_raw_image(self.image_path)
+        self.assertIsInstance(raw, np.memmap)
+        np.testing.assert_array_equal(raw, cv2.imread(str(self.image_path)))
+
+    def test_concurrent_convert(self):
+        # Converters of the same image write separate temporary files and each publish a complete copy
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            self.assertTrue(all(pool.map(lambda _: convert_image(self.image_path, overwrite=True), range(16))))
+        np.testing.assert_array_equal(open_raw_image(self.image_path), cv2.imread(str(self.image_path)))
+        self.assertEqual([], list(self.tmp.joinpath("raw", "obliques").glob("*.tmp")))
+
+    def test_load_raw_chip(self):
+        build_raw_store(self.tmp)
+        cam = Camera(np.eye(3, 4), [0, 0, 79, 59], [0, 0, 0], [0, 0, 1, 1], 0, None, self.image_path)
+
+        chip, window = cam.load_raw_chip([70, -5, 100, 9])
+        self.assertEqual(window, [70, 0, 79, 9])
+        self.assertEqual(chip.shape, (10, 10, 3))
+        self.assertFalse(chip.flags.writeable)
+        self.assertTrue(np.shares_memory(chip, open_raw_image(self.image_path)))
+
+        full, _ = cam.load_chip([70, 0, 79, 9])
+        np.testing.assert_array_equal(chip, full)
+
+if __name__ == '__main__':
+    unittest.main()
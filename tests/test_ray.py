@@ -9,6 +9,7 @@ import math
 
 from pyproj import CRS
 from evtech import Ray
+from evtech import RayBundle
 from evtech import Camera
 
 class TestRay(unittest.TestCase):
@@ -45,3 +46,27 @@ class TestRay(unittest.TestCase):
         ray = self.cam.project_from_camera(880,443)
         pt = ray.intersect_at_elevation(self.elev)
         self.assertAlmostEqual(pt[2], self.elev)
+
+    def test_bundle_construct(self):
+        bundle = RayBundle([0,0,0],[[1,1,1],[0,0,-2]], None)
+        self.assertEqual(len(bundle), 2)
+        self.assertEqual(bundle.origins.shape, (2,3))
+        self.assertAlmostEqual(bundle.directions[0][0], 1.0/math.sqrt(3))
+        self.assertEqual(bundle.directions[1][2], -1.0)
+
+        pts = bundle.point_at_depth([math.sqrt(3), 2])
+        self.assertTrue(np.allclose(pts, [[1,1,1],[0,0,-2]]))
+
+    def test_bundle_matches_rays(self):
+        cols = np.array([880, 0, 100.5])
+        rows = np.array([443, 0, 20.25])
+        bundle = self.cam.project_points_from_camera(cols, rows)
+        self.assertEqual(len(bundle), 3)
+
+        depths = bundle.depth_at_elevation(self.elev)
+        pts = bundle.intersect_at_elevation(self.elev)
+        for i in range(3):
+            ray = self.cam.project_from_camera(cols[i], rows[i])
+            self.assertTrue(np.allclose(bundle.directions[i], ray.direction[:,0]))
+            self.assertAlmostEqual(depths[i], ray.depth_at_elevation(self.elev)[0], places=6)
+            self.assertTrue(np.allclose(pts[i], ray.intersect_at_elevation(self.elev)))
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+"""Tests for synthetic datasets."""
+
+import tempfile
+import unittest
+import numpy as np
+
+from evtech import load_dataset, triangulate_points
+from evtech import generate_dataset, load_ground_truth, ground_truth_tracks
+
+class TestSynthetic(unittest.TestCase):
+    """Tests for `evtech.synthetic` package."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_generate_dataset(self):
+        summary = generate_dataset(self.tmp.name, stations=12, points=300, spacing=150.0)
+        self.assertEqual(summary["epsg"], 32616)
+        self.assertEqual(summary["nadirs"], 12)
+        self.assertEqual(summary["obliques"], 48)
+
+        nadirs, obliques = load_dataset(self.tmp.name)
+        self.assertEqual(len(nadirs), 12)
+        self.assertEqual(len(obliques), 48)
+        self.assertEqual(nadirs[0].crs.to_epsg(), 32616)
+
+        # The observations are the projections of the ground truth points
+        cams = nadirs + obliques
+        truth = load_ground_truth(self.tmp.name)
+        tracks = ground_truth_tracks(truth, cams)
+        self.assertEqual(tracks.shape, (300, 60, 2))
+        self.assertEqual(np.count_nonzero(~np.isnan(tracks[:, :, 0])), summary["observations"])
+        cam = cams[5]
+        seen = ~np.isnan(tracks[:, 5, 0])
+        world_pts = truth["points"][seen]
+        img_pts, in_front = cam.project_world_points(world_pts)
+        self.assertTrue(in_front.all())
+        np.testing.assert_allclose(img_pts, tracks[seen, 5], atol=1e-6)
+
+        # Triangulating the observations recovers the points
+        multi = np.count_nonzero(~np.isnan(tracks[:, :, 0]), axis=1) >= 2
+        points, _, converged = triangulate_points(cams, tracks[multi])
+        self.assertTrue(converged.all())
+        np.testing.assert_allclose(points, truth["points"][multi], atol=1e-4)
+
+    def test_zones(self):
+        summary = generate_dataset(self.tmp.name, stations=4, origin=(151.2, -33.8), images=True,
+                                   image_size=(400, 300), focal_length=1000.0)
+        self.assertEqual(summary["epsg"], 32756)
+        nadirs, _ = load_dataset(self.tmp.name)
+        self.assertEqual(nadirs[0].crs.to_epsg(), 32756)
+        self.assertEqual(nadirs[0].load_image().shape, (300, 400, 3))
+
+        with self.assertRaises(ValueError):
+            generate_dataset(self.tmp.name, stations=100, origin=(-90.001, 42.0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+"""Tests for triangulation functions."""
+
+import unittest
+import numpy as np
+
+from evtech import camera_from_json
+from evtech import triangulate_point_from_cameras
+from evtech import triangulate_points
+from evtech import triangulate_points_robust
+
+from .test_util import CAMERA_JSON
+
+class TestTriangulation(unittest.TestCase):
+    """Tests for `evtech.triangulation` package."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.cams = [camera_from_json(data) for data in CAMERA_JSON]
+        self.pts = [[605,171],[304,536],[879,441]]
+
+        # Synthetic points near the ground and their exact observations
+        rng = np.random.RandomState(0)
+        self.world_pts = np.array([411461.0, 4693444.0, 252.0]) + rng.normal(0, 10, (50,3))
+        self.tracks = np.stack([cam.project_world_points(self.world_pts)[0] for cam in self.cams], axis=1)
+
+    def test_matches_single_point(self):
+        points, residuals, converged = triangulate_points(self.cams, [self.pts], True)
+        world_pt = triangulate_point_from_cameras(self.cams, self.pts, True)
+
+        self.assertEqual(points.shape, (1,3))
+        self.assertEqual(residuals.shape, (1,3))
+        self.assertTrue(converged[0])
+        self.assertTrue(abs(self.cams[2].elevation - points[0][2]) < 5)
+        self.assertTrue(abs(world_pt[2] - points[0][2]) < 1)
+
+    def test_recovers_points(self):
+        points, residuals, converged = triangulate_points(self.cams, self.tracks)
+        self.assertTrue(converged.all())
+        self.assertTrue(np.allclose(points, self.world_pts, atol=1e-3))
+        self.assertTrue(np.nanmax(residuals) < 1e-3)
+
+    def test_missing_observations(self):
+        tracks = self.tracks.copy()
+        tracks[0,1] = np.nan
+        tracks[1,1:] = np.nan
+        points, residuals, converged = triangulate_points(self.cams, tracks)
+
+        # Two views are still enough to triangulate
+        self.assertTrue(converged[0])
+        self.assertTrue(np.allclose(points[0], self.world_pts[0], atol=1e-3))
+        self.assertTrue(np.isnan(residuals[0,1]))
+
+        # A single view is not
+        self.assertFalse(converged[1])
+        self.assertTrue(np.isnan(points[1]).all())
+        self.assertTrue(np.isnan(residuals[1]).all())
+
+    def test_parallel_matches_serial(self):
+        serial = triangulate_points(self.cams, self.tracks, chunk_size=16)
+        parallel = triangulate_points(self.cams, self.tracks, workers=2, chunk_size=16)
+        for expected, actual in zip(serial, parallel):
+            self.assertTrue(np.array_equal(expected, actual))
+
+    def test_robust_rejects_outliers(self):
+        tracks = self.tracks.copy()
+        tracks[:,2] += [40.0, -25.0]
+        tracks[0,2] = np.nan
+
+        points, _, _ = triangulate_points(self.cams, tracks)
+        self.assertFalse(np.allclose(points[1:], self.world_pts[1:], atol=1e-2))
+
+        points, residuals, converged, inliers = triangulate_points_robust(self.cams, tracks)
+        self.assertTrue(converged.all())
+        self.assertTrue(np.allclose(points, self.world_pts, atol=1e-3))
+        self.assertTrue(inliers[:,0:2].all())
+        self.assertFalse(inliers[:,2].any())
+        self.assertTrue(np.isnan(residuals[0,2]))
+        self.assertTrue((residuals[1:,2] > 4.0).all())
+
+    def test_robust_parallel_matches_serial(self):
+        serial = triangulate_points_robust(self.cams, self.tracks, chunk_size=16)
+        parallel = triangulate_points_robust(self.cams, self.tracks, workers=2, chunk_size=16)
+        for expected, actual in zip(serial, parallel):
+            self.assertTrue(np.array_equal(expected, actual))
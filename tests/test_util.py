@@ -1,3 +1,39 @@
+import numpy as np
+
+from evtech import Camera
+from evtech.geodesy import get_transformer
+
+# Serialized cameras observing a common area, in the layout of the dataset JSON files
+CAMERA_JSON = [
+    {
+        "projection": [[1525.5867281279347, -15512.91424561646, -2311.8378111550846, 72183965325.08594],
+        [-7573.84425712711, 803.6272922226443, -13570.519962708786, -650749980.3668021],
+        [0.7925646349229568, -0.045523902505363464, -0.608173942069206, -109441.04682805175]],
+        "bounds": [125, 267, 966, 550],
+        "camera_center": [408968.8416940464, 4693116.473847266, 1716.97110001749],
+        "geo_bounds": [-88.07612165733431, 42.38789365082783, -88.07494134030249, 42.389211554600976],
+        "elevation": 254.16879272460938
+    },
+    {
+        "projection": [[15116.757193147516, 3196.5054851458067, -2909.892827161719, -21213711732.266273],
+        [-333.16135284503827, -8152.243893734243, -13224.287669937909, 38408498248.73735],
+        [-0.06777729452508616, 0.7652991191741246, -0.6401701362908264, -3561739.5617974782]],
+        "bounds": [3569, 2298, 4299, 3029],
+        "camera_center": [411524.2286809936, 4691886.086275864, 1663.19605194418],
+        "geo_bounds": [-88.07612165733431, 42.38789365082783, -88.07494134030249, 42.389211554600976],
+        "elevation": 254.16879272460938
+    },
+    {
+        "projection": [[-234.48497951320869, -11689.146112537686, -3420.9549093694854, 54967162069.77626],
+        [-11527.74509904331, 527.9966478964207, -3108.9307732776556, 2267432568.205459],
+        [0.07731721986909759, 0.01342309733163904, -0.996916676327768, -93150.24955090503]],
+        "bounds": [4405, 655, 5587, 1420],
+        "camera_center": [411228.51669897616, 4693677.177776167, 1653.5802147550032],
+        "geo_bounds": [-88.07607063663191, 42.387928513288855, -88.07499236028416, 42.38917669615173],
+        "elevation": 250.522
+    }
+]
+
 def rmtree(root):
     """ Function to remove a directory and its contents
     
@@ -10,4 +46,26 @@ def rmtree(root):
         else:
             p.unlink()
 
-    root.rmdir()
\ No newline at end of file
+    root.rmdir()
+
+def nadir_camera(crs, center = (410000.0, 4693000.0), image_path = ""):
+    """ Create a 400x300 nadir camera 1000m above a 250m ground looking straight down,
+    0.5m per pixel at the ground
+
+    :param crs: The coordinate system of the camera
+    :type crs: class: `pyproj.CRS`
+    :param center: The x, y of the camera center
+    :type center: tuple
+    :param image_path: The path to the image of the camera
+    :type image_path: str
+    """
+    focal = 2000.0
+    center = np.array([center[0], center[1], 1250.0])
+    k = np.array([[focal, 0, 200], [0, focal, 150], [0, 0, 1]])
+    r = np.array([[1, 0, 0], [0, -1, 0], [0, 0, -1]], dtype=float)
+    proj = k @ np.hstack([r, (-r @ center)[:, np.newaxis]])
+
+    lon, lat = get_transformer(crs, 4326).transform([center[0] - 100, center[0] + 100],
+                                                    [center[1] - 75, center[1] + 75])
+    geo_bounds = [lon[0], lat[0], lon[1], lat[1]]
+    return Camera(proj, [0, 0, 399, 299], center.tolist(), geo_bounds, 250.0, crs, image_path)